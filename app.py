@@ -1,26 +1,64 @@
-from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
+import hashlib
+from functools import lru_cache
+
+from fastapi import Depends, FastAPI, Request
 
 from core.config import settings
-from core.database import init_db
-from routes import admin, pages, recipes
+from core.metrics import MetricsMiddleware, request_metrics
+from core.sql_profiler import SqlProfilerMiddleware
+from core.static_assets import CachedStaticFiles, asset_manifest
+from core.database import close_pools, init_db, request_connection, shutdown_db_executor
+from routes import admin, menus, pages, recipes
+from services.image_service import image_service
+from services.job_service import job_service
+from services.profile_service import profile_service
+from services.upload_service import UploadRejected
 from routes import menu_new
-from fastapi.responses import FileResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
 
-app = FastAPI(title="Virentoftakoket")
+# En poolad anslutning per request som alla services delar
+app = FastAPI(title="Virentoftakoket", dependencies=[Depends(request_connection)])
+# Latens, statuskoder och tid per fas (SQL/mall/Python) per route, se /metrics
+app.add_middleware(MetricsMiddleware)
+# Valbar SQL-profilering per request (SQL_PROFILE=true eller /admin/sql), med X-SQL-Queries i svaret
+app.add_middleware(SqlProfilerMiddleware)
 
-# Initiera databasen vid start
+# Initiera databasen vid start och värm profilcachen så att routes slipper DB-anrop
 init_db()
+profile_service.list_profiles()
+job_service.recover()
+asset_manifest.build()
 
 # Routers
 app.include_router(pages.router)
 app.include_router(recipes.router, prefix="/api", tags=["recipes"])
+app.include_router(menus.router, prefix="/api", tags=["menu"])
 app.include_router(admin.router, prefix="/admin", tags=["admin"])
 app.include_router(menu_new.router)
 
 # Static files
-app.mount("/static", StaticFiles(directory="static"), name="static")
-app.mount("/uploads", StaticFiles(directory=settings.data_dir / "images"), name="uploads")
+# Fingeravtryck och innehållsadresserade uppladdningar cachas som oföränderliga
+app.mount("/static", CachedStaticFiles(directory=settings.static_dir, manifest=asset_manifest), name="static")
+app.mount(
+    "/uploads",
+    CachedStaticFiles(directory=settings.data_dir / "images", content_addressed=True),
+    name="uploads",
+)
+
+
+@app.exception_handler(UploadRejected)
+async def upload_rejected(request: Request, exc: UploadRejected) -> JSONResponse:
+    """För stora eller felaktiga uppladdningar ger 413/415 i stället för 500."""
+    return JSONResponse({"detail": str(exc)}, status_code=exc.status_code)
+
+
+@app.on_event("shutdown")
+def shutdown_pools() -> None:
+    """Avbryt bakgrundsjobb, stäng bildpoolen, vänta in DB-trådpoolen och stäng poolade anslutningar så att WAL checkpointas."""
+    job_service.shutdown()
+    image_service.shutdown()
+    shutdown_db_executor()
+    close_pools()
 
 
 @app.get("/health")
@@ -29,10 +67,26 @@ def health_check() -> dict[str, str]:
     return {"status": "ok"}
 
 
+@app.get("/metrics", include_in_schema=False)
+def metrics() -> PlainTextResponse:
+    """Requestmätningar i Prometheus textformat."""
+    return PlainTextResponse(request_metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@lru_cache(maxsize=1)
+def _favicon() -> tuple[bytes, str]:
+    data = (settings.static_dir / "favicon.png").read_bytes()
+    return data, f'"{hashlib.sha256(data).hexdigest()[:16]}"'
+
+
 @app.get("/favicon.ico")
-def favicon() -> FileResponse:
-    """Serva favicon till klienter som implicit frågar efter /favicon.ico."""
-    return FileResponse(settings.static_dir / "favicon.png")
+def favicon(request: Request) -> Response:
+    """Serva favicon ur minnet till klienter som implicit frågar efter /favicon.ico."""
+    data, etag = _favicon()
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=86400"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(data, media_type="image/png", headers=headers)
 
 
 if __name__ == "__main__":
@@ -0,0 +1 @@
+"""Benchmarks för receptappen (körs manuellt, ingår inte i appen)."""
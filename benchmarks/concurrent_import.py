@@ -0,0 +1,125 @@
+"""Mät svarstider för lätta sidor medan en tung /admin/import pågår.
+
+Kör:  python -m benchmarks.concurrent_import --recipes 3000 --probes 200
+
+Appen drivs i processen via httpx.ASGITransport mot en temporär DATA_DIR, så
+ingen riktig databas rörs. Om SQLite-arbete blockerar event-loopen syns det
+direkt som att latensen under importen skjuter i höjden jämfört med viloläget.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+
+def _build_payload(count: int) -> bytes:
+    recipes = [
+        {
+            "title": f"Benchrätt {i}",
+            "description": "Genererad för benchmark",
+            "servings": 4,
+            "ingredients": [
+                {"name": "mjölk", "amount": "5 dl"},
+                {"name": "vetemjöl", "amount": "3 dl"},
+                {"name": "ägg", "amount": "3 st"},
+                {"name": "salt", "amount": "1 krm"},
+            ],
+            "steps": ["Vispa ihop", "Stek i smör"],
+            "tags": ["pannkaka", "vegetariskt"],
+        }
+        for i in range(count)
+    ]
+    return json.dumps({"recipes": recipes}).encode()
+
+
+def _summary(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+
+    def pct(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000
+
+    return {
+        "n": len(ordered),
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+async def _probe(client, path: str, count: int, concurrency: int, stop: asyncio.Event | None = None) -> List[float]:
+    samples: List[float] = []
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one() -> None:
+        async with sem:
+            if stop is not None and stop.is_set():
+                return
+            start = time.perf_counter()
+            response = await client.get(path)
+            samples.append(time.perf_counter() - start)
+            response.raise_for_status()
+
+    await asyncio.gather(*(one() for _ in range(count)))
+    return samples
+
+
+async def run(recipes: int, probes: int, concurrency: int, path: str) -> Dict[str, Dict[str, float]]:
+    import httpx
+
+    from app import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await _probe(client, path, 20, concurrency)  # uppvärmning
+        idle = await _probe(client, path, probes, concurrency)
+
+        payload = _build_payload(recipes)
+        import_started = time.perf_counter()
+        import_task = asyncio.create_task(
+            client.post(
+                "/admin/import",
+                data={"profile_id": "1"},
+                files={"file": ("bench.json", payload, "application/json")},
+                timeout=None,
+            )
+        )
+        await asyncio.sleep(0.05)
+        busy = await _probe(client, path, probes, concurrency)
+        busy_done_during_import = not import_task.done()
+        response = await import_task
+        response.raise_for_status()
+        import_seconds = time.perf_counter() - import_started
+
+    result = {"idle": _summary(idle), "during_import": _summary(busy)}
+    result["import"] = {"recipes": recipes, "seconds": import_seconds, "overlapped": float(busy_done_during_import)}
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recipes", type=int, default=3000, help="Antal recept i importen")
+    parser.add_argument("--probes", type=int, default=200, help="Antal mätanrop per fas")
+    parser.add_argument("--concurrency", type=int, default=8, help="Samtidiga mätanrop")
+    parser.add_argument("--path", default="/api/recipes/1", help="Lätt endpoint att mäta")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench-") as tmp:
+        os.environ["DATA_DIR"] = tmp
+        (Path(tmp) / "images").mkdir(parents=True, exist_ok=True)
+        result = asyncio.run(run(args.recipes, args.probes, args.concurrency, args.path))
+        from core.database import close_pools
+
+        close_pools()
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""Syntetiskt hushåll: profiler, recept och flera års veckomenyer och inköpslistor.
+
+Kör:  python -m benchmarks.dataset --data-dir /tmp/hushall --profiles 6 --recipes 20000 --years 3 --seed 1
+
+Databasen byggs under DATA_DIR med appens egna migreringar och services, så
+schemat, sökindexet och inköpslistornas bidragsrader blir som i drift.
+Samma seed ger samma databas. Mängderna skrivs med enheterna i models/units.py.
+Inköpslistan är en per profil i appen. Därför byggs den från profilens senaste
+vecka, och en del rader bockas av.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+DAYS = ["Måndag", "Tisdag", "Onsdag", "Torsdag", "Fredag", "Lördag", "Söndag"]
+
+PROFILE_NAMES = [
+    "Per", "Marika", "Sally", "Jack", "Astrid", "Nils", "Elsa", "Olle", "Greta", "Sven",
+    "Ingrid", "Lars", "Maja", "Erik", "Karin", "Gustav", "Saga", "Axel", "Ebba", "Hugo",
+]
+
+# Ingrediens → enhetskoder i models/units.py som är rimliga för den
+INGREDIENTS: Dict[str, Tuple[str, ...]] = {
+    "potatis": ("g", "kg", "st"),
+    "mjölk": ("dl", "l"),
+    "grädde": ("dl",),
+    "crème fraiche": ("dl", "g"),
+    "smör": ("g", "msk"),
+    "olivolja": ("msk", "dl"),
+    "vetemjöl": ("dl", "g"),
+    "socker": ("dl", "msk", "tsk"),
+    "salt": ("tsk", "krm", "nypa", "efter_smak"),
+    "svartpeppar": ("krm", "efter_smak"),
+    "ägg": ("st",),
+    "gul lök": ("st",),
+    "rödlök": ("st",),
+    "vitlöksklyfta": ("st",),
+    "morot": ("st", "g"),
+    "palsternacka": ("st", "g"),
+    "vitkål": ("g", "kg"),
+    "purjolök": ("st",),
+    "tomat": ("st", "g"),
+    "krossade tomater": ("g", "dl"),
+    "gurka": ("st",),
+    "nötfärs": ("g", "kg"),
+    "fläskfilé": ("g",),
+    "kycklingfilé": ("g", "kg"),
+    "falukorv": ("g",),
+    "lax": ("g",),
+    "torsk": ("g",),
+    "räkor": ("g",),
+    "ris": ("dl", "g"),
+    "pasta": ("g",),
+    "havregryn": ("dl",),
+    "röda linser": ("dl", "g"),
+    "kikärtor": ("g", "dl"),
+    "riven ost": ("dl", "g"),
+    "lingonsylt": ("dl", "msk"),
+    "dill": ("knippe", "msk"),
+    "persilja": ("knippe", "msk"),
+    "buljongtärning": ("st",),
+    "citron": ("st",),
+    "honung": ("msk", "tsk"),
+    "kanel": ("tsk", "krm"),
+    "kardemumma": ("tsk", "krm"),
+}
+
+_AMOUNTS: Dict[str, Sequence[str]] = {
+    "g": ("100", "150", "200", "250", "300", "400", "500"),
+    "kg": ("1", "1,5", "2"),
+    "dl": ("1/2", "1", "1 1/2", "2", "3", "4", "5"),
+    "l": ("1", "1/2"),
+    "msk": ("1", "2", "3", "1-2"),
+    "tsk": ("1/2", "1", "2"),
+    "krm": ("1", "2", "½"),
+    "st": ("1", "2", "3", "4", "2-3", "6"),
+    "nypa": ("1",),
+    "knippe": ("1", "1/2"),
+}
+
+DISHES = [
+    "kycklinggryta", "laxpasta", "köttbullar", "pannkakor", "linssoppa", "fiskgratäng", "tacos",
+    "pytt i panna", "ärtsoppa", "kålpudding", "lasagne", "janssons frestelse", "raggmunk",
+    "korvstroganoff", "gulaschsoppa", "räkpasta", "ugnspannkaka", "biff à la Lindström",
+    "kikärtsgryta", "rotfruktsgratäng", "potatissallad", "fiskbullar", "kalops", "flygande Jacob",
+]
+PREFIXES = ["", "", "Krämig", "Ugnsbakad", "Snabb", "Mormors", "Kryddig", "Vegetarisk", "Enkel", "Helgens"]
+SIDES = ["", "", "med potatismos", "med ris", "med kokt potatis", "med rostade rotfrukter", "med sallad", "och bröd"]
+TAGS = [
+    "vegetariskt", "snabbt", "barnvänligt", "fisk", "kyckling", "soppa", "helg", "vardag",
+    "glutenfritt", "mustigt", "billigt", "matlåda",
+]
+STEP_TEMPLATES = [
+    "Skala och hacka {a}.",
+    "Fräs {a} i smör på medelvärme.",
+    "Koka {a} i saltat vatten tills {a} är mjuk.",
+    "Blanda {a} och {b} i en skål.",
+    "Tillsätt {b} och låt puttra i 20 minuter.",
+    "Smaka av med salt och peppar.",
+    "Grädda i ugnen på 200 grader i 25 minuter.",
+    "Servera med {b}.",
+]
+
+
+def _amount(rng: random.Random, unit_code: str) -> str:
+    if unit_code == "efter_smak":
+        return "efter smak"
+    return f"{rng.choice(_AMOUNTS[unit_code])} {unit_code}"
+
+
+def recipe_dict(rng: random.Random, index: int) -> Dict[str, object]:
+    """Ett slumpat recept i importformatet (samma fält som /admin/import)."""
+    title = " ".join(part for part in (rng.choice(PREFIXES), rng.choice(DISHES), rng.choice(SIDES)) if part)
+    names = rng.sample(sorted(INGREDIENTS), rng.randint(4, 11))
+    ingredients = [{"name": name, "amount": _amount(rng, rng.choice(INGREDIENTS[name]))} for name in names]
+    steps = [
+        template.format(a=rng.choice(names), b=rng.choice(names))
+        for template in rng.sample(STEP_TEMPLATES, rng.randint(3, 6))
+    ]
+    return {
+        "title": f"{title[0].upper()}{title[1:]} #{index}",
+        "description": f"{rng.choice(['Vardagsfavorit', 'Helgmat', 'Från mormors receptbok', 'Enkel middag'])} för {rng.randint(2, 6)}.",
+        "servings": rng.choice([2, 4, 4, 4, 6, 8]),
+        "ingredients": ingredients,
+        "steps": steps,
+        "tags": rng.sample(TAGS, rng.randint(1, 3)),
+    }
+
+
+def import_payload(count: int, seed: int = 1, start_index: int = 0) -> bytes:
+    """JSON ({"recipes": [...]}) för /admin/import med count slumpade recept."""
+    rng = random.Random(seed)
+    return json.dumps({"recipes": [recipe_dict(rng, start_index + i) for i in range(count)]}).encode()
+
+
+def _iso_weeks(weeks: int, today: date) -> List[Tuple[int, int]]:
+    """(år, vecka) för de senaste weeks veckorna, äldst först, till och med innevarande."""
+    monday = today - timedelta(days=today.weekday())
+    result = []
+    for offset in range(weeks - 1, -1, -1):
+        iso = (monday - timedelta(weeks=offset)).isocalendar()
+        result.append((iso.year, iso.week))
+    return result
+
+
+def generate(profiles: int = 4, recipes: int = 1000, years: float = 1.0, seed: int = 1, batch_size: int = 1000) -> Dict[str, object]:
+    """Fyll databasen under settings.data_dir; returnerar antal och tidsåtgång.
+
+    Anropas efter att DATA_DIR satts, innan appens moduler importerats av
+    någon annan. Körningen lägger till data i en befintlig databas.
+    """
+    from core.database import connection_scope, init_db
+    from models.recipe import Ingredient, Recipe
+    from services.recipe_repository import recipe_repo
+    from services.shopping_service import shopping_service
+
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    init_db()
+
+    with connection_scope() as conn:
+        existing = conn.execute("SELECT COUNT(*) FROM profiles").fetchone()[0]
+        if profiles > existing:
+            rows = []
+            for i in range(existing, profiles):
+                name = PROFILE_NAMES[i % len(PROFILE_NAMES)]
+                if i >= len(PROFILE_NAMES):
+                    name = f"{name} {i // len(PROFILE_NAMES) + 1}"
+                rows.append((name, f"profil{i + 1}@example.com"))
+            conn.executemany("INSERT INTO profiles (name, email) VALUES (?, ?)", rows)
+            conn.commit()
+        profile_ids = [row[0] for row in conn.execute("SELECT id FROM profiles ORDER BY id LIMIT ?", (profiles,))]
+
+    recipe_ids: List[int] = []
+    owners: Dict[int, List[int]] = {pid: [] for pid in profile_ids}
+    for start in range(0, recipes, batch_size):
+        batch = []
+        batch_owners = []
+        for index in range(start, min(recipes, start + batch_size)):
+            data = recipe_dict(rng, index)
+            owner = rng.choice(profile_ids)
+            batch_owners.append(owner)
+            batch.append(
+                Recipe(
+                    title=data["title"],
+                    description=data["description"],
+                    servings=data["servings"],
+                    created_by=owner,
+                    archived=rng.random() < 0.03,
+                    ingredients=[Ingredient(**ing) for ing in data["ingredients"]],
+                    steps=data["steps"],
+                    tags=data["tags"],
+                )
+            )
+        ids = recipe_repo.add_recipes_bulk(batch)
+        recipe_ids.extend(ids)
+        for rid, owner in zip(ids, batch_owners):
+            owners[owner].append(rid)
+    recipes_done = time.perf_counter()
+
+    weeks = _iso_weeks(max(1, round(years * 52)), date.today())
+    menu_rows = []
+    latest: Dict[int, List[int]] = {}
+    for pid in profile_ids:
+        # Mest egna recept, ibland något ur hushållets gemensamma samling
+        own = owners[pid] or recipe_ids
+        for year, week in weeks:
+            count = rng.randint(4, 7)
+            chosen = [rng.choice(own) if rng.random() < 0.8 else rng.choice(recipe_ids) for _ in range(count)]
+            menu_rows.extend((pid, DAYS[i], week, year, rid) for i, rid in enumerate(chosen))
+            latest[pid] = chosen
+    with connection_scope() as conn:
+        conn.executemany(
+            "INSERT INTO menu_entries (profile_id, day, week_number, year, recipe_id) VALUES (?, ?, ?, ?, ?)", menu_rows
+        )
+        year, week = weeks[-1]
+        conn.executemany(
+            "INSERT INTO menu_meta (profile_id, responsible_profile_id, week_number, year) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(profile_id) DO UPDATE SET responsible_profile_id = excluded.responsible_profile_id, "
+            "week_number = excluded.week_number, year = excluded.year",
+            [(pid, rng.choice(profile_ids), week, year) for pid in profile_ids],
+        )
+        conn.commit()
+    menus_done = time.perf_counter()
+
+    shopping_items = 0
+    for pid, chosen in latest.items():
+        shopping = shopping_service.set_from_recipes(recipe_repo.get_recipes(chosen), profile_id=pid)
+        checked = [item.id for item in shopping.items if rng.random() < 0.3]
+        shopping_service.set_checked(checked, True, profile_id=pid)
+        shopping_items += len(shopping.items)
+
+    return {
+        "seed": seed,
+        "profiles": len(profile_ids),
+        "recipes": len(recipe_ids),
+        "weeks": len(weeks),
+        "first_week": list(weeks[0]),
+        "last_week": list(weeks[-1]),
+        "menu_entries": len(menu_rows),
+        "shopping_items": shopping_items,
+        "seconds": {
+            "recipes": round(recipes_done - started, 3),
+            "menus": round(menus_done - recipes_done, 3),
+            "shopping": round(time.perf_counter() - menus_done, 3),
+        },
+    }
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--profiles", type=int, default=4, help="Antal profiler (minst de fyra som seedas)")
+    parser.add_argument("--recipes", type=int, default=1000, help="Antal genererade recept")
+    parser.add_argument("--years", type=float, default=1.0, help="År av veckomenyer bakåt från innevarande vecka")
+    parser.add_argument("--seed", type=int, default=1, help="Slumpfrö; samma frö ger samma data")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-dir", type=Path, required=True, help="Katalog för app.db (DATA_DIR)")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    args.data_dir.mkdir(parents=True, exist_ok=True)
+    (args.data_dir / "images").mkdir(exist_ok=True)
+    os.environ["DATA_DIR"] = str(args.data_dir)
+    summary = generate(args.profiles, args.recipes, args.years, args.seed)
+    from core.database import close_pools
+
+    close_pools()
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""Lasttest av appen i processen mot ett genererat hushåll.
+
+Kör:  python -m benchmarks.loadtest --recipes 5000 --years 2 --requests 300 --concurrency 8
+      python -m benchmarks.loadtest --compare benchmarks/results/loadtest-abc1234.json
+
+Ett dataset byggs med benchmarks.dataset i en temporär DATA_DIR, eller så
+används --data-dir. Appen drivs sedan via httpx.ASGITransport med ett fast
+antal samtidiga anrop per scenario: /recipes, /menu, /admin/search,
+/menu/shopping och /admin/import. Importen är ett bakgrundsjobb, så den
+mäts både som svarstid (303 med job_id) och som jobbets tid tills det är
+klart. Resultatet sparas som JSON med commit-hash och kan jämföras med en
+tidigare körning via --compare.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks.dataset import add_arguments, generate, import_payload
+from benchmarks.stats import RESULTS_DIR, latency_summary, run_metadata
+
+SCENARIOS = ("recipes", "menu", "search", "shopping", "import")
+
+SEARCH_TERMS = ["kyckling", "lax", "pasta", "soppa", "potatis", "vegetariskt", "ugnsbakad", "köttbullar", "grädde", "linser"]
+
+Request = Callable[[Any, random.Random], Awaitable[Tuple[Any, str | None]]]
+
+
+def _scenarios(dataset: Dict[str, Any], import_size: int, seed: int) -> Dict[str, Request]:
+    profiles = list(range(1, int(dataset["profiles"]) + 1))
+    first_year, first_week = dataset["first_week"]
+    last_year, last_week = dataset["last_week"]
+    weeks = [(first_year, first_week), (last_year, last_week)]
+    import_counter = iter(range(10**9))
+
+    def week(rng: random.Random) -> Tuple[int, int]:
+        # Aktuell vecka oftast, annars den äldsta (båda finns i datasetet)
+        return weeks[1] if rng.random() < 0.8 else weeks[0]
+
+    async def recipes(client, rng):
+        return await client.get(f"/recipes?profile_id={rng.choice(profiles)}"), None
+
+    async def menu(client, rng):
+        year, wk = week(rng)
+        return await client.get(f"/menu?profile_id={rng.choice(profiles)}&week_number={wk}&year={year}"), None
+
+    async def search(client, rng):
+        params = {"q": rng.choice(SEARCH_TERMS), "profile_id": rng.choice(profiles)}
+        return await client.get("/admin/search", params=params), None
+
+    async def shopping(client, rng):
+        year, wk = week(rng)
+        data = {"profile_id": rng.choice(profiles), "week_number": wk, "year": year}
+        return await client.post("/menu/shopping", data=data), None
+
+    async def import_recipes(client, rng):
+        payload = import_payload(import_size, seed=seed + next(import_counter), start_index=10**6)
+        response = await client.post(
+            "/admin/import",
+            data={"profile_id": str(rng.choice(profiles))},
+            files={"file": ("bench.json", payload, "application/json")},
+        )
+        job_id = parse_qs(urlparse(response.headers.get("location", "")).query).get("job_id", [None])[0]
+        return response, job_id
+
+    return {"recipes": recipes, "menu": menu, "search": search, "shopping": shopping, "import": import_recipes}
+
+
+async def _wait_for_jobs(client, submitted: Dict[str, float], timeout: float = 600.0) -> List[float]:
+    """Vänta in importjobben; returnerar tid från inskick tills jobbet syns klart.
+
+    Jobbens egna tidsstämplar har sekundupplösning, så tiden mäts här med
+    pollintervallet som felmarginal.
+    """
+    durations: List[float] = []
+    pending = set(submitted)
+    deadline = time.monotonic() + timeout
+    while pending and time.monotonic() < deadline:
+        for job_id in list(pending):
+            job = (await client.get(f"/admin/jobs/{job_id}")).json()
+            if job["status"] in ("succeeded", "failed", "cancelled"):
+                pending.discard(job_id)
+                if job["status"] == "succeeded":
+                    durations.append(time.perf_counter() - submitted[job_id])
+        if pending:
+            await asyncio.sleep(0.05)
+    return durations
+
+
+async def _run_scenario(client, request: Request, count: int, concurrency: int, seed: int) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    sem = asyncio.Semaphore(concurrency)
+    samples: List[float] = []
+    statuses: Dict[str, int] = {}
+    job_ids: Dict[str, float] = {}
+    errors = 0
+
+    async def one() -> None:
+        nonlocal errors
+        async with sem:
+            start = time.perf_counter()
+            response, job_id = await request(client, rng)
+            samples.append(time.perf_counter() - start)
+            statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+            if response.status_code >= 400:
+                errors += 1
+            if job_id:
+                job_ids[job_id] = time.perf_counter()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(count)))
+    seconds = time.perf_counter() - started
+    result: Dict[str, Any] = {
+        "requests": count,
+        "concurrency": concurrency,
+        "errors": errors,
+        "statuses": statuses,
+        "seconds": round(seconds, 3),
+        "throughput_rps": round(count / seconds, 2) if seconds else 0.0,
+        "latency": latency_summary(samples),
+    }
+    if job_ids:
+        job_times = await _wait_for_jobs(client, job_ids)
+        result["jobs"] = {"submitted": len(job_ids), "succeeded": len(job_times), "duration": latency_summary(job_times)}
+    return result
+
+
+async def run(args: argparse.Namespace, dataset: Dict[str, Any]) -> Dict[str, Any]:
+    import httpx
+
+    from app import app
+
+    scenarios = _scenarios(dataset, args.import_size, args.seed)
+    selected = [name for name in SCENARIOS if name in args.scenarios]
+    results: Dict[str, Any] = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for index, name in enumerate(selected):
+            count = args.import_requests if name == "import" else args.requests
+            if name != "import":
+                await _run_scenario(client, scenarios[name], min(20, count), args.concurrency, args.seed)  # uppvärmning
+            results[name] = await _run_scenario(client, scenarios[name], count, args.concurrency, args.seed + index)
+    return results
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """Rader med förändring i p95 och genomströmning per scenario mot en tidigare körning."""
+    lines = [f"{'scenario':<10} {'p95 ms':>20} {'req/s':>20}"]
+    for name, result in current["scenarios"].items():
+        old = baseline.get("scenarios", {}).get(name)
+        if not old:
+            continue
+        p95, old_p95 = result["latency"].get("p95_ms", 0.0), old["latency"].get("p95_ms", 0.0)
+        rps, old_rps = result["throughput_rps"], old["throughput_rps"]
+        p95_delta = f"{(p95 - old_p95) / old_p95 * 100:+.1f}%" if old_p95 else "–"
+        rps_delta = f"{(rps - old_rps) / old_rps * 100:+.1f}%" if old_rps else "–"
+        lines.append(f"{name:<10} {p95:>9.2f} ({p95_delta:>7}) {rps:>9.1f} ({rps_delta:>7})")
+    return lines
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_arguments(parser)
+    parser.add_argument("--data-dir", type=Path, help="Befintlig DATA_DIR i stället för ett nytt temporärt dataset")
+    parser.add_argument("--requests", type=int, default=200, help="Anrop per scenario")
+    parser.add_argument("--concurrency", type=int, default=8, help="Samtidiga anrop")
+    parser.add_argument("--import-requests", type=int, default=10, help="Antal importer i import-scenariot")
+    parser.add_argument("--import-size", type=int, default=200, help="Recept per import")
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=SCENARIOS)
+    parser.add_argument("--out", type=Path, help="Resultatfil (standard: benchmarks/results/loadtest-<commit>.json)")
+    parser.add_argument("--compare", type=Path, help="Tidigare resultatfil att jämföra med")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="loadtest-") as tmp:
+        data_dir = args.data_dir or Path(tmp)
+        (data_dir / "images").mkdir(parents=True, exist_ok=True)
+        os.environ["DATA_DIR"] = str(data_dir)
+        if args.data_dir is None:
+            dataset = generate(args.profiles, args.recipes, args.years, args.seed)
+        else:
+            dataset = _describe(data_dir)
+        scenarios = asyncio.run(run(args, dataset))
+        from core.database import close_pools
+
+        close_pools()
+
+    meta = run_metadata()
+    result = {
+        "meta": {**meta, "args": {k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items()}},
+        "dataset": dataset,
+        "scenarios": scenarios,
+    }
+    out = args.out or RESULTS_DIR / f"loadtest-{meta['revision']}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, indent=2, ensure_ascii=False))
+    for name, scenario in scenarios.items():
+        latency = scenario["latency"]
+        print(
+            f"{name:<10} {scenario['throughput_rps']:>8.1f} req/s  p50 {latency.get('p50_ms', 0):>8.2f} ms  "
+            f"p95 {latency.get('p95_ms', 0):>8.2f} ms  p99 {latency.get('p99_ms', 0):>8.2f} ms  fel {scenario['errors']}"
+        )
+    if args.compare:
+        print("\n".join(compare(result, json.loads(args.compare.read_text()))))
+    print(f"Sparat: {out}")
+
+
+def _describe(data_dir: Path) -> Dict[str, Any]:
+    """Samma nycklar som generate() ger, lästa ur en befintlig databas."""
+    import sqlite3
+
+    conn = sqlite3.connect(data_dir / "app.db")
+    try:
+        profiles = conn.execute("SELECT COUNT(*) FROM profiles").fetchone()[0]
+        recipes = conn.execute("SELECT COUNT(*) FROM recipes").fetchone()[0]
+        weeks = conn.execute(
+            "SELECT year, week_number FROM menu_entries WHERE year IS NOT NULL GROUP BY year, week_number ORDER BY year, week_number"
+        ).fetchall()
+    finally:
+        conn.close()
+    iso = date.today().isocalendar()
+    fallback = [iso.year, iso.week]
+    return {
+        "profiles": profiles,
+        "recipes": recipes,
+        "weeks": len(weeks),
+        "first_week": list(weeks[0]) if weeks else fallback,
+        "last_week": list(weeks[-1]) if weeks else fallback,
+    }
+
+
+if __name__ == "__main__":
+    main()
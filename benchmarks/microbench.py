@@ -0,0 +1,278 @@
+"""Mikrobenchmarks för de heta funktionerna i servicelagret, med regressionsgräns.
+
+Kör:  python -m benchmarks.microbench                      # mät och jämför mot baslinjen
+      python -m benchmarks.microbench --save-baseline      # spara mätningen som ny baslinje
+      python -m benchmarks.microbench --sizes 10 1000 --only parse_amount ingredient_lines
+
+Varje funktion mäts på storlekarna 10–100 000 med fasta frön. Storleken är
+antal mängder/rader för de rena funktionerna, ingrediensrader för
+set_from_recipes och antal recept respektive menyrader i databasen för
+list_recipes, search_recipes och get_menu. Databaserna byggs med
+benchmarks.dataset, en per storlek, i en temporär katalog.
+
+Mätvärdet är medianen av flera varv. Baslinjen sparas som JSON
+(standard benchmarks/baselines/microbench.json) och ska tas fram på samma
+maskin som den jämförs på. En mätning som är mer än --threshold procent
+långsammare än baslinjen räknas som regression och ger exitkod 1. Gränsen kan
+sättas per mätning under "thresholds" i baslinjefilen.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from benchmarks.dataset import INGREDIENTS, _amount, generate, recipe_dict
+from benchmarks.stats import run_metadata
+
+DEFAULT_SIZES = (10, 100, 1_000, 10_000, 100_000)
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baselines" / "microbench.json"
+DEFAULT_THRESHOLD = 20.0
+# Skillnader under detta (sekunder) räknas aldrig som regression; de minsta storlekarna brusar
+MIN_DELTA = 50e-6
+
+# Receptsidans storlek i appen (settings.page_size)
+PAGE_SIZE = 48
+SEARCH_TERMS = ["kyckling", "pasta", "soppa", "potatis", "vegetariskt", "grädde"]
+
+Run = Callable[[], Any]
+Prepared = Tuple[Run, Optional[Run]]
+
+
+@dataclass
+class Bench:
+    name: str
+    prepare: Callable[[int, int], Prepared]
+    uses_db: bool = False
+
+
+# rena funktioner
+def _amounts(n: int, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    units = sorted({code for codes in INGREDIENTS.values() for code in codes})
+    return [_amount(rng, rng.choice(units)) for _ in range(n)]
+
+
+def _prepare_parse_amount(n: int, seed: int) -> Prepared:
+    from models.units import parse_amount
+    from services.shopping_service import shopping_service
+
+    amounts = _amounts(n, seed)
+
+    def run() -> None:
+        for amount in amounts:
+            shopping_service._parse_amount(amount)
+
+    # Tolkningen är memoiserad; töm cachen så att varje varv mäter själva tolkningen
+    return run, parse_amount.cache_clear
+
+
+def _prepare_ingredient_lines(n: int, seed: int) -> Prepared:
+    from models.recipe import parse_ingredient_lines
+
+    rng = random.Random(seed)
+    names = sorted(INGREDIENTS)
+    lines = []
+    for i in range(n):
+        name = rng.choice(names)
+        lines.append(f"{_amount(rng, rng.choice(INGREDIENTS[name]))} {name}" if i % 10 else f"  {name}  ")
+        if i % 25 == 0:
+            lines.append("")
+    text = "\n".join(lines)
+    return (lambda: parse_ingredient_lines(text)), None
+
+
+# databasberoende
+def _recipes_for_lines(n: int, seed: int) -> list:
+    from models.recipe import Ingredient, Recipe
+
+    rng = random.Random(seed)
+    recipes = []
+    lines = 0
+    index = 0
+    while lines < n:
+        data = recipe_dict(rng, index)
+        ingredients = [Ingredient(**ing) for ing in data["ingredients"]][: n - lines]
+        recipes.append(Recipe(id=index + 1, title=data["title"], ingredients=ingredients))
+        lines += len(ingredients)
+        index += 1
+    return recipes
+
+
+def _prepare_set_from_recipes(n: int, seed: int) -> Prepared:
+    from services.shopping_service import shopping_service
+
+    # Recepten behöver inte finnas i databasen; bidragsraderna har ingen främmande nyckel mot dem
+    recipes = _recipes_for_lines(n, seed)
+    return (lambda: shopping_service.set_from_recipes(recipes, profile_id=1)), None
+
+
+def _prepare_list_recipes(n: int, seed: int) -> Prepared:
+    from services.recipe_repository import recipe_repo
+
+    rng = random.Random(seed)
+
+    def run() -> None:
+        # En sida mitt i samlingen, som när man bläddrar
+        recipe_repo.list_recipes(profile_id=rng.randint(1, 4), after_id=rng.randint(0, n), limit=PAGE_SIZE)
+
+    return run, None
+
+
+def _prepare_search_recipes(n: int, seed: int) -> Prepared:
+    from services.recipe_repository import recipe_repo
+
+    rng = random.Random(seed)
+    return (lambda: recipe_repo.search_recipes(rng.choice(SEARCH_TERMS), profile_id=rng.randint(1, 4), limit=PAGE_SIZE)), None
+
+
+def _prepare_get_menu(n: int, seed: int) -> Prepared:
+    from services.menu_service import menu_service
+
+    rng = random.Random(seed)
+    return (lambda: menu_service.get_menu(profile_id=rng.randint(1, 4))), None
+
+
+BENCHES: Dict[str, Bench] = {
+    bench.name: bench
+    for bench in (
+        Bench("parse_amount", _prepare_parse_amount),
+        Bench("ingredient_lines", _prepare_ingredient_lines),
+        Bench("set_from_recipes", _prepare_set_from_recipes, uses_db=True),
+        Bench("list_recipes", _prepare_list_recipes, uses_db=True),
+        Bench("search_recipes", _prepare_search_recipes, uses_db=True),
+        Bench("get_menu", _prepare_get_menu, uses_db=True),
+    )
+}
+
+
+def measure(run: Run, reset: Optional[Run], min_rounds: int, min_time: float, max_rounds: int = 1000) -> Dict[str, float]:
+    """Kör tills både min_rounds varv och min_time sekunder har gått; returnerar sekunder per varv."""
+    if reset:
+        reset()
+    run()  # uppvärmning
+    samples: List[float] = []
+    total = 0.0
+    while len(samples) < max_rounds and (len(samples) < min_rounds or total < min_time):
+        if reset:
+            reset()
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        samples.append(elapsed)
+        total += elapsed
+    return {
+        "rounds": len(samples),
+        "median": statistics.median(samples),
+        "min": min(samples),
+        "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+    }
+
+
+def _use_database(root: Path, size: int, seed: int) -> Dict[str, object]:
+    """Peka appen mot en egen databas för storleken: size recept och ungefär lika många menyrader."""
+    from core.config import settings
+
+    data_dir = root / f"n{size}"
+    (data_dir / "images").mkdir(parents=True, exist_ok=True)
+    settings.data_dir = data_dir
+    profiles = 4
+    # Omkring 5,5 menyrader per profil och vecka
+    years = max(1 / 52, size / (profiles * 5.5 * 52))
+    return generate(profiles=profiles, recipes=size, years=years, seed=seed)
+
+
+def run(sizes: List[int], names: List[str], seed: int, min_rounds: int, min_time: float) -> Dict[str, Dict[str, Any]]:
+    results: Dict[str, Dict[str, Any]] = {}
+    db_benches = [name for name in names if BENCHES[name].uses_db]
+    with tempfile.TemporaryDirectory(prefix="microbench-") as tmp:
+        for size in sizes:
+            if db_benches:
+                dataset = _use_database(Path(tmp), size, seed)
+                print(f"n={size}: databas med {dataset['recipes']} recept och {dataset['menu_entries']} menyrader", file=sys.stderr)
+            for name in names:
+                prepared = BENCHES[name].prepare(size, seed)
+                result = measure(*prepared, min_rounds=min_rounds, min_time=min_time)
+                results[f"{name}@{size}"] = {"bench": name, "size": size, **result}
+                print(f"{name:<18} n={size:<7} {result['median'] * 1000:>10.3f} ms  ({result['rounds']} varv)", file=sys.stderr)
+        from core.database import close_pools
+
+        close_pools()
+    return results
+
+
+def check(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Regressioner mot baslinjen, som läsbara rader (tom lista om allt håller)."""
+    thresholds = baseline.get("thresholds", {})
+    regressions = []
+    for key, result in results.items():
+        old = baseline.get("results", {}).get(key)
+        if not old:
+            continue
+        limit = float(thresholds.get(key, thresholds.get(result["bench"], threshold)))
+        change = (result["median"] - old["median"]) / old["median"] * 100 if old["median"] else 0.0
+        if change > limit and result["median"] - old["median"] > MIN_DELTA:
+            regressions.append(
+                f"{key}: {old['median'] * 1000:.3f} ms → {result['median'] * 1000:.3f} ms ({change:+.1f}%, gräns {limit:.0f}%)"
+            )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="Datastorlekar att mäta på")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHES), help="Bara dessa mätningar")
+    parser.add_argument("--seed", type=int, default=1, help="Slumpfrö för data och anrop")
+    parser.add_argument("--min-rounds", type=int, default=5, help="Minsta antal mätvarv per funktion och storlek")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Minsta mättid i sekunder per funktion och storlek")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="Baslinjefil att jämföra med eller spara till")
+    parser.add_argument("--threshold", type=float, default=None, help=f"Tillåten försämring i procent (standard: baslinjens eller {DEFAULT_THRESHOLD:.0f})")
+    parser.add_argument("--save-baseline", action="store_true", help="Spara mätningen som ny baslinje i stället för att jämföra")
+    parser.add_argument("--out", type=Path, help="Spara även mätningen som JSON")
+    args = parser.parse_args()
+
+    names = [name for name in BENCHES if not args.only or name in args.only]
+    results = run(sorted(set(args.sizes)), names, args.seed, args.min_rounds, args.min_time)
+    document: Dict[str, Any] = {"meta": {**run_metadata(), "seed": args.seed}, "results": results}
+    if args.out:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        args.out.write_text(json.dumps(document, indent=2, ensure_ascii=False))
+
+    if args.save_baseline:
+        previous = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+        if previous.get("meta", {}).get("seed", args.seed) != args.seed:
+            previous = {}
+        document["threshold"] = args.threshold if args.threshold is not None else previous.get("threshold", DEFAULT_THRESHOLD)
+        document["thresholds"] = previous.get("thresholds", {})
+        # Behåll mätningar som inte kördes den här gången
+        document["results"] = {**previous.get("results", {}), **results}
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(document, indent=2, ensure_ascii=False))
+        print(f"Baslinje sparad: {args.baseline}")
+        return
+
+    if not args.baseline.exists():
+        print(f"Ingen baslinje i {args.baseline}; kör med --save-baseline först.")
+        return
+    baseline = json.loads(args.baseline.read_text())
+    if baseline.get("meta", {}).get("seed") != args.seed:
+        print(f"Baslinjen är mätt med seed {baseline.get('meta', {}).get('seed')}, inte {args.seed}; ingen jämförelse.")
+        sys.exit(2)
+    threshold = args.threshold if args.threshold is not None else float(baseline.get("threshold", DEFAULT_THRESHOLD))
+    regressions = check(results, baseline, threshold)
+    if regressions:
+        print(f"{len(regressions)} regression(er) mot baslinjen ({baseline['meta'].get('revision', '?')}):")
+        print("\n".join(regressions))
+        sys.exit(1)
+    print(f"Inga regressioner över gränsen mot baslinjen ({baseline['meta'].get('revision', '?')}).")
+
+
+if __name__ == "__main__":
+    main()
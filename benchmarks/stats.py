@@ -0,0 +1,62 @@
+"""Gemensamma hjälpare för benchmarks: percentiler och revisionsinfo."""
+from __future__ import annotations
+
+import math
+import platform
+import statistics
+import subprocess
+import time
+from pathlib import Path
+from typing import Dict, Sequence
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+def percentile(ordered: Sequence[float], p: float) -> float:
+    """Närmaste-rang-percentil ur en redan sorterad lista (p mellan 0 och 1)."""
+    if not ordered:
+        return 0.0
+    return ordered[max(0, min(len(ordered) - 1, math.ceil(p * len(ordered)) - 1))]
+
+
+def latency_summary(samples: Sequence[float]) -> Dict[str, float]:
+    """Latens i millisekunder: medel, p50, p90, p95, p99 och max."""
+    ordered = sorted(samples)
+    if not ordered:
+        return {"n": 0}
+    return {
+        "n": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 3),
+        "p90_ms": round(percentile(ordered, 0.90) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+def git_revision() -> str:
+    """Kort commit-hash med "-dirty" om arbetsträdet har ändringar, annars "unknown"."""
+    root = Path(__file__).resolve().parent.parent
+    try:
+        rev = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=root, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], cwd=root, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{rev}-dirty" if dirty else rev
+
+
+def run_metadata() -> Dict[str, object]:
+    return {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+    }
+
+
+__all__ = ["RESULTS_DIR", "git_revision", "latency_summary", "percentile", "run_metadata"]
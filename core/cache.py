@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Generic, Hashable, Iterable, Optional, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class LRUCache(Generic[K, V]):
+    """Trådsäker LRU-cache med maxstorlek, valfri TTL och träffstatistik.
+
+    ttl_seconds <= 0 betyder att poster aldrig blir för gamla. Varje nyckel har
+    en generation som ökar vid invalidering; läs generation() före laddningen
+    och skicka med den till put(), så släpps värden som invaliderats under tiden.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float = 0) -> None:
+        self.max_size = max(0, max_size)
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[K, tuple[float, V]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.stale_puts = 0
+        self._clock = 0
+        self._generations: Dict[K, int] = {}
+        self._cleared_at = 0
+
+    def generation(self, key: K) -> int:
+        with self._lock:
+            return max(self._generations.get(key, 0), self._cleared_at)
+
+    def get(self, key: K) -> Optional[V]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, value = entry
+            if self.ttl_seconds > 0 and time.monotonic() - stored_at > self.ttl_seconds:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: K, value: V, generation: int | None = None) -> None:
+        if self.max_size == 0:
+            return
+        with self._lock:
+            if generation is not None and generation != max(self._generations.get(key, 0), self._cleared_at):
+                self.stale_puts += 1
+                return
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, keys: Iterable[K]) -> None:
+        with self._lock:
+            for key in keys:
+                self._clock += 1
+                self._generations[key] = self._clock
+                if self._data.pop(key, None) is not None:
+                    self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self.invalidations += len(self._data)
+            self._data.clear()
+            self._clock += 1
+            self._cleared_at = self._clock
+            self._generations.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, float | int]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "stale_puts": self.stale_puts,
+            }
+
+
+__all__ = ["LRUCache"]
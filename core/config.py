@@ -9,11 +9,35 @@ class Settings:
 
     def __init__(self) -> None:
         self.base_dir = Path(__file__).resolve().parent.parent
-        self.data_dir = self.base_dir / "data"
+        self.data_dir = Path(os.getenv("DATA_DIR", self.base_dir / "data"))
         self.static_dir = self.base_dir / "static"
         self.template_dir = self.base_dir / "templates"
         self.database_url = os.getenv("DATABASE_URL", f"sqlite:///{self.data_dir / 'app.db'}")
         self.debug = os.getenv("DEBUG", "false").lower() == "true"
+        self.db_pool_size = int(os.getenv("DB_POOL_SIZE", "8"))
+        self.db_pool_timeout = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+        self.db_cache_size_kib = int(os.getenv("DB_CACHE_SIZE_KIB", "16384"))
+        self.db_mmap_size = int(os.getenv("DB_MMAP_SIZE", str(128 * 1024 * 1024)))
+        self.db_executor_workers = int(os.getenv("DB_EXECUTOR_WORKERS", str(self.db_pool_size)))
+        self.recipe_cache_size = int(os.getenv("RECIPE_CACHE_SIZE", "512"))
+        self.recipe_cache_ttl = float(os.getenv("RECIPE_CACHE_TTL", "300"))
+        self.import_batch_size = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+        self.backup_pages_per_step = int(os.getenv("BACKUP_PAGES_PER_STEP", "256"))
+        self.backup_step_sleep = float(os.getenv("BACKUP_STEP_SLEEP", "0.005"))
+        self.backup_workers = int(os.getenv("BACKUP_WORKERS", str(min(4, os.cpu_count() or 1))))
+        self.upload_max_bytes = int(os.getenv("UPLOAD_MAX_BYTES", str(15 * 1024 * 1024)))
+        self.image_workers = int(os.getenv("IMAGE_WORKERS", "2"))
+        self.image_thumb_size = (480, 270)
+        self.image_widths = tuple(int(w) for w in os.getenv("IMAGE_WIDTHS", "640,1280,1920").split(","))
+        self.image_quality = int(os.getenv("IMAGE_QUALITY", "80"))
+        self.job_workers = int(os.getenv("JOB_WORKERS", "2"))
+        self.job_queue_size = int(os.getenv("JOB_QUEUE_SIZE", "16"))
+        self.import_max_record_bytes = int(os.getenv("IMPORT_MAX_RECORD_BYTES", str(1024 * 1024)))
+        self.page_size = int(os.getenv("PAGE_SIZE", "48"))
+        self.max_page_size = int(os.getenv("MAX_PAGE_SIZE", "500"))
+        self.sql_profile = os.getenv("SQL_PROFILE", "false").lower() == "true"
+        self.sql_profile_samples = int(os.getenv("SQL_PROFILE_SAMPLES", "512"))
+        self.sql_profile_recent = int(os.getenv("SQL_PROFILE_RECENT", "50"))
 
 
 settings = Settings()
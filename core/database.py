@@ -1,186 +1,487 @@
 from __future__ import annotations
 
+import asyncio
+import functools
 import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar, copy_context
 from pathlib import Path
 from contextlib import contextmanager
-from typing import Generator
+from typing import Any, AsyncGenerator, Callable, Dict, Generator, List, TypeVar
 
 from core.config import settings
+from core.metrics import current_timer
+from core.sql_profiler import sql_profiler
 
+# Anslutning som är aktiv i aktuell kontext (request eller yttre connection_scope)
+_current_connection: ContextVar[sqlite3.Connection | None] = ContextVar("current_connection", default=None)
 
-def get_connection(db_path: Path | None = None) -> sqlite3.Connection:
-    """Skapa en SQLite-anslutning mot den lokala databasen."""
-    target = db_path or settings.data_dir / "app.db"
-    target.parent.mkdir(parents=True, exist_ok=True)
-    connection = sqlite3.connect(target)
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor som lägger SQLite-tiden (execute och radhämtning) på pågående requests timer."""
+
+    def execute(self, sql, parameters=()):
+        timer = current_timer.get()
+        if timer is None:
+            return super().execute(sql, parameters)
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            timer.sql += time.perf_counter() - start
+
+    def executemany(self, sql, seq_of_parameters):
+        timer = current_timer.get()
+        if timer is None:
+            return super().executemany(sql, seq_of_parameters)
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            timer.sql += time.perf_counter() - start
+
+    def fetchone(self):
+        timer = current_timer.get()
+        if timer is None:
+            return super().fetchone()
+        start = time.perf_counter()
+        try:
+            return super().fetchone()
+        finally:
+            timer.sql += time.perf_counter() - start
+
+    def fetchmany(self, size=None):
+        timer = current_timer.get()
+        if timer is None:
+            return super().fetchmany(self.arraysize if size is None else size)
+        start = time.perf_counter()
+        try:
+            return super().fetchmany(self.arraysize if size is None else size)
+        finally:
+            timer.sql += time.perf_counter() - start
+
+    def fetchall(self):
+        timer = current_timer.get()
+        if timer is None:
+            return super().fetchall()
+        start = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            timer.sql += time.perf_counter() - start
+
+    def __next__(self):
+        timer = current_timer.get()
+        if timer is None:
+            return super().__next__()
+        start = time.perf_counter()
+        try:
+            return super().__next__()
+        finally:
+            timer.sql += time.perf_counter() - start
+
+
+class ProfiledCursor(TimedCursor):
+    """TimedCursor som rapporterar varje sats till sql_profiler.
+
+    Tiden omfattar execute och radhämtning. Satsen rapporteras när cursorn
+    är uttömd, kör nästa sats, stängs eller släpps.
+    """
+
+    _sql: str | None = None
+    _elapsed = 0.0
+    _rows = 0
+
+    def _flush(self) -> None:
+        if self._sql is not None:
+            sql_profiler.record(self._sql, self._elapsed, self._rows)
+            self._sql = None
+
+    def execute(self, sql, parameters=()):
+        self._flush()
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._sql, self._elapsed, self._rows = sql, time.perf_counter() - start, 0
+            if self.description is None:  # inga rader att hämta (skrivning, DDL eller fel)
+                self._rows = max(self.rowcount, 0)
+                self._flush()
+
+    def executemany(self, sql, seq_of_parameters):
+        self._flush()
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._sql, self._elapsed, self._rows = sql, time.perf_counter() - start, max(self.rowcount, 0)
+            self._flush()
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._elapsed += time.perf_counter() - start
+        if row is None:
+            self._flush()
+        else:
+            self._rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        start = time.perf_counter()
+        rows = super().fetchmany(size)
+        self._elapsed += time.perf_counter() - start
+        self._rows += len(rows)
+        if len(rows) < size:
+            self._flush()
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._elapsed += time.perf_counter() - start
+        self._rows += len(rows)
+        self._flush()
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._elapsed += time.perf_counter() - start
+            self._flush()
+            raise
+        self._elapsed += time.perf_counter() - start
+        self._rows += 1
+        return row
+
+    def close(self):
+        self._flush()
+        super().close()
+
+    def __del__(self):
+        self._flush()
+
+
+class TimedConnection(sqlite3.Connection):
+    """Anslutning vars genvägar (execute, executemany) går via TimedCursor.
+
+    Med SQL-profileringen påslagen skapas ProfiledCursor i stället.
+    """
+
+    def cursor(self, factory=None):
+        if factory is None:
+            factory = ProfiledCursor if sql_profiler.enabled else TimedCursor
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def _default_db_path() -> Path:
+    return settings.data_dir / "app.db"
+
+
+def _configure(connection: sqlite3.Connection) -> sqlite3.Connection:
+    """Sätt pragmas för långlivade anslutningar (WAL, cache och mmap)."""
     connection.row_factory = sqlite3.Row
+    connection.execute("PRAGMA journal_mode = WAL")
+    connection.execute("PRAGMA synchronous = NORMAL")
+    connection.execute("PRAGMA foreign_keys = ON")
+    connection.execute(f"PRAGMA cache_size = -{int(settings.db_cache_size_kib)}")
+    connection.execute(f"PRAGMA mmap_size = {int(settings.db_mmap_size)}")
+    connection.execute("PRAGMA temp_store = MEMORY")
+    connection.execute("PRAGMA busy_timeout = 5000")
     return connection
 
 
+def get_connection(db_path: Path | None = None) -> sqlite3.Connection:
+    """Skapa en ny, konfigurerad SQLite-anslutning mot den lokala databasen."""
+    target = db_path or _default_db_path()
+    target.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(target, check_same_thread=False, factory=TimedConnection)
+    return _configure(connection)
+
+
+class ConnectionPool:
+    """Trådsäker pool av långlivade anslutningar med tak och statistik."""
+
+    def __init__(self, db_path: Path, max_size: int, timeout: float) -> None:
+        self.db_path = db_path
+        self.max_size = max(1, max_size)
+        self.timeout = timeout
+        self._idle: List[sqlite3.Connection] = []
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._created = 0
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+
+    def acquire(self, block: bool = True) -> sqlite3.Connection | None:
+        """Låna en anslutning. Med block=False returneras None om poolen är full."""
+        start = time.perf_counter()
+        waited = False
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Anslutningspoolen är stängd")
+                if self._idle:
+                    conn = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    conn = None
+                    break
+                if not block:
+                    return None
+                waited = True
+                remaining = self.timeout - (time.perf_counter() - start)
+                if remaining <= 0 or not self._cond.wait(remaining):
+                    if not self._idle and self._size >= self.max_size:
+                        raise TimeoutError("Ingen ledig databasanslutning inom timeout")
+            self._checkouts += 1
+            if waited:
+                self._waits += 1
+                self._wait_time += time.perf_counter() - start
+        if conn is None:
+            try:
+                conn = sqlite3.connect(self.db_path, check_same_thread=False, factory=TimedConnection)
+                _configure(conn)
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._created += 1
+        return conn
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        # Släng okommitade ändringar så nästa lån får en ren anslutning
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            conn.close()
+            return
+        with self._cond:
+            if self._closed:
+                self._size -= 1
+                conn.close()
+                return
+            self._idle.append(conn)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self) -> Generator[sqlite3.Connection, None, None]:
+        conn = self.acquire()
+        assert conn is not None
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn in idle:
+            conn.close()
+
+    def stats(self) -> Dict[str, float | int]:
+        with self._cond:
+            return {
+                "max_size": self.max_size,
+                "connections": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "created": self._created,
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "wait_time_ms": round(self._wait_time * 1000, 3),
+            }
+
+
+_pools: Dict[Path, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path: Path | None = None) -> ConnectionPool:
+    """Hämta (eller skapa) poolen för en databasfil."""
+    target = (db_path or _default_db_path()).resolve()
+    pool = _pools.get(target)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(target)
+            if pool is None:
+                pool = ConnectionPool(target, settings.db_pool_size, settings.db_pool_timeout)
+                _pools[target] = pool
+    return pool
+
+
+def close_pools() -> None:
+    """Stäng alla pooler, t.ex. vid nedstängning av appen."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+def pool_stats() -> Dict[str, Dict[str, float | int]]:
+    return {str(path): pool.stats() for path, pool in list(_pools.items())}
+
+
 @contextmanager
 def connection_scope(db_path: Path | None = None) -> Generator[sqlite3.Connection, None, None]:
-    """Enkel context-manager för att öppna/stänga anslutningar."""
-    conn = get_connection(db_path)
+    """Låna en anslutning ur poolen, eller återanvänd den som redan är aktiv i kontexten."""
+    if db_path is None:
+        current = _current_connection.get()
+        if current is not None:
+            yield current
+            return
+    pool = get_pool(db_path)
+    conn = pool.acquire()
+    assert conn is not None
+    token = _current_connection.set(conn) if db_path is None else None
+    try:
+        yield conn
+    finally:
+        if token is not None:
+            _current_connection.reset(token)
+        pool.release(conn)
+
+
+async def request_connection() -> AsyncGenerator[sqlite3.Connection, None]:
+    """FastAPI-beroende: en anslutning per request som alla services delar via connection_scope."""
+    current = _current_connection.get()
+    if current is not None:
+        yield current
+        return
+    pool = get_pool()
+    # Vänta på ledig anslutning i en tråd så att event-loopen inte blockeras
+    conn = pool.acquire(block=False) or await asyncio.to_thread(pool.acquire)
+    token = _current_connection.set(conn)
     try:
         yield conn
     finally:
-        conn.close()
+        _current_connection.reset(token)
+        pool.release(conn)
+
+
+T = TypeVar("T")
+
+_db_executor: ThreadPoolExecutor | None = None
+_db_executor_lock = threading.Lock()
+
+
+def get_db_executor() -> ThreadPoolExecutor:
+    """Begränsad trådpool för blockerande SQLite-arbete utanför event-loopen."""
+    global _db_executor
+    if _db_executor is None:
+        with _db_executor_lock:
+            if _db_executor is None:
+                _db_executor = ThreadPoolExecutor(
+                    max_workers=max(1, settings.db_executor_workers), thread_name_prefix="db"
+                )
+    return _db_executor
+
+
+async def run_in_db(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Kör func i DB-trådpoolen med aktuell kontext, så request-anslutningen följer med."""
+    loop = asyncio.get_running_loop()
+    ctx = copy_context()
+    return await loop.run_in_executor(get_db_executor(), functools.partial(ctx.run, func, *args, **kwargs))
+
+
+def shutdown_db_executor() -> None:
+    global _db_executor
+    with _db_executor_lock:
+        executor, _db_executor = _db_executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+
+# Fulltextindex över recept; diakritiska tecken viks bort (å/ä → a, ö → o)
+_SEARCH_INDEX_DDL = (
+    "CREATE VIRTUAL TABLE recipes_fts USING fts5("
+    "title, description, ingredients, tags, steps, "
+    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+)
+
+_SEARCH_INDEX_SELECT = """
+    SELECT r.id, r.title, COALESCE(r.description, ''),
+        COALESCE((SELECT group_concat(name, ' ') FROM ingredients WHERE recipe_id = r.id), ''),
+        COALESCE((SELECT group_concat(tag, ' ') FROM tags WHERE recipe_id = r.id), ''),
+        COALESCE((SELECT group_concat(text, ' ') FROM steps WHERE recipe_id = r.id), '')
+    FROM recipes r
+"""
+
+
+def search_index_exists(conn: sqlite3.Connection) -> bool:
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'recipes_fts'").fetchone()
+    return row is not None
+
+
+def rebuild_search_index(conn: sqlite3.Connection) -> None:
+    """Skapa om sökindexet från grunden (committar inte).
+
+    DROP/CREATE committar var för sig utanför en explicit transaktion; använd
+    bara från migreringarna, som körs inom BEGIN. Vid drift: refill_search_index.
+    """
+    conn.execute("DROP TABLE IF EXISTS recipes_fts")
+    conn.execute(_SEARCH_INDEX_DDL)
+    conn.execute(
+        "INSERT INTO recipes_fts (rowid, title, description, ingredients, tags, steps)" + _SEARCH_INDEX_SELECT
+    )
+
+
+def refill_search_index(conn: sqlite3.Connection) -> None:
+    """Töm och fyll sökindexet på nytt utan att röra tabellen (committar inte).
+
+    Anroparen håller en transaktion, så samtidiga sökningar ser det gamla
+    indexet tills bytet committas.
+    """
+    conn.execute("DELETE FROM recipes_fts")
+    conn.execute(
+        "INSERT INTO recipes_fts (rowid, title, description, ingredients, tags, steps)" + _SEARCH_INDEX_SELECT
+    )
+
+
+def reindex_recipes(conn: sqlite3.Connection, recipe_ids: List[int]) -> None:
+    """Synka sökindexet för givna recept inom anroparens transaktion."""
+    params = [(recipe_id,) for recipe_id in recipe_ids]
+    conn.executemany("DELETE FROM recipes_fts WHERE rowid = ?", params)
+    conn.executemany(
+        "INSERT INTO recipes_fts (rowid, title, description, ingredients, tags, steps)"
+        + _SEARCH_INDEX_SELECT
+        + " WHERE r.id = ?",
+        params,
+    )
+
+
+def unindex_recipes(conn: sqlite3.Connection, recipe_ids: List[int]) -> None:
+    conn.executemany("DELETE FROM recipes_fts WHERE rowid = ?", [(rid,) for rid in recipe_ids])
 
 
 def init_db() -> None:
-    """Initiera tabeller om de inte finns och seeda grunddata."""
-    schema = [
-        """
-        CREATE TABLE IF NOT EXISTS profiles (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            email TEXT,
-            avatar_url TEXT,
-            theme_preference TEXT
-        )
-        """,
-        """
-        CREATE TABLE IF NOT EXISTS recipes (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            description TEXT,
-            servings INTEGER,
-            image_url TEXT,
-            created_by INTEGER,
-            archived INTEGER DEFAULT 0
-        )
-        """,
-        """
-        CREATE TABLE IF NOT EXISTS ingredients (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            recipe_id INTEGER NOT NULL,
-            name TEXT NOT NULL,
-            amount TEXT
-        )
-        """,
-        """
-        CREATE TABLE IF NOT EXISTS steps (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            recipe_id INTEGER NOT NULL,
-            position INTEGER NOT NULL,
-            text TEXT NOT NULL
-        )
-        """,
-        """
-        CREATE TABLE IF NOT EXISTS tags (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            recipe_id INTEGER NOT NULL,
-            tag TEXT NOT NULL
-        )
-        """,
-        """
-        CREATE TABLE IF NOT EXISTS menu_entries (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            profile_id INTEGER NOT NULL,
-            day TEXT NOT NULL,
-            week_number INTEGER,
-            year INTEGER,
-            recipe_id INTEGER
-        )
-        """,
-        """
-        CREATE TABLE IF NOT EXISTS menu_meta (
-            profile_id INTEGER PRIMARY KEY,
-            responsible_profile_id INTEGER,
-            label TEXT,
-            week_number INTEGER,
-            year INTEGER
-        )
-        """,
-        """
-        CREATE TABLE IF NOT EXISTS shopping_items (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            profile_id INTEGER NOT NULL,
-            name TEXT NOT NULL,
-            amount TEXT,
-            checked INTEGER DEFAULT 0
-        )
-        """,
-    ]
+    """Migrera databasen till senaste schemaversion (en pragma-läsning om den redan är aktuell)."""
+    from core.migrations import run_migrations
 
     with connection_scope() as conn:
-        cur = conn.cursor()
-        for stmt in schema:
-            cur.execute(stmt)
-        conn.commit()
-
-        # Säkerställ att kolumn week_number finns (för befintliga databaser)
-        cur.execute("PRAGMA table_info(menu_meta)")
-        cols = [row[1] for row in cur.fetchall()]
-        if "week_number" not in cols:
-            cur.execute("ALTER TABLE menu_meta ADD COLUMN week_number INTEGER")
-            conn.commit()
-        if "year" not in cols:
-            cur.execute("ALTER TABLE menu_meta ADD COLUMN year INTEGER")
-            conn.commit()
-        cur.execute("PRAGMA table_info(menu_entries)")
-        cols_entries = [row[1] for row in cur.fetchall()]
-        if "year" not in cols_entries:
-            cur.execute("ALTER TABLE menu_entries ADD COLUMN year INTEGER")
-            conn.commit()
-        # Lägg till archived i recipes om den saknas
-        cur.execute("PRAGMA table_info(recipes)")
-        cols_recipes = [row[1] for row in cur.fetchall()]
-        if "archived" not in cols_recipes:
-            cur.execute("ALTER TABLE recipes ADD COLUMN archived INTEGER DEFAULT 0")
-            conn.commit()
-        # Lägg till theme_preference i profiler om den saknas
-        cur.execute("PRAGMA table_info(profiles)")
-        cols_profiles = [row[1] for row in cur.fetchall()]
-        if "theme_preference" not in cols_profiles:
-            cur.execute("ALTER TABLE profiles ADD COLUMN theme_preference TEXT")
-            conn.commit()
-
-        # Seed profiler om tomt
-        cur.execute("SELECT COUNT(*) FROM profiles")
-        if cur.fetchone()[0] == 0:
-            cur.executemany(
-                "INSERT INTO profiles (id, name, email, avatar_url) VALUES (?, ?, ?, ?)",
-                [
-                    (1, "Per", "per@example.com", None),
-                    (2, "Marika", "marika@example.com", None),
-                    (3, "Sally", "sally@example.com", None),
-                    (4, "Jack", "jack@example.com", None),
-                ],
-            )
-            conn.commit()
-
-        # Säkerställ att kolumn week_number finns i menu_entries
-        cur.execute("PRAGMA table_info(menu_entries)")
-        cols = [row[1] for row in cur.fetchall()]
-        if "week_number" not in cols:
-            cur.execute("ALTER TABLE menu_entries ADD COLUMN week_number INTEGER")
-            conn.commit()
-
-        # Seed ett exempelrecept om tomt
-        cur.execute("SELECT COUNT(*) FROM recipes")
-        if cur.fetchone()[0] == 0:
-            cur.execute(
-                "INSERT INTO recipes (title, description, servings, image_url, created_by) VALUES (?, ?, ?, ?, ?)",
-                ("Exempelrecept", "Ett första recept att byta ut senare.", 2, None, 1),
-            )
-            recipe_id = cur.lastrowid
-            cur.execute(
-                "INSERT INTO ingredients (recipe_id, name, amount) VALUES (?, ?, ?)",
-                (recipe_id, "Potatis", "2 st"),
-            )
-            cur.executemany(
-                "INSERT INTO steps (recipe_id, position, text) VALUES (?, ?, ?)",
-                [
-                    (recipe_id, 1, "Skala potatis"),
-                    (recipe_id, 2, "Koka tills mjuk"),
-                ],
-            )
-            cur.executemany(
-                "INSERT INTO tags (recipe_id, tag) VALUES (?, ?)",
-                [
-                    (recipe_id, "enkelt"),
-                    (recipe_id, "snabbt"),
-                ],
-            )
-            conn.commit()
+        run_migrations(conn)
@@ -0,0 +1,194 @@
+"""Requestmätning: latens per route, pågående requests, statuskoder och tid per fas.
+
+Middlewaren är ren ASGI (ingen BaseHTTPMiddleware) och uppdaterar bara några
+räknare per request. SQL-tid läggs till av anslutningarna i core.database och
+malltid av core.templating; resten av requestens tid räknas som Python.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, List, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Sekunder; sista hinken (+Inf) läggs till vid utskrift
+LATENCY_BUCKETS: Tuple[float, ...] = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PHASES = ("sql", "template", "python")
+
+_PREFIX = "virentoftakoket"
+_UNMATCHED = "<unmatched>"
+
+
+class RequestTimer:
+    """Tid per fas för en pågående request (delas med DB-trådarna via kontexten)."""
+
+    __slots__ = ("sql", "template")
+
+    def __init__(self) -> None:
+        self.sql = 0.0
+        self.template = 0.0
+
+
+current_timer: ContextVar[RequestTimer | None] = ContextVar("current_timer", default=None)
+
+
+class _Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class RequestMetrics:
+    """Räknare per (metod, route) som renderas i Prometheus textformat."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._latency: Dict[Tuple[str, str], _Histogram] = {}
+        self._statuses: Dict[Tuple[str, str, int], int] = {}
+        self._phases: Dict[Tuple[str, str], List[float]] = {}
+
+    def started(self) -> None:
+        with self._lock:
+            self._in_flight += 1
+
+    def finished(self, method: str, route: str, status: int, elapsed: float, timer: RequestTimer) -> None:
+        key = (method, route)
+        sql = timer.sql
+        template = timer.template
+        python = max(0.0, elapsed - sql - template)
+        with self._lock:
+            self._in_flight -= 1
+            histogram = self._latency.get(key)
+            if histogram is None:
+                histogram = self._latency[key] = _Histogram()
+            histogram.observe(elapsed)
+            status_key = (method, route, status)
+            self._statuses[status_key] = self._statuses.get(status_key, 0) + 1
+            phases = self._phases.get(key)
+            if phases is None:
+                phases = self._phases[key] = [0.0, 0.0, 0.0]
+            phases[0] += sql
+            phases[1] += template
+            phases[2] += python
+
+    def render(self) -> str:
+        with self._lock:
+            in_flight = self._in_flight
+            latency = {key: (list(h.counts), h.total, h.count) for key, h in self._latency.items()}
+            statuses = dict(self._statuses)
+            phases = {key: list(values) for key, values in self._phases.items()}
+
+        lines = [
+            f"# HELP {_PREFIX}_http_requests_in_flight Requests som hanteras just nu.",
+            f"# TYPE {_PREFIX}_http_requests_in_flight gauge",
+            f"{_PREFIX}_http_requests_in_flight {in_flight}",
+            f"# HELP {_PREFIX}_http_request_duration_seconds Latens per route.",
+            f"# TYPE {_PREFIX}_http_request_duration_seconds histogram",
+        ]
+        for (method, route), (counts, total, count) in sorted(latency.items()):
+            labels = f'method="{method}",route="{_escape(route)}"'
+            cumulative = 0
+            for bound, bucket in zip(LATENCY_BUCKETS, counts):
+                cumulative += bucket
+                lines.append(f'{_PREFIX}_http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{_PREFIX}_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f"{_PREFIX}_http_request_duration_seconds_sum{{{labels}}} {total:.6f}")
+            lines.append(f"{_PREFIX}_http_request_duration_seconds_count{{{labels}}} {count}")
+
+        lines.append(f"# HELP {_PREFIX}_http_responses_total Svar per route och statuskod.")
+        lines.append(f"# TYPE {_PREFIX}_http_responses_total counter")
+        for (method, route, status), value in sorted(statuses.items()):
+            lines.append(f'{_PREFIX}_http_responses_total{{method="{method}",route="{_escape(route)}",status="{status}"}} {value}')
+
+        lines.append(f"# HELP {_PREFIX}_http_request_phase_seconds_total Requesttid uppdelad på SQL, mallrendering och Python.")
+        lines.append(f"# TYPE {_PREFIX}_http_request_phase_seconds_total counter")
+        for (method, route), values in sorted(phases.items()):
+            for phase, value in zip(PHASES, values):
+                lines.append(
+                    f'{_PREFIX}_http_request_phase_seconds_total{{method="{method}",route="{_escape(route)}",phase="{phase}"}} {value:.6f}'
+                )
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self._latency.clear()
+            self._statuses.clear()
+            self._phases.clear()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def route_label(scope: Scope) -> str:
+    """Routens mall (t.ex. /recipes/{recipe_id}) så att etiketterna inte växer med id:n."""
+    route = scope.get("route")
+    if route is not None:
+        return getattr(route, "path", _UNMATCHED)
+    # Mounts (/static, /uploads) sätter root_path till sin egen sökväg
+    mount = scope.get("root_path", "")[len(scope.get("app_root_path", "")) :]
+    return mount or _UNMATCHED
+
+
+class MetricsMiddleware:
+    """Mät varje HTTP-request; statuskoden tas från http.response.start."""
+
+    def __init__(self, app: ASGIApp, metrics: RequestMetrics | None = None) -> None:
+        self.app = app
+        self.metrics = metrics or request_metrics
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+        timer = RequestTimer()
+        token = current_timer.set(timer)
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        self.metrics.started()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            current_timer.reset(token)
+            self.metrics.finished(scope["method"], route_label(scope), status, elapsed, timer)
+
+
+def add_template_time(seconds: float) -> None:
+    timer = current_timer.get()
+    if timer is not None:
+        timer.template += seconds
+
+
+request_metrics = RequestMetrics()
+
+__all__ = [
+    "LATENCY_BUCKETS",
+    "MetricsMiddleware",
+    "PHASES",
+    "RequestMetrics",
+    "RequestTimer",
+    "add_template_time",
+    "current_timer",
+    "request_metrics",
+    "route_label",
+]
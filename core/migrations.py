@@ -0,0 +1,487 @@
+"""Versionerade schemamigreringar styrda av PRAGMA user_version."""
+from __future__ import annotations
+
+import sqlite3
+from datetime import date
+from typing import Callable, Dict, List
+
+from core.database import rebuild_search_index
+
+
+def _columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+
+
+def _add_missing_column(conn: sqlite3.Connection, table: str, column: str, ddl: str) -> None:
+    if column not in _columns(conn, table):
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+
+
+def _v1_base_schema(conn: sqlite3.Connection) -> None:
+    """Grundschema, kolumner som lagts till i efterhand och seed-data."""
+    schema = [
+        """
+        CREATE TABLE IF NOT EXISTS profiles (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            email TEXT,
+            avatar_url TEXT,
+            theme_preference TEXT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS recipes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            description TEXT,
+            servings INTEGER,
+            image_url TEXT,
+            created_by INTEGER,
+            archived INTEGER DEFAULT 0
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS ingredients (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            recipe_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            amount TEXT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS steps (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            recipe_id INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            text TEXT NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS tags (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            recipe_id INTEGER NOT NULL,
+            tag TEXT NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS menu_entries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            profile_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            week_number INTEGER,
+            year INTEGER,
+            recipe_id INTEGER
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS menu_meta (
+            profile_id INTEGER PRIMARY KEY,
+            responsible_profile_id INTEGER,
+            label TEXT,
+            week_number INTEGER,
+            year INTEGER
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS shopping_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            profile_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            amount TEXT,
+            checked INTEGER DEFAULT 0
+        )
+        """,
+    ]
+    for stmt in schema:
+        conn.execute(stmt)
+
+    # Databaser skapade innan migreringarna kan sakna senare tillagda kolumner
+    _add_missing_column(conn, "menu_meta", "week_number", "INTEGER")
+    _add_missing_column(conn, "menu_meta", "year", "INTEGER")
+    _add_missing_column(conn, "menu_entries", "week_number", "INTEGER")
+    _add_missing_column(conn, "menu_entries", "year", "INTEGER")
+    _add_missing_column(conn, "recipes", "archived", "INTEGER DEFAULT 0")
+    _add_missing_column(conn, "profiles", "theme_preference", "TEXT")
+
+    # Seed profiler om tomt
+    if conn.execute("SELECT COUNT(*) FROM profiles").fetchone()[0] == 0:
+        conn.executemany(
+            "INSERT INTO profiles (id, name, email, avatar_url) VALUES (?, ?, ?, ?)",
+            [
+                (1, "Per", "per@example.com", None),
+                (2, "Marika", "marika@example.com", None),
+                (3, "Sally", "sally@example.com", None),
+                (4, "Jack", "jack@example.com", None),
+            ],
+        )
+
+    # Seed ett exempelrecept om tomt
+    if conn.execute("SELECT COUNT(*) FROM recipes").fetchone()[0] == 0:
+        cur = conn.execute(
+            "INSERT INTO recipes (title, description, servings, image_url, created_by) VALUES (?, ?, ?, ?, ?)",
+            ("Exempelrecept", "Ett första recept att byta ut senare.", 2, None, 1),
+        )
+        recipe_id = cur.lastrowid
+        conn.execute(
+            "INSERT INTO ingredients (recipe_id, name, amount) VALUES (?, ?, ?)",
+            (recipe_id, "Potatis", "2 st"),
+        )
+        conn.executemany(
+            "INSERT INTO steps (recipe_id, position, text) VALUES (?, ?, ?)",
+            [
+                (recipe_id, 1, "Skala potatis"),
+                (recipe_id, 2, "Koka tills mjuk"),
+            ],
+        )
+        conn.executemany(
+            "INSERT INTO tags (recipe_id, tag) VALUES (?, ?)",
+            [
+                (recipe_id, "enkelt"),
+                (recipe_id, "snabbt"),
+            ],
+        )
+
+
+def _rebuild_table(conn: sqlite3.Connection, table: str, ddl: str, columns: str, where: str) -> None:
+    """Bygg om en tabell med ny DDL (SQLite kan inte lägga till FK med ALTER TABLE)."""
+    conn.execute(f"ALTER TABLE {table} RENAME TO {table}_old")
+    conn.execute(ddl)
+    conn.execute(f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {table}_old WHERE {where}")
+    conn.execute(f"DROP TABLE {table}_old")
+
+
+def _v2_foreign_keys(conn: sqlite3.Connection) -> None:
+    """Främmande nycklar med ON DELETE CASCADE; föräldralösa rader släpps."""
+    _rebuild_table(
+        conn,
+        "ingredients",
+        """
+        CREATE TABLE ingredients (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            recipe_id INTEGER NOT NULL REFERENCES recipes(id) ON DELETE CASCADE,
+            name TEXT NOT NULL,
+            amount TEXT
+        )
+        """,
+        "id, recipe_id, name, amount",
+        "recipe_id IN (SELECT id FROM recipes)",
+    )
+    _rebuild_table(
+        conn,
+        "steps",
+        """
+        CREATE TABLE steps (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            recipe_id INTEGER NOT NULL REFERENCES recipes(id) ON DELETE CASCADE,
+            position INTEGER NOT NULL,
+            text TEXT NOT NULL
+        )
+        """,
+        "id, recipe_id, position, text",
+        "recipe_id IN (SELECT id FROM recipes)",
+    )
+    _rebuild_table(
+        conn,
+        "tags",
+        """
+        CREATE TABLE tags (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            recipe_id INTEGER NOT NULL REFERENCES recipes(id) ON DELETE CASCADE,
+            tag TEXT NOT NULL
+        )
+        """,
+        "id, recipe_id, tag",
+        "recipe_id IN (SELECT id FROM recipes)",
+    )
+    _rebuild_table(
+        conn,
+        "menu_entries",
+        """
+        CREATE TABLE menu_entries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            profile_id INTEGER NOT NULL REFERENCES profiles(id) ON DELETE CASCADE,
+            day TEXT NOT NULL,
+            week_number INTEGER,
+            year INTEGER,
+            recipe_id INTEGER REFERENCES recipes(id) ON DELETE CASCADE
+        )
+        """,
+        "id, profile_id, day, week_number, year, recipe_id",
+        "profile_id IN (SELECT id FROM profiles) AND (recipe_id IS NULL OR recipe_id IN (SELECT id FROM recipes))",
+    )
+    _rebuild_table(
+        conn,
+        "shopping_items",
+        """
+        CREATE TABLE shopping_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            profile_id INTEGER NOT NULL REFERENCES profiles(id) ON DELETE CASCADE,
+            name TEXT NOT NULL,
+            amount TEXT,
+            checked INTEGER DEFAULT 0
+        )
+        """,
+        "id, profile_id, name, amount, checked",
+        "profile_id IN (SELECT id FROM profiles)",
+    )
+
+
+def _v3_indexes(conn: sqlite3.Connection) -> None:
+    """Index för barnuppslag per recept och meny-/inköpsfrågor per profil."""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_ingredients_recipe ON ingredients (recipe_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_steps_recipe ON steps (recipe_id, position)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tags_recipe ON tags (recipe_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_recipes_created_by ON recipes (created_by, archived)")
+    # Täcker get_menu: day och recipe_id läses direkt ur indexet
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_menu_entries_profile_week "
+        "ON menu_entries (profile_id, year, week_number, day, recipe_id)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_menu_entries_recipe ON menu_entries (recipe_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_shopping_items_profile ON shopping_items (profile_id)")
+
+
+def _v4_search_index(conn: sqlite3.Connection) -> None:
+    rebuild_search_index(conn)
+
+
+def _v5_shopping_contributions(conn: sqlite3.Connection) -> None:
+    """Inköpsrader med nyckel och mängd i basenhet plus bidrag per recept för deltauppdatering."""
+    _add_missing_column(conn, "shopping_items", "item_key", "TEXT")
+    _add_missing_column(conn, "shopping_items", "quantity", "REAL")
+    _add_missing_column(conn, "shopping_items", "unit", "TEXT")
+    conn.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_shopping_items_key "
+        "ON shopping_items (profile_id, item_key) WHERE item_key IS NOT NULL"
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS shopping_contributions (
+            item_id INTEGER NOT NULL REFERENCES shopping_items(id) ON DELETE CASCADE,
+            recipe_id INTEGER NOT NULL,
+            quantity REAL NOT NULL,
+            PRIMARY KEY (item_id, recipe_id)
+        ) WITHOUT ROWID
+        """
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_shopping_contributions_recipe ON shopping_contributions (recipe_id, item_id)"
+    )
+
+
+def _v6_jobs(conn: sqlite3.Connection) -> None:
+    """Bakgrundsjobb med status och progress så att de överlever en omstart."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            status TEXT NOT NULL,
+            progress REAL NOT NULL DEFAULT 0,
+            message TEXT,
+            result TEXT,
+            error TEXT,
+            cancel_requested INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT NOT NULL,
+            started_at TEXT,
+            finished_at TEXT
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_created ON jobs (created_at)")
+
+
+def _v7_backup_manifest(conn: sqlite3.Connection) -> None:
+    """Innehållshash per bild och i vilket arkiv den senast sparades, för inkrementella backuper."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS backup_manifest (
+            path TEXT PRIMARY KEY,
+            sha256 TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            archive TEXT NOT NULL,
+            stored_as TEXT NOT NULL
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_backup_manifest_sha ON backup_manifest (sha256)")
+
+
+def _v8_image_variants(conn: sqlite3.Connection) -> None:
+    """Genererade bildvarianter (JSON) för recept och profiler."""
+    _add_missing_column(conn, "recipes", "image_variants", "TEXT")
+    _add_missing_column(conn, "profiles", "avatar_variants", "TEXT")
+
+
+def _v9_recipe_keyset_index(conn: sqlite3.Connection) -> None:
+    """Sidor per profil i id-ordning (keyset) utan sortering av alla profilens recept."""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_recipes_created_by_id ON recipes (created_by, id)")
+
+
+def _v10_menu_weeks_not_null(conn: sqlite3.Connection) -> None:
+    """Ge menyrader utan vecka/år profilens menyvecka (annars innevarande vecka).
+
+    Äldre rader utan vecka matchade alla veckor; med vecka och år satta kan
+    menyfrågorna jämföra rakt mot idx_menu_entries_profile_week.
+    """
+    iso = date.today().isocalendar()
+    conn.execute(
+        "UPDATE menu_meta SET week_number = COALESCE(week_number, ?), year = COALESCE(year, ?) "
+        "WHERE week_number IS NULL OR year IS NULL",
+        (iso.week, iso.year),
+    )
+    conn.execute(
+        """
+        UPDATE menu_entries SET
+            week_number = COALESCE(week_number, (SELECT m.week_number FROM menu_meta m WHERE m.profile_id = menu_entries.profile_id), ?),
+            year = COALESCE(year, (SELECT m.year FROM menu_meta m WHERE m.profile_id = menu_entries.profile_id), ?)
+        WHERE week_number IS NULL OR year IS NULL
+        """,
+        (iso.week, iso.year),
+    )
+
+
+def _v11_shopping_occurrences(conn: sqlite3.Connection) -> None:
+    """Förekomster per bidrag och radnyckel på äldre inköpsrader.
+
+    Ett recept som står flera gånger i menyn har ett bidrag med summan; med
+    antalet förekomster kan en borttagen menyrad dra av en andel. Rader utan
+    item_key (från före v5) får sin nyckel och slås ihop med nyckelrader.
+    """
+    from models.shopping_list import item_line
+    from models.units import format_amount
+
+    _add_missing_column(conn, "shopping_contributions", "occurrences", "INTEGER NOT NULL DEFAULT 1")
+    # Uppskatta förekomsterna från profilens menyvecka
+    conn.execute(
+        """
+        UPDATE shopping_contributions SET occurrences = MAX(1, (
+            SELECT COUNT(*) FROM menu_entries e
+            JOIN shopping_items i ON i.profile_id = e.profile_id
+            JOIN menu_meta m ON m.profile_id = e.profile_id AND m.year = e.year AND m.week_number = e.week_number
+            WHERE i.id = shopping_contributions.item_id AND e.recipe_id = shopping_contributions.recipe_id
+        ))
+        """
+    )
+
+    legacy = conn.execute(
+        "SELECT id, profile_id, name, amount, checked FROM shopping_items WHERE item_key IS NULL ORDER BY id"
+    ).fetchall()
+    for item_id, profile_id, name, amount, checked in legacy:
+        key, display_name, unit, raw_amount, quantity = item_line(name, amount)
+        target = conn.execute(
+            "SELECT id, quantity, checked FROM shopping_items WHERE profile_id = ? AND item_key = ?", (profile_id, key)
+        ).fetchone()
+        if target is None:
+            conn.execute(
+                "UPDATE shopping_items SET item_key = ?, quantity = ?, unit = ? WHERE id = ?",
+                (key, quantity, unit, item_id),
+            )
+            continue
+        total = (target[1] or 0.0) + quantity
+        display = format_amount(total, unit) if unit else raw_amount
+        conn.execute(
+            "UPDATE shopping_items SET quantity = ?, amount = ?, checked = ? WHERE id = ?",
+            (total, display, 1 if target[2] and checked else 0, target[0]),
+        )
+        conn.execute("DELETE FROM shopping_items WHERE id = ?", (item_id,))
+
+
+def _v12_shopping_contributions_backfill(conn: sqlite3.Connection) -> None:
+    """Bidrag för inköpslistor som byggdes före v5, räknade från profilens menyvecka.
+
+    Utan bidrag drar en borttagen menyrad inte av något från listan. Listan
+    antas vara genererad från veckan i menu_meta; bara rader vars nyckel
+    finns i listan får bidrag.
+    """
+    from models.shopping_list import item_line
+
+    profiles = conn.execute(
+        """
+        SELECT DISTINCT i.profile_id FROM shopping_items i
+        WHERE NOT EXISTS (
+            SELECT 1 FROM shopping_contributions c JOIN shopping_items j ON j.id = c.item_id
+            WHERE j.profile_id = i.profile_id
+        )
+        """
+    ).fetchall()
+    for (profile_id,) in profiles:
+        item_ids = dict(
+            conn.execute(
+                "SELECT item_key, id FROM shopping_items WHERE profile_id = ? AND item_key IS NOT NULL", (profile_id,)
+            ).fetchall()
+        )
+        occurrences = conn.execute(
+            """
+            SELECT e.recipe_id, COUNT(*) FROM menu_entries e
+            JOIN menu_meta m ON m.profile_id = e.profile_id AND m.year = e.year AND m.week_number = e.week_number
+            WHERE e.profile_id = ? AND e.recipe_id IS NOT NULL
+            GROUP BY e.recipe_id
+            """,
+            (profile_id,),
+        ).fetchall()
+        rows = []
+        for recipe_id, count in occurrences:
+            quantities: Dict[str, float] = {}
+            for name, amount in conn.execute(
+                "SELECT name, amount FROM ingredients WHERE recipe_id = ? ORDER BY id", (recipe_id,)
+            ).fetchall():
+                key, _, _, _, value = item_line(name, amount)
+                quantities[key] = quantities.get(key, 0.0) + value
+            rows.extend(
+                (item_ids[key], recipe_id, value * count, count) for key, value in quantities.items() if key in item_ids
+            )
+        conn.executemany(
+            "INSERT OR IGNORE INTO shopping_contributions (item_id, recipe_id, quantity, occurrences) VALUES (?, ?, ?, ?)",
+            rows,
+        )
+
+
+# Ordningen är versionen: MIGRATIONS[i] tar databasen till user_version i + 1.
+# Lägg bara till nya steg sist, ändra aldrig ett steg som redan släppts.
+MIGRATIONS: List[Callable[[sqlite3.Connection], None]] = [
+    _v1_base_schema,
+    _v2_foreign_keys,
+    _v3_indexes,
+    _v4_search_index,
+    _v5_shopping_contributions,
+    _v6_jobs,
+    _v7_backup_manifest,
+    _v8_image_variants,
+    _v9_recipe_keyset_index,
+    _v10_menu_weeks_not_null,
+    _v11_shopping_occurrences,
+    _v12_shopping_contributions_backfill,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def run_migrations(conn: sqlite3.Connection) -> int:
+    """Kör migreringar som saknas, var och en i egen transaktion. Returnerar ny version."""
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version >= SCHEMA_VERSION:
+        return version
+
+    # foreign_keys kan inte slås av inuti en transaktion
+    conn.execute("PRAGMA foreign_keys = OFF")
+    try:
+        for target in range(version + 1, SCHEMA_VERSION + 1):
+            conn.execute("BEGIN")
+            try:
+                MIGRATIONS[target - 1](conn)
+                violations = conn.execute("PRAGMA foreign_key_check").fetchall()
+                if violations:
+                    raise sqlite3.IntegrityError(f"Migrering {target} bryter mot främmande nycklar: {violations[:5]}")
+                conn.execute(f"PRAGMA user_version = {target}")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+    finally:
+        conn.execute("PRAGMA foreign_keys = ON")
+    return SCHEMA_VERSION
+
+
+__all__ = ["MIGRATIONS", "SCHEMA_VERSION", "run_migrations"]
@@ -0,0 +1,239 @@
+"""Valbar SQL-profilering: normaliserade satser med antal, tid, p95 och rader.
+
+Slås på med SQL_PROFILE=true eller från /admin/sql. Avslagen kostar den en
+flaggkoll per ny cursor; påslagen får anslutningarna i core.database en
+ProfiledCursor som rapporterar varje sats hit, både globalt och per request.
+"""
+from __future__ import annotations
+
+import math
+import re
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Deque, Dict, List
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.config import settings
+
+QUERY_COUNT_HEADER = "X-SQL-Queries"
+QUERY_TIME_HEADER = "X-SQL-Time-Ms"
+
+# En sats som körs så här många gånger i samma request ser ut som N+1
+REPEATED_THRESHOLD = 10
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])")
+_IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def normalize_sql(sql: str) -> str:
+    """Gör satser med olika literaler och IN-listor av olika längd till samma nyckel."""
+    text = _STRING_RE.sub("?", sql)
+    text = _NUMBER_RE.sub("?", text)
+    text = _IN_LIST_RE.sub("(?, …)", text)
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+class StatementStats:
+    """Samlade mått för en normaliserad sats; p95 räknas på de senaste proven."""
+
+    __slots__ = ("sql", "calls", "total", "rows", "max", "samples")
+
+    def __init__(self, sql: str, sample_size: int) -> None:
+        self.sql = sql
+        self.calls = 0
+        self.total = 0.0
+        self.rows = 0
+        self.max = 0.0
+        self.samples: Deque[float] = deque(maxlen=sample_size)
+
+    def add(self, elapsed: float, rows: int) -> None:
+        self.calls += 1
+        self.total += elapsed
+        self.rows += rows
+        if elapsed > self.max:
+            self.max = elapsed
+        self.samples.append(elapsed)
+
+    def p95(self) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[max(0, math.ceil(len(ordered) * 0.95) - 1)]
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "sql": self.sql,
+            "calls": self.calls,
+            "total_ms": round(self.total * 1000, 3),
+            "mean_ms": round(self.total * 1000 / self.calls, 3) if self.calls else 0.0,
+            "p95_ms": round(self.p95() * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+            "rows": self.rows,
+        }
+
+
+class RequestProfile:
+    """Satser för en enskild request (delas med DB-trådarna via kontexten)."""
+
+    __slots__ = ("method", "path", "status", "queries", "total", "statements", "_lock")
+
+    def __init__(self, method: str, path: str) -> None:
+        self.method = method
+        self.path = path
+        self.status = 0
+        self.queries = 0
+        self.total = 0.0
+        self.statements: Dict[str, StatementStats] = {}
+        self._lock = threading.Lock()
+
+    def add(self, sql: str, elapsed: float, rows: int) -> None:
+        with self._lock:
+            self.queries += 1
+            self.total += elapsed
+            stats = self.statements.get(sql)
+            if stats is None:
+                stats = self.statements[sql] = StatementStats(sql, 64)
+            stats.add(elapsed, rows)
+
+    def as_dict(self) -> Dict[str, object]:
+        with self._lock:
+            statements = sorted(self.statements.values(), key=lambda s: s.total, reverse=True)
+            return {
+                "method": self.method,
+                "path": self.path,
+                "status": self.status,
+                "queries": self.queries,
+                "total_ms": round(self.total * 1000, 3),
+                "repeated": [s.as_dict() for s in statements if s.calls >= REPEATED_THRESHOLD],
+                "statements": [s.as_dict() for s in statements],
+            }
+
+
+current_profile: ContextVar[RequestProfile | None] = ContextVar("current_sql_profile", default=None)
+
+
+class SqlProfiler:
+    """Global statistik per normaliserad sats plus de senaste requestprofilerna."""
+
+    def __init__(self, enabled: bool = False, sample_size: int = 512, recent: int = 50) -> None:
+        self.enabled = enabled
+        self._sample_size = sample_size
+        self._lock = threading.Lock()
+        self._statements: Dict[str, StatementStats] = {}
+        self._recent: Deque[RequestProfile] = deque(maxlen=recent)
+        self._since = time.time()
+
+    def set_enabled(self, enabled: bool) -> None:
+        self.enabled = enabled
+
+    def record(self, sql: str, elapsed: float, rows: int) -> None:
+        key = normalize_sql(sql)
+        with self._lock:
+            stats = self._statements.get(key)
+            if stats is None:
+                stats = self._statements[key] = StatementStats(key, self._sample_size)
+            stats.add(elapsed, rows)
+        profile = current_profile.get()
+        if profile is not None:
+            profile.add(key, elapsed, rows)
+
+    def finish_request(self, profile: RequestProfile) -> None:
+        with self._lock:
+            self._recent.appendleft(profile)
+
+    def top(self, limit: int = 25, order: str = "total") -> List[Dict[str, object]]:
+        """De tyngsta satserna; order är total, calls, p95, rows eller mean."""
+        with self._lock:
+            statements = list(self._statements.values())
+        keys = {
+            "calls": lambda s: s.calls,
+            "p95": lambda s: s.p95(),
+            "rows": lambda s: s.rows,
+            "mean": lambda s: s.total / s.calls if s.calls else 0.0,
+        }
+        statements.sort(key=keys.get(order, lambda s: s.total), reverse=True)
+        return [s.as_dict() for s in statements[:limit]]
+
+    def recent(self) -> List[Dict[str, object]]:
+        with self._lock:
+            profiles = list(self._recent)
+        return [p.as_dict() for p in profiles]
+
+    def summary(self) -> Dict[str, object]:
+        with self._lock:
+            statements = list(self._statements.values())
+            since = self._since
+        return {
+            "enabled": self.enabled,
+            "since": since,
+            "statements": len(statements),
+            "queries": sum(s.calls for s in statements),
+            "total_ms": round(sum(s.total for s in statements) * 1000, 3),
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._statements.clear()
+            self._recent.clear()
+            self._since = time.time()
+
+
+class SqlProfilerMiddleware:
+    """Samla en profil per request och skicka antalet satser som debughuvud.
+
+    Huvudet skrivs när svaret startar; satser som körs medan en strömmande
+    kropp skickas räknas i profilen men inte i huvudet.
+    """
+
+    def __init__(self, app: ASGIApp, profiler: SqlProfiler | None = None) -> None:
+        self.app = app
+        self.profiler = profiler or sql_profiler
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.profiler.enabled:
+            await self.app(scope, receive, send)
+            return
+        profile = RequestProfile(scope["method"], scope["path"])
+        token = current_profile.set(profile)
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((QUERY_COUNT_HEADER.lower().encode(), str(profile.queries).encode()))
+                headers.append((QUERY_TIME_HEADER.lower().encode(), f"{profile.total * 1000:.3f}".encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_profile.reset(token)
+            self.profiler.finish_request(profile)
+
+
+sql_profiler = SqlProfiler(
+    enabled=settings.sql_profile,
+    sample_size=settings.sql_profile_samples,
+    recent=settings.sql_profile_recent,
+)
+
+__all__ = [
+    "QUERY_COUNT_HEADER",
+    "QUERY_TIME_HEADER",
+    "REPEATED_THRESHOLD",
+    "RequestProfile",
+    "SqlProfiler",
+    "SqlProfilerMiddleware",
+    "StatementStats",
+    "current_profile",
+    "normalize_sql",
+    "sql_profiler",
+]
@@ -0,0 +1,136 @@
+"""Fingeravtryck för statiska filer och cachehuvuden för /static och /uploads."""
+from __future__ import annotations
+
+import hashlib
+import re
+import threading
+from pathlib import Path
+from typing import Dict, Tuple
+
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+
+from core.config import settings
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+_HASH_LENGTH = 12
+# Uppladdningar namnges efter innehållets sha256 (även varianterna), se upload_service
+_CONTENT_ADDRESSED_RE = re.compile(r"(?:^|/)[0-9a-f]{64}(?:-[a-z0-9]+)?\.[a-z0-9]+$")
+
+
+def _file_hash(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()[:_HASH_LENGTH]
+
+
+def _fingerprinted(relative: str, digest: str) -> str:
+    stem, dot, suffix = relative.rpartition(".")
+    if not dot or "/" in suffix:
+        return f"{relative}.{digest}"
+    return f"{stem}.{digest}.{suffix}"
+
+
+class AssetManifest:
+    """Karta från filer i static/ till namn med innehållshash, t.ex. css/style.3f2a1b9c0d12.css.
+
+    Byggs vid start. I debug-läge hashas en fil om när dess mtime ändras, så
+    att mallarna följer med under utveckling utan omstart.
+    """
+
+    def __init__(self, static_dir: Path) -> None:
+        self.static_dir = static_dir
+        self._urls: Dict[str, Tuple[str, int]] = {}  # original -> (fingeravtryck, mtime_ns)
+        self._originals: Dict[str, str] = {}  # fingeravtryck -> original
+        self._built = False
+        self._lock = threading.Lock()
+
+    def build(self) -> int:
+        urls: Dict[str, Tuple[str, int]] = {}
+        originals: Dict[str, str] = {}
+        for path in self.static_dir.rglob("*"):
+            if path.is_file():
+                relative = path.relative_to(self.static_dir).as_posix()
+                hashed = _fingerprinted(relative, _file_hash(path))
+                urls[relative] = (hashed, path.stat().st_mtime_ns)
+                originals[hashed] = relative
+        with self._lock:
+            self._urls, self._originals, self._built = urls, originals, True
+        return len(urls)
+
+    def asset_url(self, relative: str) -> str:
+        """URL med fingeravtryck för en fil i static/; okända filer får vanlig URL."""
+        current = self.current(relative)
+        if current is None:
+            return f"/static/{relative}"
+        return f"/static/{current}"
+
+    def current(self, relative: str) -> str | None:
+        """Filens aktuella fingeravtryck, eller None om den inte finns i manifestet."""
+        if not self._built:
+            self.build()
+        entry = self._urls.get(relative)
+        if entry is not None and settings.debug:
+            entry = self._refresh(relative, entry)
+        return entry[0] if entry is not None else None
+
+    def resolve(self, hashed: str) -> str | None:
+        """Originalnamnet för ett fingeravtryck, annars None."""
+        if not self._built:
+            self.build()
+        return self._originals.get(hashed)
+
+    def _refresh(self, relative: str, entry: Tuple[str, int]) -> Tuple[str, int] | None:
+        path = self.static_dir / relative
+        try:
+            mtime = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+        if mtime == entry[1]:
+            return entry
+        fresh = (_fingerprinted(relative, _file_hash(path)), mtime)
+        with self._lock:
+            self._urls[relative] = fresh
+            self._originals[fresh[0]] = relative
+        return fresh
+
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles som sätter Cache-Control efter om URL:en är oföränderlig.
+
+    Aktuella fingeravtryck ur manifestet och innehållsadresserade
+    uppladdningar får ett års immutable-cache; övriga filer, och gamla
+    fingeravtryck, revalideras med ETag/Last-Modified.
+    """
+
+    def __init__(self, *args, manifest: AssetManifest | None = None, content_addressed: bool = False, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.manifest = manifest
+        self.content_addressed = content_addressed
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        immutable = False
+        if self.manifest is not None:
+            hashed = Path(path).as_posix()
+            original = self.manifest.resolve(hashed)
+            if original is not None:
+                # Ett äldre fingeravtryck (filen har ändrats i debug-läge) pekar på nytt innehåll
+                path, immutable = original, self.manifest.current(original) == hashed
+        if self.content_addressed and _CONTENT_ADDRESSED_RE.search(Path(path).as_posix()):
+            immutable = True
+        response = await super().get_response(path, scope)
+        if response.status_code in (200, 304):
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL
+        return response
+
+
+asset_manifest = AssetManifest(settings.static_dir)
+
+__all__ = [
+    "AssetManifest",
+    "CachedStaticFiles",
+    "IMMUTABLE_CACHE_CONTROL",
+    "REVALIDATE_CACHE_CONTROL",
+    "asset_manifest",
+]
@@ -0,0 +1,39 @@
+"""Delad Jinja-miljö för alla routers, med hjälpfunktioner för mallarna."""
+from __future__ import annotations
+
+import time
+
+from fastapi.templating import Jinja2Templates
+from starlette.requests import Request
+
+from core.config import settings
+from core.metrics import add_template_time
+from core.static_assets import asset_manifest
+from models.image import srcset, thumbnail_url
+
+
+def page_url(request: Request, **params) -> str:
+    """Relativ URL till samma sida med ändrade query-parametrar; None tar bort parametern."""
+    url = request.url.remove_query_params([key for key, value in params.items() if value is None])
+    url = url.include_query_params(**{key: value for key, value in params.items() if value is not None})
+    return f"{url.path}?{url.query}" if url.query else url.path
+
+
+class TimedTemplates(Jinja2Templates):
+    """Jinja2Templates som mäter renderingstiden (TemplateResponse renderar direkt)."""
+
+    def TemplateResponse(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().TemplateResponse(*args, **kwargs)
+        finally:
+            add_template_time(time.perf_counter() - start)
+
+
+templates = TimedTemplates(directory=str(settings.template_dir))
+templates.env.globals["asset_url"] = asset_manifest.asset_url
+templates.env.globals["page_url"] = page_url
+templates.env.globals["srcset"] = srcset
+templates.env.globals["thumbnail_url"] = thumbnail_url
+
+__all__ = ["TimedTemplates", "page_url", "templates"]
@@ -1,6 +1,6 @@
 """Datamodeller för recept, profiler, veckomeny och inköpslistor."""
 
 from models.profile import Profile  # noqa: F401
-from models.recipe import Recipe  # noqa: F401
+from models.recipe import Recipe, RecipeSummary  # noqa: F401
 from models.shopping_list import ShoppingList  # noqa: F401
 from models.weekly_menu import WeeklyMenu  # noqa: F401
@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import json
+from typing import List, Optional, Sequence
+
+from pydantic import BaseModel, Field
+
+
+class ImageVariant(BaseModel):
+    """En nedskalad version av en uppladdad bild."""
+
+    kind: str = Field(..., description="thumb (fast beskuren storlek) eller width (responsiv bredd)")
+    width: int = Field(..., description="Bredd i pixlar")
+    height: int = Field(..., description="Höjd i pixlar")
+    format: str = Field("webp", description="Bildformat")
+    url: str = Field(..., description="URL under /uploads")
+
+
+def variants_to_json(variants: Optional[List[ImageVariant]]) -> Optional[str]:
+    """Serialisera för lagring i en TEXT-kolumn; None betyder oförändrat vid UPDATE."""
+    if variants is None:
+        return None
+    return json.dumps([v.model_dump() for v in variants])
+
+
+def variants_from_json(raw: Optional[str]) -> List[ImageVariant]:
+    if not raw:
+        return []
+    return [ImageVariant(**v) for v in json.loads(raw)]
+
+
+def srcset(variants: Sequence[ImageVariant]) -> str:
+    """srcset-attribut över de responsiva bredderna, minsta först.
+
+    Tumnageln är beskuren till ett annat bildförhållande och hör inte hit.
+    """
+    widths = sorted((v for v in variants if v.kind != "thumb"), key=lambda v: v.width)
+    return ", ".join(f"{v.url} {v.width}w" for v in widths)
+
+
+def thumbnail_url(variants: Sequence[ImageVariant], fallback: Optional[str] = None) -> Optional[str]:
+    for variant in variants:
+        if variant.kind == "thumb":
+            return variant.url
+    return fallback
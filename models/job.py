@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Optional
+
+from pydantic import BaseModel, Field
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+FINISHED_STATUSES = (JOB_SUCCEEDED, JOB_FAILED, JOB_CANCELLED)
+
+
+class Job(BaseModel):
+    id: str = Field(..., description="Jobb-ID")
+    kind: str = Field(..., description="Typ av jobb, t.ex. import eller backup")
+    status: str = Field(JOB_QUEUED, description="queued, running, succeeded, failed eller cancelled")
+    progress: float = Field(0.0, description="Andel klar mellan 0 och 1")
+    message: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    cancel_requested: bool = False
+    created_at: str
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
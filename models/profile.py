@@ -1,9 +1,11 @@
 from __future__ import annotations
 
-from typing import Optional
+from typing import List, Optional
 
 from pydantic import BaseModel, Field, EmailStr
 
+from models.image import ImageVariant
+
 
 class Profile(BaseModel):
     """Enkel profil för att särskilja data per användare (utan auth)."""
@@ -12,4 +14,5 @@ class Profile(BaseModel):
     name: str = Field(..., description="Visningsnamn")
     email: Optional[EmailStr] = Field(None, description="Kontaktmail")
     avatar_url: Optional[str] = Field(None, description="Bild-URL")
+    avatar_variants: List[ImageVariant] = Field(default_factory=list, description="Nedskalade versioner av avataren")
     theme_preference: Optional[str] = Field(None, description="Föredraget tema (light/dark/auto)")
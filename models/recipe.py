@@ -4,20 +4,52 @@ from typing import List, Optional
 
 from pydantic import BaseModel, Field
 
+from models.image import ImageVariant
+
 
 class Ingredient(BaseModel):
     name: str = Field(..., description="Ingrediensnamn")
     amount: Optional[str] = Field(None, description="Mängd eller mått")
 
 
+def parse_ingredient_lines(text: str) -> List[Ingredient]:
+    """En ingrediens per rad i formuläret: "mängd namn", eller bara namn om raden är ett ord."""
+    ingredients = []
+    for line in text.splitlines():
+        clean = line.strip()
+        if not clean:
+            continue
+        parts = clean.split(" ", 1)
+        if len(parts) > 1:
+            ingredients.append(Ingredient(name=parts[1], amount=parts[0]))
+        else:
+            ingredients.append(Ingredient(name=parts[0], amount=None))
+    return ingredients
+
+
 class Recipe(BaseModel):
     id: Optional[int] = Field(None, description="Primärnyckel eller index")
     title: str = Field(..., description="Titel på receptet")
     description: Optional[str] = None
     servings: Optional[int] = Field(None, description="Antal portioner")
     image_url: Optional[str] = Field(None, description="Länk till bild")
+    image_variants: List[ImageVariant] = Field(default_factory=list, description="Tumnagel och responsiva bredder")
     archived: bool = Field(False, description="Om receptet är arkiverat")
     ingredients: List[Ingredient] = Field(default_factory=list)
     steps: List[str] = Field(default_factory=list)
     tags: List[str] = Field(default_factory=list)
     created_by: Optional[int] = Field(None, description="Profil-ID för skaparen")
+
+
+class RecipeSummary(BaseModel):
+    """Receptkort för listvyer: receptraden och taggar, utan ingredienser och steg."""
+
+    id: int
+    title: str
+    description: Optional[str] = None
+    servings: Optional[int] = None
+    image_url: Optional[str] = None
+    image_variants: List[ImageVariant] = Field(default_factory=list)
+    archived: bool = False
+    tags: List[str] = Field(default_factory=list)
+    created_by: Optional[int] = None
@@ -1,13 +1,29 @@
 from __future__ import annotations
 
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
 from pydantic import BaseModel, Field
 
 from models.recipe import Ingredient
+from models.units import parse_amount
+
+
+def item_line(name: str, amount: str | None) -> Tuple[str, str, Optional[str], Optional[str], float]:
+    """Radnyckel för en ingrediens → (nyckel, namn, basenhet, råmängd, kvantitet).
+
+    Summerbara mått får nyckeln "namn|bas" och kvantitet i basenhet. Övriga
+    räknas i antal förekomster under "namn|~råmängd" och visas med sin text.
+    """
+    name_key = name.strip().lower()
+    parsed = parse_amount(amount)
+    if parsed:
+        value, base = parsed
+        return f"{name_key}|{base}", name_key, base, None, value
+    return f"{name_key}|~{amount or ''}", name, None, amount, 1.0
 
 
 class ShoppingItem(BaseModel):
+    id: Optional[int] = Field(None, description="Rad-ID i inköpslistan")
     ingredient: Ingredient
     checked: bool = False
 
@@ -1,7 +1,9 @@
 from __future__ import annotations
 
-from dataclasses import asdict, dataclass
-from typing import Dict, List, Optional
+import re
+from dataclasses import asdict, dataclass, field
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
 
 
 class UnitCategory:
@@ -21,8 +23,12 @@ class Unit:
     plural: str
     category: str
     summable: bool
+    # Faktor till basenheten (g, ml eller st); None för textuella mått
+    factor: Optional[float] = None
+    base: Optional[str] = None
+    aliases: Tuple[str, ...] = field(default=(), compare=False)
 
-    def to_dict(self) -> Dict[str, str | bool]:
+    def to_dict(self) -> Dict[str, str | bool | float | Tuple[str, ...] | None]:
         """Enkel serialisering till JSON-vänlig dict."""
         return asdict(self)
 
@@ -30,19 +36,19 @@ class Unit:
 # Basuppsättning av svenska, metriska och köksnära enheter.
 _UNITS: List[Unit] = [
     # Vikt
-    Unit("g", "gram", "gram", UnitCategory.WEIGHT, True),
-    Unit("kg", "kilogram", "kilogram", UnitCategory.WEIGHT, True),
+    Unit("g", "gram", "gram", UnitCategory.WEIGHT, True, 1, "g", ("gr",)),
+    Unit("kg", "kilogram", "kilogram", UnitCategory.WEIGHT, True, 1000, "g", ("kilo",)),
     # Volym
-    Unit("ml", "milliliter", "milliliter", UnitCategory.VOLUME, True),
-    Unit("cl", "centiliter", "centiliter", UnitCategory.VOLUME, True),
-    Unit("dl", "deciliter", "deciliter", UnitCategory.VOLUME, True),
-    Unit("l", "liter", "liter", UnitCategory.VOLUME, True),
+    Unit("ml", "milliliter", "milliliter", UnitCategory.VOLUME, True, 1, "ml"),
+    Unit("cl", "centiliter", "centiliter", UnitCategory.VOLUME, True, 10, "ml"),
+    Unit("dl", "deciliter", "deciliter", UnitCategory.VOLUME, True, 100, "ml"),
+    Unit("l", "liter", "liter", UnitCategory.VOLUME, True, 1000, "ml", ("lit",)),
     # Köksmått (skedmått är volym men separata för UX)
-    Unit("krm", "kryddmått", "kryddmått", UnitCategory.SPOON, True),
-    Unit("tsk", "tesked", "teskedar", UnitCategory.SPOON, True),
-    Unit("msk", "matsked", "matskedar", UnitCategory.SPOON, True),
+    Unit("krm", "kryddmått", "kryddmått", UnitCategory.SPOON, True, 1, "ml"),
+    Unit("tsk", "tesked", "teskedar", UnitCategory.SPOON, True, 5, "ml", ("teskeden",)),
+    Unit("msk", "matsked", "matskedar", UnitCategory.SPOON, True, 15, "ml", ("matskeden",)),
     # Styck
-    Unit("st", "styck", "stycken", UnitCategory.COUNT, True),
+    Unit("st", "styck", "stycken", UnitCategory.COUNT, True, 1, "st", ("stk",)),
     # Övrigt – ej summerbara, textuella mått
     Unit("nypa", "nypa", "nypor", UnitCategory.OTHER, False),
     Unit("knippe", "knippe", "knippen", UnitCategory.OTHER, False),
@@ -51,6 +57,27 @@ _UNITS: List[Unit] = [
 
 _UNITS_BY_CODE: Dict[str, Unit] = {unit.code: unit for unit in _UNITS}
 
+# Alla skrivsätt (kod, namn, plural, alias) i gemener → enhet
+_UNITS_BY_ALIAS: Dict[str, Unit] = {}
+for _unit in _UNITS:
+    for _alias in (_unit.code, _unit.name, _unit.plural, *_unit.aliases):
+        _UNITS_BY_ALIAS.setdefault(_alias.lower(), _unit)
+_UNITS_BY_ALIAS[""] = _UNITS_BY_CODE["st"]  # "2" utan enhet räknas som styck
+
+_UNICODE_FRACTIONS = {
+    "½": "1/2",
+    "⅓": "1/3",
+    "⅔": "2/3",
+    "¼": "1/4",
+    "¾": "3/4",
+    "⅕": "1/5",
+    "⅛": "1/8",
+}
+_FRACTION_RE = re.compile("[" + "".join(_UNICODE_FRACTIONS) + "]")
+_NUMBER = r"(?:\d+\s+\d+/\d+|\d+/\d+|\d+(?:[.,]\d+)?)"
+# Tal eller intervall ("2-3") följt av enhet
+_AMOUNT_RE = re.compile(rf"^({_NUMBER})(?:\s*[-–—]\s*({_NUMBER}))?\s*(.*?)\.?$")
+
 
 def get_all_units() -> List[Unit]:
     """Returnera alla enheter i definierad ordning."""
@@ -73,11 +100,82 @@ def is_summable(code: str) -> bool:
     return bool(unit and unit.summable)
 
 
+def find_unit(text: str) -> Optional[Unit]:
+    """Slå upp en enhet på kod, namn, plural eller alias (skiftlägesokänsligt)."""
+    return _UNITS_BY_ALIAS.get(text.strip().lower())
+
+
+def _number(raw: str) -> float:
+    if " " in raw:
+        whole, frac = raw.split(None, 1)
+        return float(whole) + _number(frac)
+    if "/" in raw:
+        num, den = raw.split("/", 1)
+        return float(num) / float(den)
+    return float(raw.replace(",", "."))
+
+
+@lru_cache(maxsize=4096)
+def parse_amount(amount: str | None) -> Optional[Tuple[float, str]]:
+    """Tolka en mängd som "1/2 dl", "2-3 st", "1½ msk" till (värde, basenhet).
+
+    Intervall räknas på övre gränsen. Returnerar None för tomma, textuella eller
+    icke-summerbara mått. Resultatet memoiseras per sträng.
+    """
+    if not amount:
+        return None
+    text = _FRACTION_RE.sub(lambda m: " " + _UNICODE_FRACTIONS[m.group(0)], amount)
+    text = " ".join(text.split())
+    match = _AMOUNT_RE.match(text)
+    if not match:
+        return None
+    low_raw, high_raw, unit_raw = match.groups()
+    unit = find_unit(unit_raw)
+    if unit is None or not unit.summable or unit.factor is None or unit.base is None:
+        return None
+    try:
+        value = _number(high_raw or low_raw)
+    except (ValueError, ZeroDivisionError):
+        return None
+    return value * unit.factor, unit.base
+
+
+def convert(value: float, from_code: str, to_code: str) -> Optional[float]:
+    """Konvertera mellan enheter med samma bas (t.ex. msk → dl), annars None."""
+    source = find_unit(from_code)
+    target = find_unit(to_code)
+    if not source or not target or source.base is None or source.base != target.base:
+        return None
+    return value * source.factor / target.factor  # type: ignore[operator]
+
+
+def format_amount(value: float, base: str) -> str:
+    """Presentera ett basvärde läsbart: ml → dl från 100 ml, g → kg från 1000 g."""
+    display_value = value
+    display_unit = base
+    if base == "ml" and value >= 100:
+        display_value = value / 100
+        display_unit = "dl"
+    if base == "g" and value >= 1000:
+        display_value = value / 1000
+        display_unit = "kg"
+    formatted = (
+        f"{int(display_value)}"
+        if abs(display_value - int(display_value)) < 1e-6
+        else f"{display_value:.1f}".replace(".", ",")
+    )
+    return f"{formatted} {display_unit}".strip()
+
+
 __all__ = [
     "Unit",
     "UnitCategory",
+    "convert",
+    "find_unit",
+    "format_amount",
     "get_all_units",
     "get_units_by_category",
     "get_unit",
     "is_summable",
+    "parse_amount",
 ]
@@ -1,46 +1,47 @@
 from __future__ import annotations
 
-import json
+import asyncio
+import shutil
 import uuid
 from pathlib import Path
-from datetime import datetime
-import zipfile
 
 from fastapi import APIRouter, File, Form, HTTPException, Request, UploadFile
-from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, FileResponse
-from fastapi.templating import Jinja2Templates
-
-from core.config import settings
-from models.recipe import Ingredient
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, FileResponse, StreamingResponse
+
+from core.data_versions import data_versions
+from core.sql_profiler import REPEATED_THRESHOLD, sql_profiler
+from core.templating import templates
+from models.image import thumbnail_url
+from models.job import JOB_SUCCEEDED
+from models.recipe import RecipeSummary, parse_ingredient_lines
 from models.units import UnitCategory, get_all_units
-from services.profile_service import profile_service
-from services.recipe_service import recipe_service
-from core.database import connection_scope
+from services.backup_service import backup_service
+from services.image_service import image_service
+from services.import_service import import_service
+from services.job_service import JobQueueFull, job_service
+from services.profile_service import async_profile_service, profile_service
+from services.recipe_service import async_recipe_service, page_size, recipe_service
+from services.upload_service import upload_service
+from core.database import connection_scope, pool_stats, run_in_db
 
 router = APIRouter()
-templates = Jinja2Templates(directory=str(settings.template_dir))
-
-
-def _resolve_profile(profile_id: int | None) -> int:
-    if profile_id is None:
-        return 1
-    return profile_id if profile_service.get_profile(profile_id) else 1
 
 
-def _serialize_recipe(recipe):
+def _serialize_recipe(recipe: RecipeSummary):
     return {
         "id": recipe.id,
         "title": recipe.title,
         "description": recipe.description or "",
         "servings": recipe.servings,
         "created_by": recipe.created_by,
+        "image_url": thumbnail_url(recipe.image_variants, recipe.image_url),
     }
 
 
 @router.get("/", response_class=HTMLResponse)
 async def admin_home(request: Request, profile_id: int | None = None):
     """Adminöversikt med genvägar."""
-    active_profile_id = _resolve_profile(profile_id)
+    active_profile_id = profile_service.resolve_profile_id(profile_id)
     context = {
         "request": request,
         "title": "Admin",
@@ -52,14 +53,30 @@ async def admin_home(request: Request, profile_id: int | None = None):
 
 
 @router.get("/recipes", response_class=HTMLResponse)
-async def admin_recipes(request: Request, profile_id: int | None = None, q: str | None = None, include_archived: bool = False):
+async def admin_recipes(
+    request: Request,
+    profile_id: int | None = None,
+    q: str | None = None,
+    include_archived: bool = False,
+    after_id: int | None = None,
+    limit: int | None = None,
+):
     """Sök och redigera recept."""
-    active_profile_id = _resolve_profile(profile_id)
+    active_profile_id = profile_service.resolve_profile_id(profile_id)
     query = q or ""
+    next_after_id = None
     if query:
-        search_results = recipe_service.search_recipes(query, profile_id=active_profile_id, include_archived=include_archived)
+        search_results = await async_recipe_service.search_summaries(
+            query, profile_id=active_profile_id, include_archived=include_archived, limit=limit, with_tags=False
+        )
     else:
-        search_results = recipe_service.list_recipes(profile_id=active_profile_id, include_archived=include_archived)
+        search_results, next_after_id = await async_recipe_service.summary_page(
+            profile_id=active_profile_id,
+            include_archived=include_archived,
+            after_id=after_id,
+            limit=limit,
+            with_tags=False,
+        )
     context = {
         "request": request,
         "title": "Hitta recept",
@@ -67,24 +84,56 @@ async def admin_recipes(request: Request, profile_id: int | None = None, q: str
         "search_query": query,
         "include_archived": include_archived,
         "search_results": search_results,
+        "next_after_id": next_after_id,
         "profiles": profile_service.list_profiles(),
         "current_profile": profile_service.get_profile(active_profile_id),
     }
     return templates.TemplateResponse("admin/recipes.html", context)
 
 
-@router.get("/db", response_class=HTMLResponse)
-async def admin_db(request: Request, profile_id: int | None = None):
-    """Enkel inspektionssida för databasen med möjlighet att radera poster."""
-    active_profile_id = _resolve_profile(profile_id)
-    recipes = recipe_service.list_recipes(include_archived=True)  # alla profiler
+def _newest_rows(conn, sql: str, before_id: int | None, limit: int):
+    """Nyaste raderna först, keyset på id; returnerar (rader, markör för nästa sida)."""
+    where = " WHERE id < ?" if before_id is not None else ""
+    params = (before_id, limit + 1) if before_id is not None else (limit + 1,)
+    rows = conn.execute(f"{sql}{where} ORDER BY id DESC LIMIT ?", params).fetchall()
+    return rows[:limit], (rows[limit - 1][0] if len(rows) > limit else None)
+
+
+def _load_db_rows(menu_before_id: int | None, shopping_before_id: int | None, limit: int):
     with connection_scope() as conn:
-        menu_entries = conn.execute(
-            "SELECT id, profile_id, day, week_number, year, recipe_id FROM menu_entries ORDER BY year DESC, week_number DESC, id DESC"
-        ).fetchall()
-        shopping_items = conn.execute(
-            "SELECT id, profile_id, name, amount FROM shopping_items ORDER BY id DESC"
-        ).fetchall()
+        menu_entries = _newest_rows(
+            conn, "SELECT id, profile_id, day, week_number, year, recipe_id FROM menu_entries", menu_before_id, limit
+        )
+        shopping_items = _newest_rows(
+            conn, "SELECT id, profile_id, name, amount FROM shopping_items", shopping_before_id, limit
+        )
+    return menu_entries, shopping_items
+
+
+@router.get("/db", response_class=HTMLResponse)
+async def admin_db(
+    request: Request,
+    profile_id: int | None = None,
+    job_id: str | None = None,
+    after_id: int | None = None,
+    menu_before_id: int | None = None,
+    shopping_before_id: int | None = None,
+    limit: int | None = None,
+):
+    """Enkel inspektionssida för databasen med möjlighet att radera poster.
+
+    Varje tabell bläddras för sig: recept med after_id, menyrader och
+    inköpsrader (nyast först) med menu_before_id och shopping_before_id.
+    """
+    active_profile_id = profile_service.resolve_profile_id(profile_id)
+    size = page_size(limit)
+    recipes, next_after_id = await async_recipe_service.summary_page(
+        include_archived=True, after_id=after_id, limit=size, with_tags=False
+    )  # alla profiler
+    (menu_entries, next_menu_before_id), (shopping_items, next_shopping_before_id) = await run_in_db(
+        _load_db_rows, menu_before_id, shopping_before_id, size
+    )
+    job = await run_in_db(job_service.get_job, job_id) if job_id else None
     context = {
         "request": request,
         "title": "DB-inspektion",
@@ -92,16 +141,76 @@ async def admin_db(request: Request, profile_id: int | None = None):
         "profiles": profile_service.list_profiles(),
         "current_profile": profile_service.get_profile(active_profile_id),
         "recipes": recipes,
+        "next_after_id": next_after_id,
         "menu_entries": menu_entries,
+        "next_menu_before_id": next_menu_before_id,
         "shopping_items": shopping_items,
+        "next_shopping_before_id": next_shopping_before_id,
+        "job": job,
     }
     return templates.TemplateResponse("admin/db.html", context)
 
 
+@router.get("/db/pool")
+async def admin_db_pool():
+    """Statistik för anslutningspoolen (lån, väntetid och antal anslutningar)."""
+    return JSONResponse({"pools": pool_stats()})
+
+
+@router.get("/sql", response_class=HTMLResponse)
+async def admin_sql(request: Request, profile_id: int | None = None, order: str = "total", limit: int = 25):
+    """SQL-profilering: tyngsta satserna och de senaste requesternas antal satser."""
+    active_profile_id = profile_service.resolve_profile_id(profile_id)
+    context = {
+        "request": request,
+        "title": "SQL-profilering",
+        "subtitle": "Satser, tider och rader",
+        "profiles": profile_service.list_profiles(),
+        "current_profile": profile_service.get_profile(active_profile_id),
+        "summary": sql_profiler.summary(),
+        "statements": sql_profiler.top(max(1, min(limit, 200)), order),
+        "recent": sql_profiler.recent(),
+        "order": order,
+        "repeated_threshold": REPEATED_THRESHOLD,
+    }
+    return templates.TemplateResponse("admin/sql.html", context)
+
+
+@router.get("/sql/stats")
+async def admin_sql_stats(order: str = "total", limit: int = 25):
+    return JSONResponse(
+        {
+            "summary": sql_profiler.summary(),
+            "statements": sql_profiler.top(max(1, min(limit, 200)), order),
+            "recent": sql_profiler.recent(),
+        }
+    )
+
+
+@router.post("/sql/toggle")
+async def admin_sql_toggle(enabled: int = Form(...), profile_id: int | None = Form(None)):
+    active_profile_id = profile_service.resolve_profile_id(profile_id)
+    sql_profiler.set_enabled(bool(enabled))
+    return RedirectResponse(url=f"/admin/sql?profile_id={active_profile_id}", status_code=303)
+
+
+@router.post("/sql/reset")
+async def admin_sql_reset(profile_id: int | None = Form(None)):
+    active_profile_id = profile_service.resolve_profile_id(profile_id)
+    sql_profiler.reset()
+    return RedirectResponse(url=f"/admin/sql?profile_id={active_profile_id}", status_code=303)
+
+
+@router.get("/cache")
+async def admin_cache():
+    """Träff-/miss-/utträngningsstatistik för receptcachen."""
+    return JSONResponse({"recipes": recipe_service.cache_stats()})
+
+
 @router.get("/units", response_class=HTMLResponse)
 async def admin_units(request: Request, profile_id: int | None = None):
     """Visa och förbered redigering av måttenheter."""
-    active_profile_id = _resolve_profile(profile_id)
+    active_profile_id = profile_service.resolve_profile_id(profile_id)
     units = get_all_units()
     categories = [
         (UnitCategory.WEIGHT, "Vikt"),
@@ -123,100 +232,93 @@ async def admin_units(request: Request, profile_id: int | None = None):
 
 
 @router.get("/import", response_class=HTMLResponse)
-async def admin_import_recipes(request: Request, profile_id: int | None = None):
-    active_profile_id = _resolve_profile(profile_id)
+async def admin_import_recipes(request: Request, profile_id: int | None = None, job_id: str | None = None):
+    active_profile_id = profile_service.resolve_profile_id(profile_id)
+    job = await run_in_db(job_service.get_job, job_id) if job_id else None
     context = {
         "request": request,
         "title": "Importera recept",
         "subtitle": "Ladda upp en JSON-fil enligt importformatet",
         "profiles": profile_service.list_profiles(),
         "current_profile": profile_service.get_profile(active_profile_id),
-        "result": None,
+        "job": job,
+        "result": job.result if job and job.status == JOB_SUCCEEDED else None,
     }
     return templates.TemplateResponse("admin/import_recipes.html", context)
 
 
-@router.post("/import", response_class=HTMLResponse)
+def _submit_job(kind: str, func, *args, **kwargs):
+    try:
+        return job_service.submit(kind, func, *args, **kwargs)
+    except JobQueueFull as exc:
+        raise HTTPException(status_code=503, detail=str(exc))
+
+
+def _spool_upload(file: UploadFile) -> Path:
+    """Kopiera uppladdningen till data/jobs i bitar; jobbet läser den efter att requesten är klar."""
+    jobs_dir = job_service.spool_dir()
+    jobs_dir.mkdir(parents=True, exist_ok=True)
+    path = jobs_dir / f"{uuid.uuid4().hex}.upload"
+    with path.open("wb") as out:
+        shutil.copyfileobj(file.file, out, 64 * 1024)
+    return path
+
+
+@router.post("/import")
 async def admin_import_recipes_post(
-    request: Request,
     profile_id: int | None = Form(None),
+    batch_size: int | None = Form(None),
     file: UploadFile = File(...),
 ):
-    """Läs JSON med {\"recipes\": [...]} och skapa recept för vald profil."""
-    active_profile_id = _resolve_profile(profile_id)
-    content = await file.read()
+    """Lägg importen av JSON/NDJSON som bakgrundsjobb och visa dess progress."""
+    active_profile_id = profile_service.resolve_profile_id(profile_id)
+    path = await asyncio.to_thread(_spool_upload, file)
     try:
-        payload = json.loads(content)
-    except json.JSONDecodeError:
-        raise HTTPException(status_code=400, detail="Ogiltig JSON-fil")
-
-    # Stöd både för { "recipes": [...] } och ren list-root [...]
-    if isinstance(payload, list):
-        recipes_payload = payload
-    elif isinstance(payload, dict):
-        recipes_payload = payload.get("recipes", [])
-    else:
-        raise HTTPException(status_code=400, detail="Ogiltigt JSON-format")
-    imported = 0
-    for item in recipes_payload:
-        title = item.get("title")
-        if not title:
-            continue
-        description = item.get("description")
-        servings_raw = item.get("servings")
-        servings = None
-        if isinstance(servings_raw, int):
-            servings = servings_raw
-        elif isinstance(servings_raw, str):
-            try:
-                servings = int(servings_raw)
-            except ValueError:
-                servings = None  # Tillåt t.ex. "3-4" utan att krascha
-        created_by = item.get("created_by") or active_profile_id
-        image_url = item.get("image_url")
-        ingredients_payload = item.get("ingredients", [])
-        steps_payload = item.get("steps", [])
-        tags_payload = item.get("tags", [])
-
-        ingredients = []
-        for ing in ingredients_payload:
-            name = ing.get("name")
-            if not name:
-                continue
-            amount = ing.get("amount")
-            ingredients.append(Ingredient(name=name, amount=amount))
-
-        steps = [s for s in steps_payload if isinstance(s, str)]
-        tags = [t for t in tags_payload if isinstance(t, str)]
-
-        recipe_service.add_recipe(
-            title=title,
-            description=description,
-            ingredients=ingredients,
-            steps=steps,
-            tags=tags,
-            created_by=created_by,
-            servings=servings,
-            image_url=image_url,
-            archived=bool(item.get("archived")) if isinstance(item, dict) else False,
+        job = await run_in_db(
+            _submit_job,
+            "import",
+            import_service.import_file_job,
+            path,
+            active_profile_id,
+            batch_size,
+            # Tas bort även om jobbet avbryts innan det hunnit starta
+            cleanup=lambda: path.unlink(missing_ok=True),
         )
-        imported += 1
+    except Exception:
+        path.unlink(missing_ok=True)
+        raise
+    return RedirectResponse(url=f"/admin/import?profile_id={active_profile_id}&job_id={job.id}", status_code=303)
 
-    context = {
-        "request": request,
-        "title": "Importera recept",
-        "subtitle": "Ladda upp en JSON-fil enligt importformatet",
-        "profiles": profile_service.list_profiles(),
-        "current_profile": profile_service.get_profile(active_profile_id),
-        "result": {"imported": imported, "total": len(recipes_payload)},
-    }
-    return templates.TemplateResponse("admin/import_recipes.html", context)
+
+@router.get("/jobs")
+async def admin_jobs(limit: int = 20):
+    jobs = await run_in_db(job_service.list_jobs, max(1, min(limit, 200)))
+    return JSONResponse({"jobs": [job.model_dump() for job in jobs]})
+
+
+@router.get("/jobs/{job_id}")
+async def admin_job(job_id: str):
+    """Lätt statusendpoint som admin-sidorna pollar."""
+    job = await run_in_db(job_service.get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Jobbet finns inte")
+    return JSONResponse(job.model_dump())
+
+
+@router.post("/jobs/{job_id}/cancel")
+async def admin_job_cancel(job_id: str):
+    cancelled = await run_in_db(job_service.cancel, job_id)
+    return JSONResponse({"cancel_requested": cancelled})
 
 
 @router.get("/search")
-async def admin_search_api(request: Request, profile_id: int | None = None, q: str = "", include_archived: bool = False):
-    active_profile_id = _resolve_profile(profile_id)
-    results = recipe_service.search_recipes(q, profile_id=active_profile_id, include_archived=include_archived)
+async def admin_search_api(
+    request: Request, profile_id: int | None = None, q: str = "", include_archived: bool = False, limit: int | None = None
+):
+    active_profile_id = profile_service.resolve_profile_id(profile_id)
+    results = await async_recipe_service.search_summaries(
+        q, profile_id=active_profile_id, include_archived=include_archived, limit=limit, with_tags=False
+    )
     return JSONResponse({"results": [_serialize_recipe(r) for r in results]})
 
 
@@ -226,70 +328,89 @@ async def archive_recipe(
     archived: int = Form(...),
     profile_id: int | None = Form(None),
 ):
-    active_profile_id = _resolve_profile(profile_id)
-    recipe_service.update_recipe(recipe_id, archived=bool(archived))
+    active_profile_id = profile_service.resolve_profile_id(profile_id)
+    await async_recipe_service.update_recipe(recipe_id, archived=bool(archived))
     return RedirectResponse(url=f"/admin/recipes?profile_id={active_profile_id}&include_archived=1", status_code=303)
 
 
 @router.post("/db/delete-recipe")
 async def admin_delete_recipe(recipe_id: int = Form(...), profile_id: int | None = Form(None)):
-    active_profile_id = _resolve_profile(profile_id)
+    active_profile_id = profile_service.resolve_profile_id(profile_id)
+    await async_recipe_service.delete_recipe(recipe_id)
+    return RedirectResponse(url=f"/admin/db?profile_id={active_profile_id}", status_code=303)
+
+
+# Raderingar härifrån känner inte profilen; räkna upp den globala nyckeln
+_DATA_VERSION_KEYS = {"menu_entries": "menu", "shopping_items": "shopping"}
+
+
+def _delete_row(table: str, row_id: int) -> None:
     with connection_scope() as conn:
-        conn.execute("DELETE FROM ingredients WHERE recipe_id = ?", (recipe_id,))
-        conn.execute("DELETE FROM steps WHERE recipe_id = ?", (recipe_id,))
-        conn.execute("DELETE FROM tags WHERE recipe_id = ?", (recipe_id,))
-        conn.execute("DELETE FROM menu_entries WHERE recipe_id = ?", (recipe_id,))
-        conn.execute("DELETE FROM recipes WHERE id = ?", (recipe_id,))
+        conn.execute(f"DELETE FROM {table} WHERE id = ?", (row_id,))
         conn.commit()
-    return RedirectResponse(url=f"/admin/db?profile_id={active_profile_id}", status_code=303)
+    data_versions.bump(_DATA_VERSION_KEYS[table])
 
 
 @router.post("/db/delete-menu-entry")
 async def admin_delete_menu_entry(entry_id: int = Form(...), profile_id: int | None = Form(None)):
-    active_profile_id = _resolve_profile(profile_id)
-    with connection_scope() as conn:
-        conn.execute("DELETE FROM menu_entries WHERE id = ?", (entry_id,))
-        conn.commit()
+    active_profile_id = profile_service.resolve_profile_id(profile_id)
+    await run_in_db(_delete_row, "menu_entries", entry_id)
     return RedirectResponse(url=f"/admin/db?profile_id={active_profile_id}", status_code=303)
 
 
 @router.post("/db/delete-shopping-item")
 async def admin_delete_shopping_item(item_id: int = Form(...), profile_id: int | None = Form(None)):
-    active_profile_id = _resolve_profile(profile_id)
-    with connection_scope() as conn:
-        conn.execute("DELETE FROM shopping_items WHERE id = ?", (item_id,))
-        conn.commit()
+    active_profile_id = profile_service.resolve_profile_id(profile_id)
+    await run_in_db(_delete_row, "shopping_items", item_id)
     return RedirectResponse(url=f"/admin/db?profile_id={active_profile_id}", status_code=303)
 
 
-@router.get("/backup", response_class=FileResponse)
-async def admin_backup(profile_id: int | None = None):
-    """Skapa en zip-backup av databasen och bilderna och returnera för nedladdning."""
-    _ = _resolve_profile(profile_id)
-    db_path = settings.data_dir / "app.db"
-    images_dir = settings.data_dir / "images"
-    backup_dir = settings.data_dir / "backups"
-    backup_dir.mkdir(parents=True, exist_ok=True)
+@router.get("/backup")
+async def admin_backup(profile_id: int | None = None, keep: bool = False, full: bool = False):
+    """Strömma en zip-backup av databasen och nya bilder.
 
-    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-    zip_path = backup_dir / f"backup-{timestamp}.zip"
+    keep=1 sparar även en kopia i data/backups, full=1 tar med alla bilder.
+    """
+    _ = profile_service.resolve_profile_id(profile_id)
+    name = backup_service.new_backup_name()
+    return StreamingResponse(
+        backup_service.iter_backup_zip(archive=name, retain=keep, full=full),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{name}"'},
+    )
+
+
+@router.post("/backup")
+async def admin_backup_job(profile_id: int | None = Form(None), full: bool = Form(False)):
+    """Bygg backupen som bakgrundsjobb; sidan pollar och visar nedladdningslänken."""
+    active_profile_id = profile_service.resolve_profile_id(profile_id)
+    job = await run_in_db(_submit_job, "backup", backup_service.backup_job, full=full)
+    return RedirectResponse(url=f"/admin/db?profile_id={active_profile_id}&job_id={job.id}", status_code=303)
+
+
+@router.get("/backup/files/{name}", response_class=FileResponse)
+async def admin_backup_file(name: str):
+    path = backup_service.get_backup_file(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Backupen finns inte")
+    return FileResponse(path, media_type="application/zip", filename=path.name)
 
-    with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
-        if db_path.exists():
-            zf.write(db_path, arcname="app.db")
-        if images_dir.exists():
-            for path in images_dir.rglob("*"):
-                if path.is_file():
-                    arcname = Path("images") / path.relative_to(images_dir)
-                    zf.write(path, arcname=str(arcname))
 
-    return FileResponse(zip_path, media_type="application/zip", filename=zip_path.name)
+def _rebuild_search_index_job(job) -> dict:
+    return {"indexed": recipe_service.rebuild_search_index()}
+
+
+@router.post("/search/rebuild")
+async def admin_rebuild_search_index(profile_id: int | None = Form(None)):
+    active_profile_id = profile_service.resolve_profile_id(profile_id)
+    job = await run_in_db(_submit_job, "reindex", _rebuild_search_index_job)
+    return RedirectResponse(url=f"/admin/db?profile_id={active_profile_id}&job_id={job.id}", status_code=303)
 
 
 @router.get("/edit", response_class=HTMLResponse)
 async def admin_edit(request: Request, recipe_id: int, profile_id: int | None = None):
-    active_profile_id = _resolve_profile(profile_id)
-    recipe = recipe_service.get_recipe(recipe_id)
+    active_profile_id = profile_service.resolve_profile_id(profile_id)
+    recipe = await async_recipe_service.get_recipe(recipe_id)
     if not recipe:
         raise HTTPException(status_code=404, detail="Recipe not found")
     context = {
@@ -304,7 +425,7 @@ async def admin_edit(request: Request, recipe_id: int, profile_id: int | None =
 
 @router.get("/profiles", response_class=HTMLResponse)
 async def admin_profiles(request: Request, profile_id: int | None = None):
-    active_profile_id = _resolve_profile(profile_id)
+    active_profile_id = profile_service.resolve_profile_id(profile_id)
     context = {
         "request": request,
         "title": "Profiler",
@@ -316,7 +437,7 @@ async def admin_profiles(request: Request, profile_id: int | None = None):
 
 @router.get("/profile-settings", response_class=HTMLResponse)
 async def admin_profile_settings(request: Request, profile_id: int | None = None):
-    active_profile_id = _resolve_profile(profile_id)
+    active_profile_id = profile_service.resolve_profile_id(profile_id)
     profile = profile_service.get_profile(active_profile_id)
     theme_options = [("auto", "System (auto)"), ("light", "Ljust läge"), ("dark", "Mörkt läge")]
     context = {
@@ -340,22 +461,19 @@ async def admin_profile_settings_post(
     theme_preference: str | None = Form(None),
     profile_id: int | None = Form(None),
 ):
-    active_profile_id = _resolve_profile(profile_id)
+    active_profile_id = profile_service.resolve_profile_id(profile_id)
     saved_avatar: str | None = None
+    avatar_variants = None
     if avatar_file and avatar_file.filename:
-        images_dir = settings.data_dir / "images" / "avatars"
-        images_dir.mkdir(parents=True, exist_ok=True)
-        suffix = Path(avatar_file.filename).suffix
-        filename = f"{uuid.uuid4().hex}{suffix}"
-        target_path = images_dir / filename
-        with target_path.open("wb") as f:
-            f.write(await avatar_file.read())
-        saved_avatar = f"/uploads/avatars/{filename}"
-    profile_service.update_profile(
+        stored = await upload_service.save_image(avatar_file, subdir="avatars")
+        saved_avatar = stored.url
+        avatar_variants = await image_service.create_variants(stored.path)
+    await async_profile_service.update_profile(
         target_profile_id,
         name=name or None,
         email=email or None,
         avatar_url=saved_avatar,
+        avatar_variants=avatar_variants,
         theme_preference=theme_preference or None,
     )
     return RedirectResponse(url=f"/admin/profile-settings?profile_id={active_profile_id}", status_code=303)
@@ -369,18 +487,16 @@ async def admin_profiles_new(
     avatar_file: UploadFile | None = File(None),
     profile_id: int | None = Form(None),
 ):
-    active_profile_id = _resolve_profile(profile_id)
+    active_profile_id = profile_service.resolve_profile_id(profile_id)
     saved_avatar: str | None = None
+    avatar_variants = None
     if avatar_file and avatar_file.filename:
-        images_dir = settings.data_dir / "images" / "avatars"
-        images_dir.mkdir(parents=True, exist_ok=True)
-        suffix = Path(avatar_file.filename).suffix
-        filename = f"{uuid.uuid4().hex}{suffix}"
-        target_path = images_dir / filename
-        with target_path.open("wb") as f:
-            f.write(await avatar_file.read())
-        saved_avatar = f"/uploads/avatars/{filename}"
-    profile_service.create_profile(name=name, email=email or None, avatar_url=saved_avatar)
+        stored = await upload_service.save_image(avatar_file, subdir="avatars")
+        saved_avatar = stored.url
+        avatar_variants = await image_service.create_variants(stored.path)
+    await async_profile_service.create_profile(
+        name=name, email=email or None, avatar_url=saved_avatar, avatar_variants=avatar_variants
+    )
     return RedirectResponse(
         url=f"/admin/profiles?profile_id={active_profile_id}",
         status_code=303,
@@ -396,22 +512,19 @@ async def admin_profiles_update(
     avatar_file: UploadFile | None = File(None),
     profile_id: int | None = Form(None),
 ):
-    active_profile_id = _resolve_profile(profile_id)
+    active_profile_id = profile_service.resolve_profile_id(profile_id)
     saved_avatar: str | None = None
+    avatar_variants = None
     if avatar_file and avatar_file.filename:
-        images_dir = settings.data_dir / "images" / "avatars"
-        images_dir.mkdir(parents=True, exist_ok=True)
-        suffix = Path(avatar_file.filename).suffix
-        filename = f"{uuid.uuid4().hex}{suffix}"
-        target_path = images_dir / filename
-        with target_path.open("wb") as f:
-            f.write(await avatar_file.read())
-        saved_avatar = f"/uploads/avatars/{filename}"
-    updated = profile_service.update_profile(
+        stored = await upload_service.save_image(avatar_file, subdir="avatars")
+        saved_avatar = stored.url
+        avatar_variants = await image_service.create_variants(stored.path)
+    updated = await async_profile_service.update_profile(
         target_profile_id,
         name=name,
         email=email or None,
         avatar_url=saved_avatar,
+        avatar_variants=avatar_variants,
     )
     if not updated:
         raise HTTPException(status_code=404, detail="Profile not found")
@@ -435,8 +548,8 @@ async def admin_edit_post(
     tags_text: str = Form(""),
     profile_id: int | None = Form(None),
 ):
-    active_profile_id = _resolve_profile(profile_id)
-    recipe = recipe_service.get_recipe(recipe_id)
+    active_profile_id = profile_service.resolve_profile_id(profile_id)
+    recipe = await async_recipe_service.get_recipe(recipe_id)
     if not recipe:
         raise HTTPException(status_code=404, detail="Recipe not found")
 
@@ -448,30 +561,18 @@ async def admin_edit_post(
             servings_value = None
 
     uploaded_url: str | None = None
+    image_variants = None
     if image_file and image_file.filename:
-        images_dir = settings.data_dir / "images"
-        images_dir.mkdir(parents=True, exist_ok=True)
-        suffix = Path(image_file.filename).suffix
-        filename = f"{uuid.uuid4().hex}{suffix}"
-        target_path = images_dir / filename
-        with target_path.open("wb") as f:
-            f.write(await image_file.read())
-        uploaded_url = f"/uploads/{filename}"
-
-    ingredients = []
-    for line in ingredients_text.splitlines():
-        clean = line.strip()
-        if not clean:
-            continue
-        parts = clean.split(" ", 1)
-        amount = parts[0] if len(parts) > 1 else None
-        name = parts[1] if len(parts) > 1 else parts[0]
-        ingredients.append(Ingredient(name=name, amount=amount))
+        stored = await upload_service.save_image(image_file)
+        uploaded_url = stored.url
+        image_variants = await image_service.create_variants(stored.path)
+
+    ingredients = parse_ingredient_lines(ingredients_text)
 
     steps = [s.strip() for s in steps_text.splitlines() if s.strip()]
     tags = [t.strip() for t in tags_text.split(",") if t.strip()]
 
-    recipe_service.update_recipe(
+    await async_recipe_service.update_recipe(
         recipe_id,
         title=title,
         description=description,
@@ -480,6 +581,7 @@ async def admin_edit_post(
         steps=steps,
         tags=tags,
         image_url=uploaded_url or image_url or recipe.image_url,
+        image_variants=image_variants,
     )
 
     return RedirectResponse(
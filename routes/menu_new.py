@@ -4,21 +4,14 @@ from datetime import date
 
 from fastapi import APIRouter, Form, HTTPException, Request
 from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
 
-from core.config import settings
-from services.menu_service import menu_service
+from core.templating import templates
+from services.menu_service import async_menu_service
 from services.profile_service import profile_service
-from services.recipe_service import recipe_service
+from services.recipe_service import async_recipe_service
+from services.shopping_service import async_shopping_service
 
 router = APIRouter()
-templates = Jinja2Templates(directory=str(settings.template_dir))
-
-
-def _resolve_profile(profile_id: int | None) -> int:
-    if profile_id is None:
-        return 1
-    return profile_id if profile_service.get_profile(profile_id) else 1
 
 
 @router.get("/menu/new", response_class=HTMLResponse)
@@ -29,13 +22,24 @@ async def new_menu(
     year: int | None = None,
     responsible_profile_id: int | None = None,
     q: str | None = None,
+    after_id: int | None = None,
+    limit: int | None = None,
 ):
-    active_profile_id = _resolve_profile(profile_id)
+    active_profile_id = profile_service.resolve_profile_id(profile_id)
     current = date.today()
     selected_week = week_number or current.isocalendar().week
     selected_year = year or current.isocalendar().year
 
-    recipes = recipe_service.search_recipes(q, profile_id=active_profile_id) if q else recipe_service.list_recipes(profile_id=active_profile_id)
+    if q:
+        # Sökträffar är rankade, inte id-ordnade; visa de bästa i stället för att bläddra
+        recipes = await async_recipe_service.search_summaries(
+            q, profile_id=active_profile_id, limit=limit, with_tags=False
+        )
+        next_after_id = None
+    else:
+        recipes, next_after_id = await async_recipe_service.summary_page(
+            profile_id=active_profile_id, after_id=after_id, limit=limit, with_tags=False
+        )
     responsible = profile_service.get_profile(responsible_profile_id) if responsible_profile_id else None
 
     context = {
@@ -47,6 +51,7 @@ async def new_menu(
         "current_year": selected_year,
         "responsible": responsible,
         "recipes": recipes,
+        "next_after_id": next_after_id,
         "search_query": q or "",
     }
     return templates.TemplateResponse("menu/new.html", context)
@@ -60,13 +65,15 @@ async def create_menu(
     responsible_profile_id: int | None = Form(None),
     recipe_ids: str = Form(""),
 ):
-    active_profile_id = _resolve_profile(profile_id)
+    active_profile_id = profile_service.resolve_profile_id(profile_id)
     ids = [int(x) for x in recipe_ids.split(",") if x.strip().isdigit()]
     if not ids:
         raise HTTPException(status_code=400, detail="Inga recept valda")
-    menu_service.replace_menu(ids, profile_id=active_profile_id, week_number=week_number, year=year)
+    before = await async_menu_service.get_menu(profile_id=active_profile_id, week_number=week_number, year=year)
+    menu = await async_menu_service.replace_menu(ids, profile_id=active_profile_id, week_number=week_number, year=year)
+    await async_shopping_service.apply_menu_replacement(before, menu, profile_id=active_profile_id)
     if responsible_profile_id:
-        menu_service.set_responsible(
+        await async_menu_service.set_responsible(
             profile_id=active_profile_id,
             responsible_profile_id=responsible_profile_id,
             week_number=week_number,
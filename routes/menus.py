@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+from datetime import date
+from typing import List
+
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from core.data_versions import data_versions, not_modified, with_etag
+from models.weekly_menu import WeeklyMenu
+from services.menu_service import async_menu_service, menu_span
+from services.profile_service import profile_service
+
+router = APIRouter()
+
+
+@router.get("/menus", response_model=List[WeeklyMenu])
+async def list_menus(
+    request: Request,
+    profile_id: int | None = None,
+    start: date | None = None,
+    end: date | None = None,
+    weeks: int = 4,
+) -> Response:
+    """Veckomenyer för ett datumintervall (högst tolv veckor), en post per ISO-vecka.
+
+    Utan start börjar intervallet innevarande vecka; utan end används weeks.
+    """
+    active_profile_id = profile_service.resolve_profile_id(profile_id)
+    try:
+        first, last = menu_span(start, end, weeks)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    etag = data_versions.etag(request, "menu", f"menu:{active_profile_id}", extra=(first, active_profile_id))
+    if (cached := not_modified(request, etag)) is not None:
+        return cached
+    menus = await async_menu_service.get_menus(active_profile_id, first, last)
+    return with_etag(JSONResponse(jsonable_encoder(menus)), etag)
@@ -1,35 +1,31 @@
 from __future__ import annotations
 
-import uuid
-from pathlib import Path
-
 from datetime import date, timedelta
 
 from fastapi import APIRouter, File, Form, HTTPException, Request, UploadFile
-from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
 
-from core.config import settings
-from models.recipe import Ingredient
-from services.menu_service import menu_service
+from core.data_versions import data_versions, not_modified, with_etag
+from core.templating import templates
+from models.recipe import parse_ingredient_lines
+from services.image_service import image_service
+from services.menu_service import async_menu_service, menu_span
 from services.profile_service import profile_service
-from services.recipe_service import recipe_service
-from services.shopping_service import shopping_service
+from services.recipe_service import async_recipe_service
+from services.shopping_service import async_shopping_service
+from services.upload_service import upload_service
 
 router = APIRouter()
-templates = Jinja2Templates(directory=str(settings.template_dir))
-
 
-def _resolve_profile(profile_id: int | None) -> int:
-    if profile_id is None:
-        return 1
-    return profile_id if profile_service.get_profile(profile_id) else 1
+# Antal veckor som menykalendern erbjuder
+CALENDAR_WEEKS = (4, 8, 12)
+DAYS = ["Måndag", "Tisdag", "Onsdag", "Torsdag", "Fredag", "Lördag", "Söndag"]
 
 
 @router.get("/", response_class=HTMLResponse)
 async def home(request: Request, profile_id: int | None = None):
     """Startsida med enkla exempelvärden."""
-    active_profile_id = _resolve_profile(profile_id)
+    active_profile_id = profile_service.resolve_profile_id(profile_id)
     context = {
         "request": request,
         "title": "Virentoftakoket",
@@ -42,9 +38,17 @@ async def home(request: Request, profile_id: int | None = None):
 
 
 @router.get("/recipes", response_class=HTMLResponse)
-async def recipes_page(request: Request, profile_id: int | None = None):
-    active_profile_id = _resolve_profile(profile_id)
-    recipes = recipe_service.list_recipes(profile_id=active_profile_id)
+async def recipes_page(
+    request: Request, profile_id: int | None = None, after_id: int | None = None, limit: int | None = None
+):
+    active_profile_id = profile_service.resolve_profile_id(profile_id)
+    # Veckonumren i formuläret beror på dagens datum
+    etag = data_versions.etag(request, "recipes", "profiles", extra=date.today())
+    if (cached := not_modified(request, etag)) is not None:
+        return cached
+    recipes, next_after_id = await async_recipe_service.summary_page(
+        profile_id=active_profile_id, after_id=after_id, limit=limit
+    )
     current_week = date.today().isocalendar().week
     next_week = current_week + 1 if current_week < 52 else 1
     current_year = date.today().isocalendar().year
@@ -53,6 +57,7 @@ async def recipes_page(request: Request, profile_id: int | None = None):
         "request": request,
         "title": "Recept",
         "recipes": recipes,
+        "next_after_id": next_after_id,
         "profiles": profile_service.list_profiles(),
         "current_profile": profile_service.get_profile(active_profile_id),
         "current_week": current_week,
@@ -60,7 +65,7 @@ async def recipes_page(request: Request, profile_id: int | None = None):
         "current_year": current_year,
         "next_year": next_year,
     }
-    return templates.TemplateResponse("recipes/list.html", context)
+    return with_etag(templates.TemplateResponse("recipes/list.html", context), etag)
 
 
 @router.post("/recipes/menu")
@@ -71,13 +76,15 @@ async def create_weekly_menu(
     year: int | None = Form(None),
 ):
     """Skapa veckomeny från valda recept-ID:n (ordning: Mån-Sön)."""
-    active_profile_id = _resolve_profile(profile_id)
+    active_profile_id = profile_service.resolve_profile_id(profile_id)
     ids = [int(x) for x in recipe_ids.split(",") if x.strip().isdigit()]
     if not ids:
         raise HTTPException(status_code=400, detail="Inga recept valda")
     resolved_week = week_number or date.today().isocalendar().week
     resolved_year = year or date.today().isocalendar().year
-    menu_service.replace_menu(ids, profile_id=active_profile_id, week_number=resolved_week, year=resolved_year)
+    before = await async_menu_service.get_menu(profile_id=active_profile_id, week_number=resolved_week, year=resolved_year)
+    menu = await async_menu_service.replace_menu(ids, profile_id=active_profile_id, week_number=resolved_week, year=resolved_year)
+    await async_shopping_service.apply_menu_replacement(before, menu, profile_id=active_profile_id)
     return RedirectResponse(
         url=f"/menu?profile_id={active_profile_id}&week_number={resolved_week}&year={resolved_year}",
         status_code=303,
@@ -87,14 +94,13 @@ async def create_weekly_menu(
 @router.post("/menu/shopping")
 async def create_shopping_list(profile_id: int | None = Form(None), week_number: int | None = Form(None), year: int | None = Form(None)):
     """Generera inköpslista utifrån aktuell veckomeny."""
-    active_profile_id = _resolve_profile(profile_id)
-    menu = menu_service.get_menu(profile_id=active_profile_id, week_number=week_number, year=year)
+    active_profile_id = profile_service.resolve_profile_id(profile_id)
+    menu = await async_menu_service.get_menu(profile_id=active_profile_id, week_number=week_number, year=year)
     recipe_ids = [entry.recipe_id for entry in menu.entries if entry.recipe_id]
-    recipes = [recipe_service.get_recipe(rid) for rid in recipe_ids]
-    recipes = [r for r in recipes if r]
+    recipes = await async_recipe_service.get_recipes(recipe_ids)
     if not recipes:
         raise HTTPException(status_code=400, detail="Ingen veckomeny att skapa lista från")
-    shopping_service.set_from_recipes(recipes, profile_id=active_profile_id)
+    await async_shopping_service.set_from_recipes(recipes, profile_id=active_profile_id)
     resolved_week = week_number or menu.week_number or date.today().isocalendar().week
     resolved_year = year or getattr(menu, "year", None) or date.today().isocalendar().year
     return RedirectResponse(
@@ -102,6 +108,28 @@ async def create_shopping_list(profile_id: int | None = Form(None), week_number:
     )
 
 
+@router.post("/menu/shopping/toggle")
+async def toggle_shopping_item(item_id: int = Form(...), profile_id: int | None = Form(None)):
+    """Bocka av/på en rad i inköpslistan (en liten skrivning per tryck)."""
+    active_profile_id = profile_service.resolve_profile_id(profile_id)
+    checked = await async_shopping_service.toggle_item(item_id, profile_id=active_profile_id)
+    if checked is None:
+        raise HTTPException(status_code=404, detail="Shopping item not found")
+    return JSONResponse({"id": item_id, "checked": checked})
+
+
+@router.post("/menu/shopping/check")
+async def check_shopping_items(
+    item_ids: list[int] = Form([]),
+    checked: bool = Form(True),
+    profile_id: int | None = Form(None),
+):
+    """Bocka av eller på flera rader i en transaktion."""
+    active_profile_id = profile_service.resolve_profile_id(profile_id)
+    updated = await async_shopping_service.set_checked(item_ids, checked, profile_id=active_profile_id)
+    return JSONResponse({"updated": updated, "checked": checked})
+
+
 @router.post("/menu/remove")
 async def remove_menu_entry(
     profile_id: int | None = Form(None),
@@ -109,14 +137,14 @@ async def remove_menu_entry(
     week_number: int | None = Form(None),
     year: int | None = Form(None),
 ):
-    active_profile_id = _resolve_profile(profile_id)
-    menu_service.remove_entry(day, profile_id=active_profile_id, week_number=week_number, year=year)
-    # Bygg om inköpslistan från återstående recept i menyn
-    menu = menu_service.get_menu(profile_id=active_profile_id, week_number=week_number, year=year)
-    recipe_ids = [entry.recipe_id for entry in menu.entries if entry.recipe_id]
-    recipes = [recipe_service.get_recipe(rid) for rid in recipe_ids]
-    recipes = [r for r in recipes if r]
-    shopping_service.set_from_recipes(recipes, profile_id=active_profile_id)
+    active_profile_id = profile_service.resolve_profile_id(profile_id)
+    before = await async_menu_service.get_menu(profile_id=active_profile_id, week_number=week_number, year=year)
+    removed_ids = [entry.recipe_id for entry in before.entries if entry.day == day and entry.recipe_id]
+    menu = await async_menu_service.remove_entry(day, profile_id=active_profile_id, week_number=week_number, year=year)
+    # Dra bort bara det borttagna receptets bidrag från inköpslistan
+    if removed_ids:
+        removed = await async_recipe_service.get_recipes(removed_ids)
+        await async_shopping_service.apply_menu_change(removed=removed, profile_id=active_profile_id)
     resolved_week = week_number or menu.week_number or date.today().isocalendar().week
     resolved_year = year or getattr(menu, "year", None) or date.today().isocalendar().year
     return RedirectResponse(
@@ -127,8 +155,8 @@ async def remove_menu_entry(
 
 @router.post("/menu/responsible")
 async def set_responsible(profile_id: int | None = Form(None), responsible_profile_id: int | None = Form(None), week_number: int | None = Form(None), year: int | None = Form(None)):
-    active_profile_id = _resolve_profile(profile_id)
-    menu_service.set_responsible(
+    active_profile_id = profile_service.resolve_profile_id(profile_id)
+    await async_menu_service.set_responsible(
         profile_id=active_profile_id,
         responsible_profile_id=responsible_profile_id,
         week_number=week_number,
@@ -144,13 +172,15 @@ async def set_responsible(profile_id: int | None = Form(None), responsible_profi
 @router.post("/menu/reorder")
 async def reorder_menu(profile_id: int | None = Form(None), recipe_ids: str = Form(""), week_number: int | None = Form(None), year: int | None = Form(None)):
     """Uppdatera veckomenyn med ny ordning (mappar till Mån–Sön)."""
-    active_profile_id = _resolve_profile(profile_id)
+    active_profile_id = profile_service.resolve_profile_id(profile_id)
     ids = [int(x) for x in recipe_ids.split(",") if x.strip().isdigit()]
     if not ids:
         raise HTTPException(status_code=400, detail="Inga recept att ordna")
     resolved_week = week_number or date.today().isocalendar().week
     resolved_year = year or date.today().isocalendar().year
-    menu_service.replace_menu(ids, profile_id=active_profile_id, week_number=resolved_week, year=resolved_year)
+    before = await async_menu_service.get_menu(profile_id=active_profile_id, week_number=resolved_week, year=resolved_year)
+    menu = await async_menu_service.replace_menu(ids, profile_id=active_profile_id, week_number=resolved_week, year=resolved_year)
+    await async_shopping_service.apply_menu_replacement(before, menu, profile_id=active_profile_id)
     return RedirectResponse(url=f"/menu?profile_id={active_profile_id}&week_number={resolved_week}&year={resolved_year}", status_code=303)
 
 
@@ -162,11 +192,18 @@ async def add_menu_recipes(
     year: int | None = Form(None),
 ):
     """Fyll på tomma dagar i en befintlig veckomeny."""
-    active_profile_id = _resolve_profile(profile_id)
+    active_profile_id = profile_service.resolve_profile_id(profile_id)
     cleaned_ids = [rid for rid in recipe_ids if rid]
     resolved_week = week_number or date.today().isocalendar().week
     resolved_year = year or date.today().isocalendar().year
-    menu_service.append_recipes(cleaned_ids, profile_id=active_profile_id, week_number=resolved_week, year=resolved_year)
+    before = await async_menu_service.get_menu(profile_id=active_profile_id, week_number=resolved_week, year=resolved_year)
+    menu = await async_menu_service.append_recipes(cleaned_ids, profile_id=active_profile_id, week_number=resolved_week, year=resolved_year)
+    used_days = {entry.day for entry in before.entries}
+    added_ids = [entry.recipe_id for entry in menu.entries if entry.day not in used_days and entry.recipe_id]
+    # Lägg bara till de nya receptens bidrag i inköpslistan
+    if added_ids:
+        added = await async_recipe_service.get_recipes(added_ids)
+        await async_shopping_service.apply_menu_change(added=added, profile_id=active_profile_id)
     return RedirectResponse(
         url=f"/menu?profile_id={active_profile_id}&week_number={resolved_week}&year={resolved_year}", status_code=303
     )
@@ -174,7 +211,7 @@ async def add_menu_recipes(
 
 @router.get("/recipes/new", response_class=HTMLResponse)
 async def new_recipe_form(request: Request, profile_id: int | None = None):
-    active_profile_id = _resolve_profile(profile_id)
+    active_profile_id = profile_service.resolve_profile_id(profile_id)
     context = {
         "request": request,
         "title": "Nytt recept",
@@ -197,7 +234,7 @@ async def create_recipe(
     tags_text: str = Form(""),
     profile_id: int | None = Form(None),
 ):
-    active_profile_id = _resolve_profile(profile_id)
+    active_profile_id = profile_service.resolve_profile_id(profile_id)
     servings_value: int | None = None
     if servings:
         try:
@@ -205,40 +242,29 @@ async def create_recipe(
         except ValueError:
             servings_value = None
 
-    ingredients = []
-    for line in ingredients_text.splitlines():
-        clean = line.strip()
-        if not clean:
-            continue
-        parts = clean.split(" ", 1)
-        amount = parts[0] if len(parts) > 1 else None
-        name = parts[1] if len(parts) > 1 else parts[0]
-        ingredients.append({"name": name, "amount": amount})
+    ingredients = parse_ingredient_lines(ingredients_text)
 
     steps = [s.strip() for s in steps_text.splitlines() if s.strip()]
     tags = [t.strip() for t in tags_text.split(",") if t.strip()]
 
     # Spara uppladdad bild om den finns
     uploaded_url: str | None = None
+    image_variants = None
     if image_file and image_file.filename:
-        images_dir = settings.data_dir / "images"
-        images_dir.mkdir(parents=True, exist_ok=True)
-        suffix = Path(image_file.filename).suffix
-        filename = f"{uuid.uuid4().hex}{suffix}"
-        target_path = images_dir / filename
-        with target_path.open("wb") as f:
-            f.write(await image_file.read())
-        uploaded_url = f"/uploads/{filename}"
-
-    recipe = recipe_service.add_recipe(
+        stored = await upload_service.save_image(image_file)
+        uploaded_url = stored.url
+        image_variants = await image_service.create_variants(stored.path)
+
+    recipe = await async_recipe_service.add_recipe(
         title=title,
         description=description,
-        ingredients=[Ingredient(**ing) for ing in ingredients],
+        ingredients=ingredients,
         steps=steps,
         tags=tags,
         created_by=active_profile_id,
         servings=servings_value,
         image_url=uploaded_url or image_url or None,
+        image_variants=image_variants,
     )
 
     redirect_url = f"/recipes/{recipe.id}?profile_id={active_profile_id}"
@@ -247,10 +273,13 @@ async def create_recipe(
 
 @router.get("/recipes/{recipe_id}", response_class=HTMLResponse)
 async def recipe_detail(request: Request, recipe_id: int, profile_id: int | None = None):
-    recipe = recipe_service.get_recipe(recipe_id, include_archived=False)
+    etag = data_versions.etag(request, "recipes", "profiles")
+    if (cached := not_modified(request, etag)) is not None:
+        return cached
+    recipe = await async_recipe_service.get_recipe(recipe_id, include_archived=False)
     if not recipe:
         raise HTTPException(status_code=404, detail="Recipe not found")
-    active_profile_id = _resolve_profile(profile_id)
+    active_profile_id = profile_service.resolve_profile_id(profile_id)
     context = {
         "request": request,
         "title": recipe.title,
@@ -258,12 +287,12 @@ async def recipe_detail(request: Request, recipe_id: int, profile_id: int | None
         "profiles": profile_service.list_profiles(),
         "current_profile": profile_service.get_profile(active_profile_id),
     }
-    return templates.TemplateResponse("recipes/detail.html", context)
+    return with_etag(templates.TemplateResponse("recipes/detail.html", context), etag)
 
 
 @router.get("/menu", response_class=HTMLResponse)
 async def weekly_menu(request: Request, profile_id: int | None = None, week_number: int | None = None):
-    active_profile_id = _resolve_profile(profile_id)
+    active_profile_id = profile_service.resolve_profile_id(profile_id)
     today = date.today()
     base_week = week_number or today.isocalendar().week
     base_year = request.query_params.get("year")
@@ -278,11 +307,27 @@ async def weekly_menu(request: Request, profile_id: int | None = None, week_numb
     prev_date = base_date - timedelta(days=7)
     next_date = base_date + timedelta(days=7)
 
-    menu = menu_service.get_menu(profile_id=active_profile_id, week_number=base_week, year=base_year)
-    recipes = recipe_service.list_recipes(profile_id=active_profile_id)
-    recipe_lookup = {r.id: r.title for r in recipes}
-    recipes_by_id = {r.id: r for r in recipes}
-    shopping_list = shopping_service.get_list(profile_id=active_profile_id)
+    etag = data_versions.etag(
+        request,
+        "recipes",
+        "profiles",
+        "menu",
+        f"menu:{active_profile_id}",
+        "shopping",
+        f"shopping:{active_profile_id}",
+        extra=(today, active_profile_id),
+    )
+    if (cached := not_modified(request, etag)) is not None:
+        return cached
+    menu = await async_menu_service.get_menu(profile_id=active_profile_id, week_number=base_week, year=base_year)
+    # Väljaren behöver bara receptraderna; fullständiga recept hämtas bara för menyns egna dagar
+    recipes = await async_recipe_service.list_summaries(profile_id=active_profile_id)
+    menu_recipes = await async_recipe_service.get_recipes(
+        [entry.recipe_id for entry in menu.entries if entry.recipe_id], include_archived=False
+    )
+    recipes_by_id = {r.id: r for r in menu_recipes}
+    recipe_lookup = {r.id: r.title for r in [*recipes, *menu_recipes]}
+    shopping_list = await async_shopping_service.get_list(profile_id=active_profile_id)
     responsible = (
         profile_service.get_profile(menu.responsible_profile_id) if getattr(menu, "responsible_profile_id", None) else None
     )
@@ -304,4 +349,43 @@ async def weekly_menu(request: Request, profile_id: int | None = None, week_numb
         "responsible": responsible,
         "current_profile": profile_service.get_profile(active_profile_id),
     }
-    return templates.TemplateResponse("menu/week.html", context)
+    return with_etag(templates.TemplateResponse("menu/week.html", context), etag)
+
+
+@router.get("/menu/calendar", response_class=HTMLResponse)
+async def menu_calendar(request: Request, profile_id: int | None = None, start: date | None = None, weeks: int = 4):
+    """Flera veckomenyer i en vy, hämtade med en intervallfråga."""
+    active_profile_id = profile_service.resolve_profile_id(profile_id)
+    weeks = weeks if weeks in CALENDAR_WEEKS else CALENDAR_WEEKS[0]
+    first, last = menu_span(start, weeks=weeks)
+    today = date.today()
+    etag = data_versions.etag(
+        request,
+        "recipes",
+        "profiles",
+        "menu",
+        f"menu:{active_profile_id}",
+        extra=(today, first, active_profile_id),
+    )
+    if (cached := not_modified(request, etag)) is not None:
+        return cached
+    menus = await async_menu_service.get_menus(active_profile_id, first, last)
+    recipe_ids = list(dict.fromkeys(entry.recipe_id for menu in menus for entry in menu.entries if entry.recipe_id))
+    recipes = await async_recipe_service.get_recipes(recipe_ids, include_archived=False)
+    context = {
+        "request": request,
+        "title": "Menykalender",
+        "menus": menus,
+        "days": DAYS,
+        "entries_by_week": [{entry.day: entry for entry in menu.entries} for menu in menus],
+        "recipes_by_id": {r.id: r for r in recipes},
+        "weeks": weeks,
+        "week_options": CALENDAR_WEEKS,
+        "start": first,
+        "prev_start": first - timedelta(weeks=weeks),
+        "next_start": first + timedelta(weeks=weeks),
+        "today_week": (today.isocalendar().year, today.isocalendar().week),
+        "profiles": profile_service.list_profiles(),
+        "current_profile": profile_service.get_profile(active_profile_id),
+    }
+    return with_etag(templates.TemplateResponse("menu/calendar.html", context), etag)
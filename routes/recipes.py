@@ -1,23 +1,48 @@
 from __future__ import annotations
 
-from typing import List
+from typing import List, Union
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 
-from models.recipe import Ingredient, Recipe
-from services.recipe_service import recipe_service
+from core.data_versions import data_versions, not_modified, with_etag
+from core.templating import page_url
+from models.recipe import Ingredient, Recipe, RecipeSummary
+from services.recipe_service import async_recipe_service
 
 router = APIRouter()
 
 
-@router.get("/recipes", response_model=List[Recipe])
-async def list_recipes(profile_id: int | None = None) -> List[Recipe]:
-    return recipe_service.list_recipes(profile_id=profile_id)
+@router.get("/recipes", response_model=Union[List[Recipe], List[RecipeSummary]])
+async def list_recipes(
+    request: Request,
+    profile_id: int | None = None,
+    after_id: int | None = None,
+    limit: int | None = None,
+    summary: bool = False,
+) -> Response:
+    """En sida recept i id-ordning; nästa sida anges i Link-huvudet (rel="next").
+
+    summary=1 ger RecipeSummary utan ingredienser och steg.
+    """
+    etag = data_versions.etag(request, "recipes")
+    if (cached := not_modified(request, etag)) is not None:
+        return cached
+    page = async_recipe_service.summary_page if summary else async_recipe_service.recipe_page
+    recipes, next_after_id = await page(profile_id=profile_id, after_id=after_id, limit=limit)
+    response = JSONResponse(jsonable_encoder(recipes))
+    if next_after_id is not None:
+        response.headers["Link"] = f'<{page_url(request, after_id=next_after_id)}>; rel="next"'
+    return with_etag(response, etag)
 
 
 @router.get("/recipes/{recipe_id}", response_model=Recipe)
-async def get_recipe(recipe_id: int) -> Recipe:
-    recipe = recipe_service.get_recipe(recipe_id)
+async def get_recipe(request: Request, recipe_id: int) -> Response:
+    etag = data_versions.etag(request, "recipes")
+    if (cached := not_modified(request, etag)) is not None:
+        return cached
+    recipe = await async_recipe_service.get_recipe(recipe_id)
     if not recipe:
         raise HTTPException(status_code=404, detail="Recipe not found")
-    return recipe
+    return with_etag(JSONResponse(jsonable_encoder(recipe)), etag)
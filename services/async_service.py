@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+from typing import Any, Awaitable, Callable, Generic, TypeVar
+
+from core.database import run_in_db
+
+S = TypeVar("S")
+
+
+class AsyncService(Generic[S]):
+    """Awaitbar fasad över en synkron service: varje metodanrop körs i DB-trådpoolen.
+
+    Routes awaitar fasaden i stället för att köra SQLite-arbetet på event-loopen.
+    """
+
+    def __init__(self, service: S) -> None:
+        self._service = service
+
+    @property
+    def sync(self) -> S:
+        """Den underliggande synkrona servicen (för kod som redan kör i DB-trådpoolen)."""
+        return self._service
+
+    def __getattr__(self, name: str) -> Callable[..., Awaitable[Any]]:
+        attr = getattr(self._service, name)
+        if not callable(attr):
+            raise AttributeError(f"{type(self._service).__name__}.{name} är inte en metod")
+
+        async def call(*args: Any, **kwargs: Any) -> Any:
+            return await run_in_db(attr, *args, **kwargs)
+
+        call.__name__ = name
+        # Cacha så att nästa uppslag inte går via __getattr__
+        self.__dict__[name] = call
+        return call
+
+
+__all__ = ["AsyncService"]
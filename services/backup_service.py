@@ -0,0 +1,351 @@
+from __future__ import annotations
+
+import contextvars
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import uuid
+import zipfile
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Deque, Dict, Generator, List, Optional, Tuple
+
+from core.config import settings
+from core.database import connection_scope
+from services.job_service import JobContext
+
+_COPY_CHUNK_SIZE = 256 * 1024
+_HASH_CHUNK_SIZE = 1024 * 1024
+_PREFETCH_PER_WORKER = 2
+# Så många gånger får en stegvis databasbackup börja om (efter skrivningar) innan den görs i ett steg
+_MAX_BACKUP_RESTARTS = 3
+# Redan komprimerade format lagras som de är i stället för att deflateras igen
+_STORED_SUFFIXES = {".jpg", ".jpeg", ".png", ".gif", ".webp", ".avif", ".heic", ".zip", ".gz"}
+
+ProgressFunc = Callable[[float, str], None]
+
+
+def _hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as fh:
+        while True:
+            chunk = fh.read(_HASH_CHUNK_SIZE)
+            if not chunk:
+                return digest.hexdigest()
+            digest.update(chunk)
+
+
+class _BackupRestarted(Exception):
+    """Stegvis backup har börjat om för många gånger."""
+
+
+class _ZipSink:
+    """Oseekbar utström för ZipFile: samlar bytes som strömmas vidare och tee:ar till en fil."""
+
+    def __init__(self, retained: BinaryIO | None = None) -> None:
+        self._chunks: List[bytes] = []
+        self._retained = retained
+
+    def write(self, data: bytes) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        if self._retained is not None:
+            self._retained.write(data)
+        return len(data)
+
+    def flush(self) -> None:
+        if self._retained is not None:
+            self._retained.flush()
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class BackupService:
+    """Zip-backup av databasen och bilderna.
+
+    Databasen kopieras med SQLites backup-API till en minnesdatabas i steg om
+    BACKUP_PAGES_PER_STEP sidor, så skrivare blockeras bara under varje enskilt
+    steg, och serialiseras direkt in i zippen utan mellanfil. Zippen byggs
+    strömmande och kan samtidigt sparas i data/backups. Bilder dedupliceras
+    mot manifestet i tabellen backup_manifest, så varje arkiv bara innehåller
+    bilder som tillkommit sedan förra backupen.
+    """
+
+    @property
+    def backup_dir(self) -> Path:
+        return settings.data_dir / "backups"
+
+    def new_backup_name(self) -> str:
+        # Manifestet pekar ut arkiv per namn, så två backuper samma sekund får inte krocka
+        return f"backup-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}.zip"
+
+    def snapshot_database(self, progress: Optional[Callable[[int, int], None]] = None) -> bytes:
+        """Konsistent kopia av databasen som bytes (en serialiserad minnesdatabas).
+
+        Stegvis backup börjar om när någon annan skriver; efter
+        _MAX_BACKUP_RESTARTS omstarter kopieras resten i ett enda steg.
+        """
+        restarts = 0
+        last_remaining: int | None = None
+
+        def step(status: int, remaining: int, total: int) -> None:
+            nonlocal restarts, last_remaining
+            # Omstart syns som att remaining inte minskar (kopieringen börjar om från sida 1)
+            if last_remaining is not None and remaining >= last_remaining:
+                restarts += 1
+                if restarts > _MAX_BACKUP_RESTARTS:
+                    raise _BackupRestarted()
+            last_remaining = remaining
+            if progress is not None:
+                progress(total - remaining, total)
+
+        # Egen kontext: strömmande svar körs efter att requestens anslutning lämnats tillbaka
+        def run() -> bytes:
+            with connection_scope() as source:
+                dest = sqlite3.connect(":memory:")
+                try:
+                    try:
+                        source.backup(
+                            dest,
+                            pages=max(1, settings.backup_pages_per_step),
+                            progress=step,
+                            sleep=settings.backup_step_sleep,
+                        )
+                    except _BackupRestarted:
+                        source.backup(dest, pages=-1)
+                    return dest.serialize()
+                finally:
+                    dest.close()
+
+        return contextvars.Context().run(run)
+
+    def _load_manifest(self) -> Dict[str, Dict[str, Any]]:
+        def run() -> Dict[str, Dict[str, Any]]:
+            with connection_scope() as conn:
+                rows = conn.execute("SELECT path, sha256, size, mtime_ns, archive, stored_as FROM backup_manifest").fetchall()
+            return {row["path"]: dict(row) for row in rows}
+
+        return contextvars.Context().run(run)
+
+    def _save_manifest(self, entries: Dict[str, Dict[str, Any]]) -> None:
+        def run() -> None:
+            with connection_scope() as conn:
+                try:
+                    conn.execute("DELETE FROM backup_manifest")
+                    conn.executemany(
+                        "INSERT INTO backup_manifest (path, sha256, size, mtime_ns, archive, stored_as) "
+                        "VALUES (:path, :sha256, :size, :mtime_ns, :archive, :stored_as)",
+                        list(entries.values()),
+                    )
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+
+        contextvars.Context().run(run)
+
+    def _plan_images(
+        self, archive: str, full: bool, executor: ThreadPoolExecutor, report: ProgressFunc
+    ) -> Tuple[Dict[str, Dict[str, Any]], List[Tuple[Path, str]], List[str]]:
+        """Jämför bildkatalogen med manifestet.
+
+        Bara nya eller ändrade filer (storlek/mtime) läses och hashas, parallellt.
+        Returnerar nytt manifest, filer som ska in i arkivet och borttagna sökvägar.
+        """
+        images_dir = settings.data_dir / "images"
+        previous = self._load_manifest()
+        files: Dict[str, Tuple[Path, os.stat_result]] = {}
+        if images_dir.exists():
+            for path in images_dir.rglob("*"):
+                if path.is_file():
+                    files[path.relative_to(images_dir).as_posix()] = (path, path.stat())
+
+        hashes: Dict[str, str] = {}
+        to_hash = []
+        for rel, (path, stat) in files.items():
+            old = previous.get(rel)
+            if old is not None and old["size"] == stat.st_size and old["mtime_ns"] == stat.st_mtime_ns:
+                hashes[rel] = old["sha256"]
+            else:
+                to_hash.append(rel)
+        for index, (rel, digest) in enumerate(
+            zip(to_hash, executor.map(_hash_file, (files[rel][0] for rel in to_hash))), start=1
+        ):
+            hashes[rel] = digest
+            report(0.1 * index / len(to_hash), f"Hashat {index} av {len(to_hash)} nya bilder")
+
+        by_hash: Dict[str, Tuple[str, str]] = {}
+        if not full:
+            for entry in previous.values():
+                by_hash.setdefault(entry["sha256"], (entry["archive"], entry["stored_as"]))
+
+        manifest: Dict[str, Dict[str, Any]] = {}
+        to_store: List[Tuple[Path, str]] = []
+        for rel in sorted(files):
+            path, stat = files[rel]
+            digest = hashes[rel]
+            location = by_hash.get(digest)
+            if location is None:
+                location = (archive, f"images/{rel}")
+                by_hash[digest] = location
+                to_store.append((path, location[1]))
+            manifest[rel] = {
+                "path": rel,
+                "sha256": digest,
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "archive": location[0],
+                "stored_as": location[1],
+            }
+        deleted = sorted(set(previous) - set(files))
+        return manifest, to_store, deleted
+
+    def iter_backup_zip(
+        self,
+        archive: str | None = None,
+        retain: bool = False,
+        full: bool = False,
+        progress: ProgressFunc | None = None,
+        check_cancelled: Callable[[], None] | None = None,
+    ) -> Generator[bytes, None, Dict[str, Any]]:
+        """Ge zip-arkivet i bitar medan det byggs; returnerar en sammanfattning.
+
+        Arkivet innehåller databasen, bilder som inte redan finns i en tidigare
+        backup (per innehållshash) och manifest.json som anger i vilket arkiv
+        varje bild ligger. full=True tar med alla bilder. Med retain skrivs samma
+        bytes till data/backups/<archive> i samma pass; filen får sitt namn
+        först när arkivet är komplett. Manifestet i databasen uppdateras bara
+        för kompletta arkiv som sparas på servern.
+        """
+        archive = archive or self.new_backup_name()
+        self.backup_dir.mkdir(parents=True, exist_ok=True)
+        retained_path = self.backup_dir / archive if retain else None
+        partial = retained_path.with_name(retained_path.name + ".part") if retained_path else None
+        retained = partial.open("wb") if partial else None
+        sink = _ZipSink(retained)
+        completed = False
+
+        def report(fraction: float, message: str) -> None:
+            if check_cancelled is not None:
+                check_cancelled()
+            if progress is not None:
+                progress(fraction, message)
+
+        executor = ThreadPoolExecutor(max_workers=max(1, settings.backup_workers), thread_name_prefix="backup")
+        try:
+            manifest, to_store, deleted = self._plan_images(archive, full, executor, report)
+            database = memoryview(
+                self.snapshot_database(
+                    lambda done, total: report(0.1 + 0.4 * done / max(total, 1), f"Databas: {done} av {total} sidor")
+                )
+            )
+            with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+                info = zipfile.ZipInfo("app.db", time.localtime()[:6])
+                info.compress_type = zipfile.ZIP_DEFLATED
+                with zf.open(info, "w") as dst:
+                    for start in range(0, len(database), _COPY_CHUNK_SIZE):
+                        dst.write(database[start : start + _COPY_CHUNK_SIZE])
+                        data = sink.drain()
+                        if data:
+                            yield data
+                database.release()
+
+                # Läs bilderna i förväg i trådpoolen medan föregående skrivs till arkivet
+                window = max(1, settings.backup_workers) * _PREFETCH_PER_WORKER
+                pending: Deque[Tuple[Path, str, Future]] = deque()
+                queue = iter(to_store)
+                for index in range(1, len(to_store) + 1):
+                    while len(pending) < window:
+                        item = next(queue, None)
+                        if item is None:
+                            break
+                        pending.append((item[0], item[1], executor.submit(item[0].read_bytes)))
+                    path, arcname, future = pending.popleft()
+                    report(0.5 + 0.5 * index / len(to_store), f"{index} av {len(to_store)} nya bilder")
+                    info = zipfile.ZipInfo(arcname, time.localtime(path.stat().st_mtime)[:6])
+                    info.compress_type = (
+                        zipfile.ZIP_STORED if path.suffix.lower() in _STORED_SUFFIXES else zipfile.ZIP_DEFLATED
+                    )
+                    zf.writestr(info, future.result())
+                    data = sink.drain()
+                    if data:
+                        yield data
+
+                summary = {
+                    "archive": archive,
+                    "full": full,
+                    "images": len(manifest),
+                    "stored": len(to_store),
+                    "reused": len(manifest) - len(to_store),
+                    "deleted": len(deleted),
+                }
+                # Vid återställning hämtas varje bild ur arkivet som anges här
+                document = {
+                    **summary,
+                    "created_at": datetime.now().isoformat(timespec="seconds"),
+                    "files": {
+                        rel: {key: entry[key] for key in ("sha256", "size", "archive", "stored_as")}
+                        for rel, entry in manifest.items()
+                    },
+                    "deleted_files": deleted,
+                }
+                zf.writestr("manifest.json", json.dumps(document, ensure_ascii=False, indent=1))
+            tail = sink.drain()
+            if tail:
+                yield tail
+            if retained is not None:
+                retained.close()
+                partial.replace(retained_path)
+                # Bara arkiv som finns kvar på servern får pekas ut av manifestet
+                self._save_manifest(manifest)
+            completed = True
+            return summary
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            if retained is not None and not completed:
+                retained.close()
+                partial.unlink(missing_ok=True)
+
+    def build_backup(self, job: JobContext | None = None, full: bool = False) -> Tuple[Path, Dict[str, Any]]:
+        """Skriv en ny backup till data/backups; returnerar sökväg och sammanfattning."""
+        stream = self.iter_backup_zip(
+            retain=True,
+            full=full,
+            progress=job.progress if job is not None else None,
+            check_cancelled=job.check_cancelled if job is not None else None,
+        )
+        while True:
+            try:
+                next(stream)
+            except StopIteration as done:
+                summary = done.value
+                break
+        return self.backup_dir / summary["archive"], summary
+
+    def backup_job(self, job: JobContext, full: bool = False) -> Dict[str, Any]:
+        zip_path, summary = self.build_backup(job, full=full)
+        return {
+            **summary,
+            "file": zip_path.name,
+            "size": zip_path.stat().st_size,
+            "download": f"/admin/backup/files/{zip_path.name}",
+        }
+
+    def get_backup_file(self, name: str) -> Path | None:
+        """Slå upp en sparad backup; bara filnamn direkt i backupkatalogen godtas."""
+        if Path(name).name != name or not name.endswith(".zip"):
+            return None
+        path = self.backup_dir / name
+        return path if path.is_file() else None
+
+
+backup_service = BackupService()
+
+__all__ = ["BackupService", "backup_service"]
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+from core.config import settings
+from models.image import ImageVariant
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow är valfritt; utan det serveras originalbilderna som förut
+    Image = None
+    ImageOps = None
+
+logger = logging.getLogger(__name__)
+
+_VARIANT_DIR = "variants"
+
+
+def _render_variants(
+    source: str,
+    out_dir: str,
+    stem: str,
+    widths: Sequence[int],
+    thumb_size: Tuple[int, int],
+    quality: int,
+) -> List[Dict[str, object]]:
+    """Skala ned en bild till tumnagel och responsiva bredder som WebP (körs i processpoolen).
+
+    Listan sparas bredvid varianterna som <stem>.json; uppladdningar är
+    innehållsadresserade, så en redan behandlad bild avkodas inte igen.
+    """
+    target = Path(out_dir)
+    target.mkdir(parents=True, exist_ok=True)
+    sidecar = target / f"{stem}.json"
+    if sidecar.exists():
+        return json.loads(sidecar.read_text())
+    variants: List[Dict[str, object]] = []
+    with Image.open(source) as opened:
+        # Mobilfoton är ofta roterade via EXIF; rotera pixlarna och släpp metadata
+        image = ImageOps.exif_transpose(opened)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+
+        thumb = ImageOps.fit(image, thumb_size, method=Image.LANCZOS)
+        name = f"{stem}-thumb.webp"
+        thumb.save(target / name, "WEBP", quality=quality, method=4)
+        variants.append({"kind": "thumb", "width": thumb.width, "height": thumb.height, "name": name})
+
+        # Aldrig uppskalning; originalets bredd används om den är mindre än största steget
+        steps = sorted({w for w in widths if w < image.width} | {min(image.width, max(widths))})
+        for width in steps:
+            height = max(1, round(image.height * width / image.width))
+            resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+            name = f"{stem}-{width}w.webp"
+            resized.save(target / name, "WEBP", quality=quality, method=4)
+            variants.append({"kind": "width", "width": width, "height": height, "name": name})
+    sidecar.write_text(json.dumps(variants))
+    return variants
+
+
+class ImageService:
+    """Genererar tumnaglar och responsiva WebP-varianter i en processpool.
+
+    Varianterna hamnar i data/images/variants och serveras under /uploads/variants.
+    Utan Pillow eller om bilden inte går att läsa blir listan tom och
+    originalet används.
+    """
+
+    def __init__(self, workers: int | None = None) -> None:
+        self._workers = max(1, settings.image_workers if workers is None else workers)
+        self._executor: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        return Image is not None
+
+    async def create_variants(self, path: Path) -> List[ImageVariant]:
+        """Skapa varianter för en sparad uppladdning (recept- eller avatarbild)."""
+        if not self.available:
+            return []
+        out_dir = settings.data_dir / "images" / _VARIANT_DIR
+        loop = asyncio.get_running_loop()
+        try:
+            rendered = await loop.run_in_executor(
+                self._get_executor(),
+                _render_variants,
+                str(path),
+                str(out_dir),
+                path.stem,
+                tuple(settings.image_widths),
+                tuple(settings.image_thumb_size),
+                settings.image_quality,
+            )
+        except Exception as exc:
+            logger.warning("Kunde inte skapa bildvarianter för %s: %s", path, exc)
+            return []
+        return [
+            ImageVariant(
+                kind=str(v["kind"]),
+                width=int(v["width"]),
+                height=int(v["height"]),
+                url=f"/uploads/{_VARIANT_DIR}/{v['name']}",
+            )
+            for v in rendered
+        ]
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(max_workers=self._workers)
+        return self._executor
+
+
+image_service = ImageService()
+
+__all__ = ["ImageService", "image_service"]
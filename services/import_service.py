@@ -0,0 +1,271 @@
+"""Strömmande receptimport: JSON/NDJSON tolkas i bitar och skrivs i batchar."""
+from __future__ import annotations
+
+import codecs
+import json
+import re
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional
+
+from pydantic import ValidationError
+
+from core.config import settings
+from models.recipe import Ingredient, Recipe
+from services.async_service import AsyncService
+from services.job_service import JobContext
+from services.recipe_service import recipe_service
+
+_READ_CHUNK_SIZE = 64 * 1024
+_WHITESPACE = " \t\r\n"
+_WRAPPER_RE = re.compile(r'\{\s*"recipes"\s*:\s*\[')
+
+
+class ImportFormatError(ValueError):
+    """Filen går inte att tolka som JSON-lista, {"recipes": [...]} eller NDJSON."""
+
+
+def read_chunks(fileobj: BinaryIO, chunk_size: int = _READ_CHUNK_SIZE) -> Iterator[bytes]:
+    while True:
+        chunk = fileobj.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_records(chunks: Iterable[bytes], max_record_bytes: int | None = None) -> Iterator[Any]:
+    """Ge ett JSON-värde i taget ur en ström av bytes.
+
+    Stöder list-root [...], {"recipes": [...]} och NDJSON (ett objekt per rad).
+    Bufferten håller bara det element som tolkas just nu; ett enskilt element
+    större än max_record_bytes avbryter importen.
+    """
+    limit = settings.import_max_record_bytes if max_record_bytes is None else max_record_bytes
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8-sig")()
+    source = iter(chunks)
+    buf = ""
+    pos = 0
+    eof = False
+    mode: Optional[str] = None  # "array" eller "stream"
+
+    def fill() -> bool:
+        nonlocal buf, pos, eof
+        if eof:
+            return False
+        try:
+            chunk = next(source)
+            text = utf8.decode(chunk)
+        except StopIteration:
+            text = utf8.decode(b"", final=True)
+            eof = True
+        except UnicodeDecodeError as exc:
+            raise ImportFormatError("Filen är inte UTF-8") from exc
+        buf = buf[pos:] + text
+        pos = 0
+        if len(buf) > limit:
+            raise ImportFormatError(f"Ett enskilt recept är större än {limit} tecken")
+        return True
+
+    def skip(chars: str) -> bool:
+        """Hoppa över tecken i chars; False om strömmen tog slut."""
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in chars:
+                pos += 1
+            if pos < len(buf):
+                return True
+            if not fill():
+                return False
+
+    def decode() -> Any:
+        nonlocal pos
+        while True:
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError as exc:
+                if not fill():
+                    raise ImportFormatError(f"Ogiltig JSON: {exc.msg}") from exc
+                continue
+            # Ett tal i slutet av bufferten kan fortsätta i nästa bit
+            if end == len(buf) and not eof and not isinstance(value, (dict, list)):
+                fill()
+                continue
+            pos = end
+            return value
+
+    if not skip(_WHITESPACE):
+        return
+    if buf[pos] == "[":
+        mode = "array"
+        pos += 1
+    else:
+        # Läs tills prefixet räcker för att känna igen {"recipes": [
+        while not eof and len(buf) - pos < 64 and _WRAPPER_RE.match(buf, pos) is None:
+            fill()
+        match = _WRAPPER_RE.match(buf, pos)
+        if match is not None:
+            mode = "array"
+            pos = match.end()
+        elif buf[pos] == "{":
+            mode = "stream"
+        else:
+            raise ImportFormatError("Ogiltigt JSON-format")
+
+    if mode == "array":
+        while True:
+            if not skip(_WHITESPACE + ","):
+                raise ImportFormatError("Ogiltig JSON: listan avslutas aldrig")
+            if buf[pos] == "]":
+                return  # resten av ett {"recipes": [...]}-omslag ignoreras
+            yield decode()
+    else:
+        while skip(_WHITESPACE):
+            value = decode()
+            # Ett helt omslag på en rad, t.ex. med andra nycklar före "recipes"
+            if isinstance(value, dict) and "title" not in value and isinstance(value.get("recipes"), list):
+                yield from value["recipes"]
+            else:
+                yield value
+
+
+def _to_recipe(item: Any, active_profile_id: int) -> Optional[Recipe]:
+    if not isinstance(item, dict):
+        return None
+    title = item.get("title")
+    if not title or not isinstance(title, str):
+        return None
+    servings_raw = item.get("servings")
+    servings = None
+    if isinstance(servings_raw, int):
+        servings = servings_raw
+    elif isinstance(servings_raw, str):
+        try:
+            servings = int(servings_raw)
+        except ValueError:
+            servings = None  # Tillåt t.ex. "3-4" utan att krascha
+
+    try:
+        ingredients = []
+        for ing in item.get("ingredients") or []:
+            if not isinstance(ing, dict) or not ing.get("name"):
+                continue
+            amount = ing.get("amount")
+            ingredients.append(Ingredient(name=str(ing["name"]), amount=None if amount is None else str(amount)))
+
+        return Recipe(
+            title=title,
+            description=item.get("description"),
+            servings=servings,
+            image_url=item.get("image_url"),
+            created_by=item.get("created_by") or active_profile_id,
+            ingredients=ingredients,
+            steps=[s for s in item.get("steps") or [] if isinstance(s, str)],
+            tags=[t for t in item.get("tags") or [] if isinstance(t, str)],
+            archived=bool(item.get("archived")),
+        )
+    except (TypeError, ValidationError):
+        return None  # T.ex. description som tal eller ingredients som inte är en lista
+
+
+class RecipeImportService:
+    """Importerar recept från en bytesström i transaktioner om batch_size recept."""
+
+    def import_stream(
+        self,
+        chunks: Iterable[bytes],
+        profile_id: int,
+        batch_size: int | None = None,
+        on_batch: Callable[[Dict[str, Any]], None] | None = None,
+    ) -> Dict[str, Any]:
+        """Importera och returnera en rapport med utfall per batch.
+
+        En batch som fallerar rullas tillbaka och rapporteras; importen fortsätter
+        med nästa. Ett formatfel avbryter tolkningen men redan skrivna batchar står kvar.
+        on_batch anropas med rapporten efter varje skriven batch.
+        """
+        size = max(1, batch_size or settings.import_batch_size)
+        report: Dict[str, Any] = {
+            "imported": 0,
+            "skipped": 0,
+            "total": 0,
+            "batch_size": size,
+            "batches": [],
+            "errors": [],
+            "aborted": False,
+        }
+        pending: List[Recipe] = []
+        skipped = 0
+
+        def flush() -> None:
+            nonlocal pending, skipped
+            if not pending and not skipped:
+                return
+            entry: Dict[str, Any] = {"batch": len(report["batches"]) + 1, "imported": 0, "skipped": skipped, "errors": []}
+            try:
+                entry["imported"] = len(recipe_service.add_recipes_bulk(pending))
+            except Exception as exc:
+                entry["errors"].append(str(exc))
+                entry["skipped"] += len(pending)
+                report["errors"].append(f"Batch {entry['batch']}: {exc}")
+            report["imported"] += entry["imported"]
+            report["skipped"] += entry["skipped"]
+            report["batches"].append(entry)
+            pending = []
+            skipped = 0
+            if on_batch is not None:
+                on_batch(report)
+
+        try:
+            for item in iter_records(chunks):
+                report["total"] += 1
+                recipe = _to_recipe(item, profile_id)
+                if recipe is None:
+                    skipped += 1
+                else:
+                    pending.append(recipe)
+                if len(pending) + skipped >= size:
+                    flush()
+        except ImportFormatError as exc:
+            report["errors"].append(str(exc))
+            report["aborted"] = True
+        flush()
+        return report
+
+    def import_file_job(self, job: JobContext, path: Path, profile_id: int, batch_size: int | None = None) -> Dict[str, Any]:
+        """Jobbvariant: importera en sparad uppladdning och ta bort den efteråt.
+
+        Progress räknas på lästa bytes; avbrott sker mellan två bitar och redan
+        skrivna batchar står kvar.
+        """
+        size = max(1, path.stat().st_size)
+        read = 0
+
+        def chunks(fileobj: BinaryIO) -> Iterator[bytes]:
+            nonlocal read
+            for chunk in read_chunks(fileobj):
+                job.check_cancelled()
+                read += len(chunk)
+                job.progress(read / size)
+                yield chunk
+
+        def on_batch(report: Dict[str, Any]) -> None:
+            job.progress(read / size, f"{report['imported']} av {report['total']} recept importerade", force=True)
+
+        try:
+            with path.open("rb") as fileobj:
+                return self.import_stream(chunks(fileobj), profile_id, batch_size=batch_size, on_batch=on_batch)
+        finally:
+            path.unlink(missing_ok=True)
+
+
+import_service = RecipeImportService()
+async_import_service = AsyncService(import_service)
+
+__all__ = [
+    "ImportFormatError",
+    "RecipeImportService",
+    "async_import_service",
+    "import_service",
+    "iter_records",
+    "read_chunks",
+]
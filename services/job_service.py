@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+import contextvars
+import json
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from core.config import settings
+from core.database import connection_scope
+from models.job import (
+    JOB_CANCELLED,
+    JOB_FAILED,
+    JOB_QUEUED,
+    JOB_RUNNING,
+    JOB_SUCCEEDED,
+    Job,
+)
+
+logger = logging.getLogger(__name__)
+
+# Progress skrivs till databasen högst så här ofta per jobb
+_PROGRESS_INTERVAL = 0.5
+_KEEP_FINISHED_JOBS = 200
+
+
+class JobCancelled(Exception):
+    """Kastas i jobbet när avbrott har begärts."""
+
+
+class JobQueueFull(RuntimeError):
+    """För många jobb väntar redan på en ledig arbetare."""
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+class JobContext:
+    """Handtaget ett jobb får: rapportera progress och kontrollera avbrott."""
+
+    def __init__(self, service: "JobService", job_id: str, cancel_event: threading.Event) -> None:
+        self.id = job_id
+        self._service = service
+        self._cancel_event = cancel_event
+        self._last_write = 0.0
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def check_cancelled(self) -> None:
+        if self._cancel_event.is_set():
+            raise JobCancelled()
+
+    def progress(self, fraction: float, message: str | None = None, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._last_write < _PROGRESS_INTERVAL:
+            return
+        self._last_write = now
+        self._service._update(self.id, progress=max(0.0, min(1.0, fraction)), message=message)
+
+
+JobFunc = Callable[..., Optional[Dict[str, Any]]]
+
+
+class JobService:
+    """Bakgrundsjobb i en begränsad trådpool med status persisterad i tabellen jobs.
+
+    Jobbfunktionen får en JobContext som första argument och returnerar en
+    JSON-serialiserbar dict som sparas som resultat. Avbrott är kooperativt:
+    jobbet anropar check_cancelled() mellan sina steg. cleanup körs när jobbet
+    är slut oavsett utfall, även om det avbröts innan det startade.
+    """
+
+    def __init__(self, workers: int | None = None, queue_size: int | None = None) -> None:
+        self._workers = max(1, settings.job_workers if workers is None else workers)
+        self._queue_size = max(1, settings.job_queue_size if queue_size is None else queue_size)
+        self._executor: ThreadPoolExecutor | None = None
+        self._cancel_events: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def spool_dir() -> Path:
+        """Katalog för filer som jobb läser efter att requesten är klar (t.ex. importer)."""
+        return settings.data_dir / "jobs"
+
+    def submit(
+        self, kind: str, func: JobFunc, *args: Any, cleanup: Callable[[], None] | None = None, **kwargs: Any
+    ) -> Job:
+        """Lägg ett jobb i kön och returnera det direkt."""
+        with self._lock:
+            if len(self._cancel_events) >= self._queue_size:
+                raise JobQueueFull(f"Max {self._queue_size} jobb får vänta eller köra samtidigt")
+            job_id = uuid.uuid4().hex
+            cancel_event = threading.Event()
+            self._cancel_events[job_id] = cancel_event
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="job")
+            executor = self._executor
+
+        job = Job(id=job_id, kind=kind, status=JOB_QUEUED, created_at=_now())
+        try:
+            with connection_scope() as conn:
+                conn.execute(
+                    "INSERT INTO jobs (id, kind, status, progress, created_at) VALUES (?, ?, ?, 0, ?)",
+                    (job.id, job.kind, job.status, job.created_at),
+                )
+                conn.commit()
+            # Tom kontext: jobbet ska inte ärva requestens poolade anslutning
+            executor.submit(contextvars.Context().run, self._run, job_id, cancel_event, func, args, kwargs, cleanup)
+        except BaseException:
+            # Platsen i kön släpps först i _run, som aldrig startade
+            with self._lock:
+                self._cancel_events.pop(job_id, None)
+            raise
+        return job
+
+    def get_job(self, job_id: str) -> Optional[Job]:
+        with connection_scope() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def list_jobs(self, limit: int = 20) -> List[Job]:
+        with connection_scope() as conn:
+            rows = conn.execute("SELECT * FROM jobs ORDER BY created_at DESC, rowid DESC LIMIT ?", (limit,)).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def cancel(self, job_id: str) -> bool:
+        """Begär avbrott; False om jobbet inte finns eller redan är klart."""
+        with self._lock:
+            event = self._cancel_events.get(job_id)
+        if event is None:
+            return False
+        event.set()
+        self._update(job_id, cancel_requested=1)
+        return True
+
+    def recover(self) -> int:
+        """Markera jobb som avbröts av en omstart och rensa gamla avslutade jobb.
+
+        Körs vid start innan några jobb lagts, så alla kvarvarande spoolfiler är
+        föräldralösa och tas bort.
+        """
+        with connection_scope() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE status IN (?, ?)",
+                (JOB_FAILED, "Avbröts av omstart", _now(), JOB_QUEUED, JOB_RUNNING),
+            )
+            conn.execute(
+                "DELETE FROM jobs WHERE id NOT IN (SELECT id FROM jobs ORDER BY created_at DESC LIMIT ?)",
+                (_KEEP_FINISHED_JOBS,),
+            )
+            conn.commit()
+        spool = self.spool_dir()
+        if spool.is_dir():
+            for path in spool.iterdir():
+                if path.is_file():
+                    path.unlink(missing_ok=True)
+        return cur.rowcount
+
+    def shutdown(self) -> None:
+        """Begär avbrott för alla jobb och vänta in arbetarna."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+            events = list(self._cancel_events.values())
+        for event in events:
+            event.set()
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _run(
+        self,
+        job_id: str,
+        cancel_event: threading.Event,
+        func: JobFunc,
+        args: tuple,
+        kwargs: Dict[str, Any],
+        cleanup: Callable[[], None] | None = None,
+    ) -> None:
+        try:
+            if cancel_event.is_set():
+                raise JobCancelled()
+            self._update(job_id, status=JOB_RUNNING, started_at=_now())
+            result = func(JobContext(self, job_id, cancel_event), *args, **kwargs)
+            self._update(
+                job_id,
+                status=JOB_SUCCEEDED,
+                progress=1.0,
+                result=None if result is None else json.dumps(result),
+                finished_at=_now(),
+            )
+        except JobCancelled:
+            self._update(job_id, status=JOB_CANCELLED, message="Avbrutet", finished_at=_now())
+        except Exception as exc:
+            logger.exception("Jobb %s misslyckades", job_id)
+            self._update(job_id, status=JOB_FAILED, error=str(exc) or type(exc).__name__, finished_at=_now())
+        finally:
+            with self._lock:
+                self._cancel_events.pop(job_id, None)
+            if cleanup is not None:
+                try:
+                    cleanup()
+                except Exception:
+                    logger.exception("Städning efter jobb %s misslyckades", job_id)
+
+    def _update(self, job_id: str, **fields: Any) -> None:
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        with connection_scope() as conn:
+            conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+            conn.commit()
+
+    @staticmethod
+    def _row_to_job(row) -> Job:
+        return Job(
+            id=row["id"],
+            kind=row["kind"],
+            status=row["status"],
+            progress=row["progress"],
+            message=row["message"],
+            result=json.loads(row["result"]) if row["result"] else None,
+            error=row["error"],
+            cancel_requested=bool(row["cancel_requested"]),
+            created_at=row["created_at"],
+            started_at=row["started_at"],
+            finished_at=row["finished_at"],
+        )
+
+
+job_service = JobService()
+
+__all__ = ["JobCancelled", "JobContext", "JobQueueFull", "JobService", "job_service"]
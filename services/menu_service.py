@@ -1,10 +1,43 @@
 from __future__ import annotations
 
-from datetime import date
-from typing import Dict
+from collections import Counter
+from datetime import date, timedelta
+from typing import Dict, List
 
+from core.data_versions import data_versions
 from core.database import connection_scope
 from models.weekly_menu import MenuEntry, WeeklyMenu
+from services.async_service import AsyncService
+
+
+# Längsta intervall som kalendern och /api/menus lämnar ut i ett anrop
+MAX_MENU_WEEKS = 12
+
+
+def menu_span(start: date | None = None, end: date | None = None, weeks: int = 4) -> tuple[date, date]:
+    """Måndag i första och söndag i sista veckan; utan end räknas weeks veckor från start.
+
+    Start saknas → innevarande vecka. ValueError om intervallet är bakvänt eller
+    längre än MAX_MENU_WEEKS veckor.
+    """
+    first = start or date.today()
+    first -= timedelta(days=first.weekday())
+    last = end - timedelta(days=end.weekday()) if end else first + timedelta(weeks=weeks - 1)
+    if last < first:
+        raise ValueError("Slutet ligger före början")
+    if (last - first).days // 7 + 1 > MAX_MENU_WEEKS:
+        raise ValueError(f"Högst {MAX_MENU_WEEKS} veckor åt gången")
+    return first, last + timedelta(days=6)
+
+
+def menu_delta(before: WeeklyMenu, after: WeeklyMenu) -> tuple[list[int], list[int]]:
+    """Recept-ID:n som försvann respektive tillkom, en gång per förekomst.
+
+    En ren omsortering ger två tomma listor.
+    """
+    old = Counter(entry.recipe_id for entry in before.entries if entry.recipe_id)
+    new = Counter(entry.recipe_id for entry in after.entries if entry.recipe_id)
+    return list((old - new).elements()), list((new - old).elements())
 
 
 class MenuService:
@@ -17,12 +50,12 @@ class MenuService:
         resolved_year = year or date.today().isocalendar().year
         with connection_scope() as conn:
             cur = conn.execute(
-                "SELECT day, recipe_id FROM menu_entries WHERE profile_id = ? AND (week_number IS NULL OR week_number = ?) AND (year IS NULL OR year = ?) ORDER BY id",
+                "SELECT day, recipe_id FROM menu_entries WHERE profile_id = ? AND week_number = ? AND year = ? ORDER BY id",
                 (profile_id, resolved_week, resolved_year),
             )
             entries = [MenuEntry(day=row[0], recipe_id=row[1]) for row in cur.fetchall()]
             cur_meta = conn.execute(
-                "SELECT responsible_profile_id, label, week_number, year FROM menu_meta WHERE profile_id = ? AND (year IS NULL OR year = ?)",
+                "SELECT responsible_profile_id, label, week_number, year FROM menu_meta WHERE profile_id = ? AND year = ?",
                 (profile_id, resolved_year),
             )
             row = cur_meta.fetchone()
@@ -40,6 +73,46 @@ class MenuService:
             year=resolved_year,
         )
 
+    def get_menus(self, profile_id: int, start: date, end: date) -> List[WeeklyMenu]:
+        """Menyerna för alla ISO-veckor från start till end (inklusive), även tomma veckor.
+
+        Raderna hämtas med en intervallfråga på (year, week_number) som går via
+        idx_menu_entries_profile_week i stället för en fråga per vecka.
+        """
+        first = start - timedelta(days=start.weekday())
+        last = end - timedelta(days=end.weekday())
+        if last < first:
+            return []
+        menus: Dict[tuple[int, int], WeeklyMenu] = {}
+        monday = first
+        while monday <= last:
+            iso = monday.isocalendar()
+            menus[(iso.year, iso.week)] = WeeklyMenu(
+                profile_id=profile_id, week_number=iso.week, year=iso.year, week_start=monday
+            )
+            monday += timedelta(days=7)
+        first_iso = first.isocalendar()
+        last_iso = last.isocalendar()
+        with connection_scope() as conn:
+            cur = conn.execute(
+                "SELECT year, week_number, day, recipe_id FROM menu_entries "
+                "WHERE profile_id = ? AND (year, week_number) BETWEEN (?, ?) AND (?, ?) ORDER BY year, week_number, id",
+                (profile_id, first_iso.year, first_iso.week, last_iso.year, last_iso.week),
+            )
+            for year, week_number, day, recipe_id in cur.fetchall():
+                menu = menus.get((year, week_number))
+                if menu is not None:
+                    menu.entries.append(MenuEntry(day=day, recipe_id=recipe_id))
+            meta = conn.execute(
+                "SELECT responsible_profile_id, year FROM menu_meta WHERE profile_id = ?", (profile_id,)
+            ).fetchone()
+        if meta and meta[0]:
+            # Som get_menu: ansvarig gäller veckorna i menyns år
+            for menu in menus.values():
+                if menu.year == meta[1]:
+                    menu.responsible_profile_id = meta[0]
+        return list(menus.values())
+
     def replace_menu(self, recipe_ids: list[int], profile_id: int = 1, week_number: int | None = None, year: int | None = None) -> WeeklyMenu:
         """Ersätt hela menyn med givna recept i veckoföljd (Mån–Sön)."""
         days = ["Måndag", "Tisdag", "Onsdag", "Torsdag", "Fredag", "Lördag", "Söndag"]
@@ -47,7 +120,7 @@ class MenuService:
         resolved_year = year or date.today().isocalendar().year
         with connection_scope() as conn:
             conn.execute(
-                "DELETE FROM menu_entries WHERE profile_id = ? AND (week_number IS NULL OR week_number = ?) AND (year IS NULL OR year = ?)",
+                "DELETE FROM menu_entries WHERE profile_id = ? AND week_number = ? AND year = ?",
                 (profile_id, resolved_week, resolved_year),
             )
             conn.executemany(
@@ -63,6 +136,7 @@ class MenuService:
                 (profile_id, profile_id, resolved_week, resolved_year),
             )
             conn.commit()
+            data_versions.bump(f"menu:{profile_id}")
         return self.get_menu(profile_id, week_number=resolved_week, year=resolved_year)
 
     def set_responsible(self, profile_id: int, responsible_profile_id: int | None, week_number: int | None = None, year: int | None = None) -> WeeklyMenu:
@@ -75,6 +149,7 @@ class MenuService:
                 (profile_id, responsible_profile_id, resolved_week, resolved_year),
             )
             conn.commit()
+            data_versions.bump(f"menu:{profile_id}")
         return self.get_menu(profile_id, week_number=resolved_week, year=resolved_year)
 
     def remove_entry(self, day: str, profile_id: int = 1, week_number: int | None = None, year: int | None = None) -> WeeklyMenu:
@@ -82,10 +157,11 @@ class MenuService:
         resolved_year = year or date.today().isocalendar().year
         with connection_scope() as conn:
             conn.execute(
-                "DELETE FROM menu_entries WHERE profile_id = ? AND day = ? AND (week_number IS NULL OR week_number = ?) AND (year IS NULL OR year = ?)",
+                "DELETE FROM menu_entries WHERE profile_id = ? AND day = ? AND week_number = ? AND year = ?",
                 (profile_id, day, resolved_week, resolved_year),
             )
             conn.commit()
+            data_versions.bump(f"menu:{profile_id}")
         return self.get_menu(profile_id, week_number=resolved_week, year=resolved_year)
 
     def append_recipes(self, recipe_ids: list[int], profile_id: int = 1, week_number: int | None = None, year: int | None = None) -> WeeklyMenu:
@@ -98,7 +174,7 @@ class MenuService:
         resolved_year = year or date.today().isocalendar().year
         with connection_scope() as conn:
             cur = conn.execute(
-                "SELECT day FROM menu_entries WHERE profile_id = ? AND (week_number IS NULL OR week_number = ?) AND (year IS NULL OR year = ?)",
+                "SELECT day FROM menu_entries WHERE profile_id = ? AND week_number = ? AND year = ?",
                 (profile_id, resolved_week, resolved_year),
             )
             used_days = {row[0] for row in cur.fetchall()}
@@ -115,10 +191,12 @@ class MenuService:
                     (profile_id, resolved_week, resolved_year),
                 )
                 conn.commit()
+                data_versions.bump(f"menu:{profile_id}")
 
         return self.get_menu(profile_id, week_number=resolved_week, year=resolved_year)
 
 
 menu_service = MenuService()
+async_menu_service = AsyncService(menu_service)
 
-__all__ = ["MenuService", "menu_service"]
+__all__ = ["MAX_MENU_WEEKS", "MenuService", "menu_delta", "menu_span", "menu_service", "async_menu_service"]
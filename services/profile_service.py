@@ -1,52 +1,62 @@
 from __future__ import annotations
 
+import threading
 from typing import Dict, List, Optional
 
+from core.data_versions import data_versions
 from core.database import connection_scope
+from models.image import ImageVariant, variants_from_json, variants_to_json
 from models.profile import Profile
+from services.async_service import AsyncService
 
 
 class ProfileService:
-    """Profiler persisteras i SQLite (ingen auth, bara separation av data)."""
+    """Profiler persisteras i SQLite (ingen auth, bara separation av data).
+
+    Alla profiler hålls som en ögonblicksbild i minnet. Skrivningar ersätter
+    bilden och räknar upp `version`, så läsningar är rena dict-uppslag.
+    """
+
+    def __init__(self) -> None:
+        self._snapshot: Dict[int, Profile] | None = None
+        self._version = 0
+        self._lock = threading.Lock()
+
+    @property
+    def version(self) -> int:
+        return self._version
 
     def list_profiles(self) -> List[Profile]:
-        with connection_scope() as conn:
-            cur = conn.execute("SELECT id, name, email, avatar_url, theme_preference FROM profiles ORDER BY id")
-            return [
-                Profile(
-                    id=row[0],
-                    name=row[1],
-                    email=row[2],
-                    avatar_url=row[3],
-                    theme_preference=row[4],
-                )
-                for row in cur.fetchall()
-            ]
+        return list(self._profiles().values())
 
-    def get_profile(self, profile_id: int) -> Optional[Profile]:
-        with connection_scope() as conn:
-            cur = conn.execute("SELECT id, name, email, avatar_url, theme_preference FROM profiles WHERE id = ?", (profile_id,))
-            row = cur.fetchone()
-            if not row:
-                return None
-            return Profile(
-                id=row[0],
-                name=row[1],
-                email=row[2],
-                avatar_url=row[3],
-                theme_preference=row[4],
-            )
+    def get_profile(self, profile_id: int | None) -> Optional[Profile]:
+        if profile_id is None:
+            return None
+        return self._profiles().get(profile_id)
 
-    def create_profile(self, name: str, email: str | None = None, avatar_url: str | None = None) -> Profile:
+    def resolve_profile_id(self, profile_id: int | None, default: int = 1) -> int:
+        """Returnera profile_id om profilen finns, annars standardprofilen."""
+        if profile_id is None:
+            return default
+        return profile_id if profile_id in self._profiles() else default
+
+    def create_profile(
+        self,
+        name: str,
+        email: str | None = None,
+        avatar_url: str | None = None,
+        avatar_variants: List[ImageVariant] | None = None,
+    ) -> Profile:
         email = email or None
         avatar_url = avatar_url or None
         with connection_scope() as conn:
             cur = conn.execute(
-                "INSERT INTO profiles (name, email, avatar_url, theme_preference) VALUES (?, ?, ?, ?)",
-                (name, email, avatar_url, None),
+                "INSERT INTO profiles (name, email, avatar_url, theme_preference, avatar_variants) VALUES (?, ?, ?, ?, ?)",
+                (name, email, avatar_url, None, variants_to_json(avatar_variants)),
             )
             profile_id = cur.lastrowid
             conn.commit()
+        self.invalidate()
         return self.get_profile(profile_id)  # type: ignore
 
     def update_profile(
@@ -57,19 +67,59 @@ class ProfileService:
         email: str | None = None,
         avatar_url: str | None = None,
         theme_preference: str | None = None,
+        avatar_variants: List[ImageVariant] | None = None,
     ) -> Optional[Profile]:
-        if self.get_profile(profile_id) is None:
+        current = self.get_profile(profile_id)
+        if current is None:
             return None
+        if avatar_variants is None and avatar_url is not None and avatar_url != current.avatar_url:
+            avatar_variants = []
         with connection_scope() as conn:
             cur = conn.execute(
-                "UPDATE profiles SET name = COALESCE(?, name), email = COALESCE(?, email), avatar_url = COALESCE(?, avatar_url), theme_preference = COALESCE(?, theme_preference) WHERE id = ?",
-                (name, email, avatar_url, theme_preference, profile_id),
+                "UPDATE profiles SET name = COALESCE(?, name), email = COALESCE(?, email), avatar_url = COALESCE(?, avatar_url), theme_preference = COALESCE(?, theme_preference), avatar_variants = COALESCE(?, avatar_variants) WHERE id = ?",
+                (name, email, avatar_url, theme_preference, variants_to_json(avatar_variants), profile_id),
             )
             conn.commit()
+        self.invalidate()
         return self.get_profile(profile_id)
 
+    def invalidate(self) -> None:
+        """Släng ögonblicksbilden; nästa läsning laddar om från databasen."""
+        with self._lock:
+            self._snapshot = None
+            self._version += 1
+        data_versions.bump("profiles")
+
+    # helpers
+    def _profiles(self) -> Dict[int, Profile]:
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+        with self._lock:
+            if self._snapshot is None:
+                self._snapshot = self._load()
+            return self._snapshot
+
+    def _load(self) -> Dict[int, Profile]:
+        with connection_scope() as conn:
+            cur = conn.execute(
+                "SELECT id, name, email, avatar_url, theme_preference, avatar_variants FROM profiles ORDER BY id"
+            )
+            return {
+                row[0]: Profile(
+                    id=row[0],
+                    name=row[1],
+                    email=row[2],
+                    avatar_url=row[3],
+                    theme_preference=row[4],
+                    avatar_variants=variants_from_json(row[5]),
+                )
+                for row in cur.fetchall()
+            }
+
 
 # Delad instans
 profile_service = ProfileService()
+async_profile_service = AsyncService(profile_service)
 
-__all__ = ["ProfileService", "profile_service"]
+__all__ = ["ProfileService", "profile_service", "async_profile_service"]
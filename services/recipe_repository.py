@@ -1,69 +1,81 @@
 from __future__ import annotations
 
-from typing import List, Optional
+import re
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional
 
-from core.database import connection_scope
-from models.recipe import Ingredient, Recipe
+from core.database import connection_scope, refill_search_index, reindex_recipes, unindex_recipes
+from models.image import ImageVariant, variants_from_json, variants_to_json
+from models.recipe import Ingredient, Recipe, RecipeSummary
+
+_RECIPE_COLUMNS = "SELECT id, title, description, servings, image_url, created_by, archived, image_variants FROM recipes"
+
+# bm25-vikter per kolumn: title, description, ingredients, tags, steps
+_FTS_WEIGHTS = "10.0, 2.0, 5.0, 5.0, 1.0"
+_WORD_RE = re.compile(r"\w+")
+
+# Håll IN-listor under SQLites gräns för antal bundna parametrar
+_IN_CHUNK_SIZE = 500
+
+
+def _chunked(ids: List[int], size: int = _IN_CHUNK_SIZE) -> Iterator[List[int]]:
+    for start in range(0, len(ids), size):
+        yield ids[start : start + size]
 
 
 class RecipeRepository:
     """DB-åtkomst för recept och relaterade tabeller."""
 
-    def list_recipes(self, profile_id: int | None = None, include_archived: bool = False) -> List[Recipe]:
+    def list_recipes(
+        self,
+        profile_id: int | None = None,
+        include_archived: bool = False,
+        after_id: int | None = None,
+        limit: int | None = None,
+    ) -> List[Recipe]:
+        """Recept i id-ordning; after_id/limit ger en sida (keyset) i stället för alla."""
         with connection_scope() as conn:
-            base = "SELECT id, title, description, servings, image_url, created_by, archived FROM recipes"
-            filters = []
-            params = []
-            if profile_id:
-                filters.append("created_by = ?")
-                params.append(profile_id)
-            if not include_archived:
-                filters.append("(archived = 0 OR archived IS NULL)")
-            where = f" WHERE {' AND '.join(filters)}" if filters else ""
-            cur = conn.execute(base + where + " ORDER BY id", tuple(params))
-            recipes = []
-            for row in cur.fetchall():
-                servings = self._coerce_servings(row[3])
-                recipes.append(
-                    Recipe(
-                        id=row[0],
-                        title=row[1],
-                        description=row[2],
-                        servings=servings,
-                        image_url=row[4],
-                        created_by=row[5],
-                        archived=bool(row[6]) if row[6] is not None else False,
-                        ingredients=self._get_ingredients(row[0]),
-                        steps=self._get_steps(row[0]),
-                        tags=self._get_tags(row[0]),
-                    )
-                )
-            return recipes
+            return self._hydrate(conn, self._list_rows(conn, profile_id, include_archived, after_id, limit))
+
+    def list_recipe_summaries(
+        self,
+        profile_id: int | None = None,
+        include_archived: bool = False,
+        after_id: int | None = None,
+        limit: int | None = None,
+        with_tags: bool = True,
+    ) -> List[RecipeSummary]:
+        """Som list_recipes men utan ingredienser och steg, för listvyer.
+
+        with_tags=False läser bara recipes-raderna, i en enda fråga.
+        """
+        with connection_scope() as conn:
+            rows = self._list_rows(conn, profile_id, include_archived, after_id, limit)
+            return self._summarize(conn, rows, with_tags)
 
     def get_recipe(self, recipe_id: int, include_archived: bool = True) -> Optional[Recipe]:
         with connection_scope() as conn:
-            cur = conn.execute(
-                "SELECT id, title, description, servings, image_url, created_by, archived FROM recipes WHERE id = ?",
-                (recipe_id,),
-            )
+            cur = conn.execute(_RECIPE_COLUMNS + " WHERE id = ?", (recipe_id,))
             row = cur.fetchone()
             if not row:
                 return None
-            servings = self._coerce_servings(row[3])
             if not include_archived and row[6]:
                 return None
-            return Recipe(
-                id=row[0],
-                title=row[1],
-                description=row[2],
-                servings=servings,
-                image_url=row[4],
-                created_by=row[5],
-                archived=bool(row[6]) if row[6] is not None else False,
-                ingredients=self._get_ingredients(recipe_id),
-                steps=self._get_steps(recipe_id),
-                tags=self._get_tags(recipe_id),
-            )
+            return self._hydrate(conn, [row])[0]
+
+    def get_recipes(self, recipe_ids: List[int], include_archived: bool = True) -> List[Recipe]:
+        """Hämta flera recept på en anslutning, i samma ordning som recipe_ids (saknade hoppas över)."""
+        unique_ids = list(dict.fromkeys(rid for rid in recipe_ids if rid))
+        if not unique_ids:
+            return []
+        with connection_scope() as conn:
+            rows = []
+            for chunk in _chunked(unique_ids):
+                placeholders = ",".join("?" * len(chunk))
+                cur = conn.execute(_RECIPE_COLUMNS + f" WHERE id IN ({placeholders})", tuple(chunk))
+                rows.extend(row for row in cur.fetchall() if include_archived or not row[6])
+            by_id = {recipe.id: recipe for recipe in self._hydrate(conn, rows)}
+        return [by_id[rid] for rid in recipe_ids if rid in by_id]
 
     def add_recipe(
         self,
@@ -76,19 +88,73 @@ class RecipeRepository:
         servings: int | None,
         image_url: str | None,
         archived: bool | None = False,
+        image_variants: List[ImageVariant] | None = None,
     ) -> Recipe:
         with connection_scope() as conn:
             cur = conn.execute(
-                "INSERT INTO recipes (title, description, servings, image_url, created_by, archived) VALUES (?, ?, ?, ?, ?, ?)",
-                (title, description, servings, image_url, created_by, 1 if archived else 0),
+                "INSERT INTO recipes (title, description, servings, image_url, created_by, archived, image_variants) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (title, description, servings, image_url, created_by, 1 if archived else 0, variants_to_json(image_variants)),
             )
             recipe_id = cur.lastrowid
             self._replace_ingredients(conn, recipe_id, ingredients)
             self._replace_steps(conn, recipe_id, steps)
             self._replace_tags(conn, recipe_id, tags)
+            reindex_recipes(conn, [recipe_id])
             conn.commit()
         return self.get_recipe(recipe_id)  # type: ignore
 
+    def add_recipes_bulk(self, recipes: List[Recipe]) -> List[int]:
+        """Infoga många recept i en transaktion med executemany per tabell.
+
+        Id:n reserveras efter sqlite_sequence under skrivlåset (BEGIN IMMEDIATE),
+        så barnrader och sökindex kan skrivas utan ett uppslag per recept.
+        Hela batchen rullas tillbaka vid fel.
+        """
+        if not recipes:
+            return []
+        with connection_scope() as conn:
+            if not conn.in_transaction:
+                conn.execute("BEGIN IMMEDIATE")
+            try:
+                seq_row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'recipes'").fetchone()
+                max_row = conn.execute("SELECT MAX(id) FROM recipes").fetchone()
+                next_id = max(seq_row[0] if seq_row else 0, max_row[0] or 0) + 1
+                ids = list(range(next_id, next_id + len(recipes)))
+                conn.executemany(
+                    "INSERT INTO recipes (id, title, description, servings, image_url, created_by, archived, image_variants) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (
+                            rid,
+                            r.title,
+                            r.description,
+                            r.servings,
+                            r.image_url,
+                            r.created_by,
+                            1 if r.archived else 0,
+                            variants_to_json(r.image_variants or None),
+                        )
+                        for rid, r in zip(ids, recipes)
+                    ],
+                )
+                conn.executemany(
+                    "INSERT INTO ingredients (recipe_id, name, amount) VALUES (?, ?, ?)",
+                    [(rid, ing.name, ing.amount) for rid, r in zip(ids, recipes) for ing in r.ingredients],
+                )
+                conn.executemany(
+                    "INSERT INTO steps (recipe_id, position, text) VALUES (?, ?, ?)",
+                    [(rid, idx + 1, text) for rid, r in zip(ids, recipes) for idx, text in enumerate(r.steps)],
+                )
+                conn.executemany(
+                    "INSERT INTO tags (recipe_id, tag) VALUES (?, ?)",
+                    [(rid, tag) for rid, r in zip(ids, recipes) for tag in r.tags],
+                )
+                reindex_recipes(conn, ids)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        return ids
+
     def update_recipe(
         self,
         recipe_id: int,
@@ -101,13 +167,18 @@ class RecipeRepository:
         servings: int | None = None,
         image_url: str | None = None,
         archived: bool | None = None,
+        image_variants: List[ImageVariant] | None = None,
     ) -> Optional[Recipe]:
-        if not self.get_recipe(recipe_id):
+        current = self.get_recipe(recipe_id)
+        if not current:
             return None
+        # Ny bild-URL utan varianter: de gamla varianterna hör till förra bilden
+        if image_variants is None and image_url is not None and image_url != current.image_url:
+            image_variants = []
         with connection_scope() as conn:
             conn.execute(
-                "UPDATE recipes SET title = COALESCE(?, title), description = COALESCE(?, description), servings = COALESCE(?, servings), image_url = COALESCE(?, image_url), archived = COALESCE(?, archived) WHERE id = ?",
-                (title, description, servings, image_url, archived if archived is not None else None, recipe_id),
+                "UPDATE recipes SET title = COALESCE(?, title), description = COALESCE(?, description), servings = COALESCE(?, servings), image_url = COALESCE(?, image_url), archived = COALESCE(?, archived), image_variants = COALESCE(?, image_variants) WHERE id = ?",
+                (title, description, servings, image_url, archived if archived is not None else None, variants_to_json(image_variants), recipe_id),
             )
             if ingredients is not None:
                 self._replace_ingredients(conn, recipe_id, ingredients)
@@ -115,22 +186,101 @@ class RecipeRepository:
                 self._replace_steps(conn, recipe_id, steps)
             if tags is not None:
                 self._replace_tags(conn, recipe_id, tags)
+            reindex_recipes(conn, [recipe_id])
             conn.commit()
         return self.get_recipe(recipe_id)
 
-    def search_recipes(self, query: str, profile_id: int | None = None, include_archived: bool = False) -> List[Recipe]:
-        q = query.lower().strip()
-        if not q:
-            return self.list_recipes(profile_id=profile_id, include_archived=include_archived)
-        results: List[Recipe] = []
-        for recipe in self.list_recipes(profile_id=profile_id, include_archived=include_archived):
-            ingredient_names = " ".join([ing.name.lower() for ing in recipe.ingredients])
-            haystack = " ".join([recipe.title.lower(), ingredient_names, " ".join([t.lower() for t in recipe.tags])])
-            if q in haystack:
-                results.append(recipe)
-        return results
+    def delete_recipe(self, recipe_id: int) -> None:
+        """Ta bort receptet; barnrader och menyrader följer med via ON DELETE CASCADE."""
+        with connection_scope() as conn:
+            conn.execute("DELETE FROM recipes WHERE id = ?", (recipe_id,))
+            unindex_recipes(conn, [recipe_id])
+            conn.commit()
+
+    def rebuild_search_index(self) -> int:
+        """Bygg om hela sökindexet i en transaktion; returnerar antal indexerade recept."""
+        with connection_scope() as conn:
+            if not conn.in_transaction:
+                conn.execute("BEGIN IMMEDIATE")
+            try:
+                refill_search_index(conn)
+                count = conn.execute("SELECT COUNT(*) FROM recipes_fts").fetchone()[0]
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        return count
+
+    def search_recipes(
+        self, query: str, profile_id: int | None = None, include_archived: bool = False, limit: int | None = None
+    ) -> List[Recipe]:
+        """Rankad fulltextsökning; limit ger de bästa träffarna (ingen keyset, ordningen är bm25)."""
+        match = self._fts_query(query)
+        if not match:
+            return self.list_recipes(profile_id=profile_id, include_archived=include_archived, limit=limit)
+        with connection_scope() as conn:
+            return self._hydrate(conn, self._search_rows(conn, match, profile_id, include_archived, limit))
+
+    def search_recipe_summaries(
+        self,
+        query: str,
+        profile_id: int | None = None,
+        include_archived: bool = False,
+        limit: int | None = None,
+        with_tags: bool = True,
+    ) -> List[RecipeSummary]:
+        match = self._fts_query(query)
+        if not match:
+            return self.list_recipe_summaries(
+                profile_id=profile_id, include_archived=include_archived, limit=limit, with_tags=with_tags
+            )
+        with connection_scope() as conn:
+            return self._summarize(conn, self._search_rows(conn, match, profile_id, include_archived, limit), with_tags)
 
     # helpers
+    def _list_rows(self, conn, profile_id: int | None, include_archived: bool, after_id: int | None, limit: int | None):
+        filters = []
+        params: list = []
+        if profile_id:
+            filters.append("created_by = ?")
+            params.append(profile_id)
+        if not include_archived:
+            filters.append("(archived = 0 OR archived IS NULL)")
+        if after_id is not None:
+            # Keyset via primärnyckeln: sidans kostnad beror inte på hur långt in den ligger
+            filters.append("id > ?")
+            params.append(after_id)
+        where = f" WHERE {' AND '.join(filters)}" if filters else ""
+        sql = _RECIPE_COLUMNS + where + " ORDER BY id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return conn.execute(sql, tuple(params)).fetchall()
+
+    def _search_rows(self, conn, match: str, profile_id: int | None, include_archived: bool, limit: int | None):
+        filters = ["recipes_fts MATCH ?"]
+        params: list = [match]
+        if profile_id:
+            filters.append("r.created_by = ?")
+            params.append(profile_id)
+        if not include_archived:
+            filters.append("(r.archived = 0 OR r.archived IS NULL)")
+        sql = (
+            "SELECT r.id, r.title, r.description, r.servings, r.image_url, r.created_by, r.archived, r.image_variants "
+            "FROM recipes_fts JOIN recipes r ON r.id = recipes_fts.rowid "
+            f"WHERE {' AND '.join(filters)} "
+            f"ORDER BY bm25(recipes_fts, {_FTS_WEIGHTS}), r.id"
+        )
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return conn.execute(sql, tuple(params)).fetchall()
+
+    def _fts_query(self, query: str | None) -> str:
+        """Gör om fritext till en FTS5-fråga där varje ord prefixmatchas (AND)."""
+        terms = _WORD_RE.findall((query or "").lower())
+        return " ".join(f'"{term}"*' for term in terms)
+
     def _replace_ingredients(self, conn, recipe_id: int, ingredients: List[Ingredient]):
         conn.execute("DELETE FROM ingredients WHERE recipe_id = ?", (recipe_id,))
         conn.executemany(
@@ -165,20 +315,75 @@ class RecipeRepository:
                 return None
         return None
 
-    def _get_ingredients(self, recipe_id: int) -> List[Ingredient]:
-        with connection_scope() as conn:
-            cur = conn.execute("SELECT name, amount FROM ingredients WHERE recipe_id = ? ORDER BY id", (recipe_id,))
-            return [Ingredient(name=row[0], amount=row[1]) for row in cur.fetchall()]
-
-    def _get_steps(self, recipe_id: int) -> List[str]:
-        with connection_scope() as conn:
-            cur = conn.execute("SELECT text FROM steps WHERE recipe_id = ? ORDER BY position", (recipe_id,))
-            return [row[0] for row in cur.fetchall()]
+    def _summarize(self, conn, rows, with_tags: bool = True) -> List[RecipeSummary]:
+        """Bygg RecipeSummary från recipes-rader; taggarna (om with_tags) i en mängdfråga per chunk."""
+        if not rows:
+            return []
+        tags: Dict[int, List[str]] = defaultdict(list)
+        for chunk in _chunked([row[0] for row in rows]) if with_tags else ():
+            placeholders = ",".join("?" * len(chunk))
+            for row in conn.execute(
+                f"SELECT recipe_id, tag FROM tags WHERE recipe_id IN ({placeholders}) ORDER BY recipe_id, id",
+                tuple(chunk),
+            ):
+                tags[row[0]].append(row[1])
+        return [
+            RecipeSummary(
+                id=row[0],
+                title=row[1],
+                description=row[2],
+                servings=self._coerce_servings(row[3]),
+                image_url=row[4],
+                created_by=row[5],
+                archived=bool(row[6]) if row[6] is not None else False,
+                image_variants=variants_from_json(row[7]),
+                tags=tags.get(row[0], []),
+            )
+            for row in rows
+        ]
 
-    def _get_tags(self, recipe_id: int) -> List[str]:
-        with connection_scope() as conn:
-            cur = conn.execute("SELECT tag FROM tags WHERE recipe_id = ? ORDER BY id", (recipe_id,))
-            return [row[0] for row in cur.fetchall()]
+    def _hydrate(self, conn, rows) -> List[Recipe]:
+        """Bygg Recept från recipes-rader och ladda barntabeller i ett fast antal mängdfrågor."""
+        if not rows:
+            return []
+        recipe_ids = [row[0] for row in rows]
+        ingredients: Dict[int, List[Ingredient]] = defaultdict(list)
+        steps: Dict[int, List[str]] = defaultdict(list)
+        tags: Dict[int, List[str]] = defaultdict(list)
+        for chunk in _chunked(recipe_ids):
+            placeholders = ",".join("?" * len(chunk))
+            params = tuple(chunk)
+            for row in conn.execute(
+                f"SELECT recipe_id, name, amount FROM ingredients WHERE recipe_id IN ({placeholders}) ORDER BY recipe_id, id",
+                params,
+            ):
+                ingredients[row[0]].append(Ingredient(name=row[1], amount=row[2]))
+            for row in conn.execute(
+                f"SELECT recipe_id, text FROM steps WHERE recipe_id IN ({placeholders}) ORDER BY recipe_id, position",
+                params,
+            ):
+                steps[row[0]].append(row[1])
+            for row in conn.execute(
+                f"SELECT recipe_id, tag FROM tags WHERE recipe_id IN ({placeholders}) ORDER BY recipe_id, id",
+                params,
+            ):
+                tags[row[0]].append(row[1])
+        return [
+            Recipe(
+                id=row[0],
+                title=row[1],
+                description=row[2],
+                servings=self._coerce_servings(row[3]),
+                image_url=row[4],
+                created_by=row[5],
+                archived=bool(row[6]) if row[6] is not None else False,
+                image_variants=variants_from_json(row[7]),
+                ingredients=ingredients.get(row[0], []),
+                steps=steps.get(row[0], []),
+                tags=tags.get(row[0], []),
+            )
+            for row in rows
+        ]
 
 
 recipe_repo = RecipeRepository()
@@ -1,23 +1,135 @@
 from __future__ import annotations
 
-from typing import List, Optional
+from typing import Dict, List, Optional, Sequence, Tuple, TypeVar
 
-from models.recipe import Ingredient, Recipe
+from core.cache import LRUCache
+from core.config import settings
+from core.data_versions import data_versions
+from models.image import ImageVariant
+from models.recipe import Ingredient, Recipe, RecipeSummary
+from services.async_service import AsyncService
 from services.recipe_repository import recipe_repo
 
+_T = TypeVar("_T", Recipe, RecipeSummary)
+
+
+def page_size(limit: int | None) -> int:
+    """Sidstorlek inom 1..max_page_size; None ger standardstorleken."""
+    if limit is None:
+        return settings.page_size
+    return max(1, min(limit, settings.max_page_size))
+
+
+def _split_page(items: Sequence[_T], limit: int) -> Tuple[List[_T], Optional[int]]:
+    """Dela en hämtning om limit + 1 rader i sidan och markören för nästa sida."""
+    page = list(items[:limit])
+    next_after_id = page[-1].id if len(items) > limit and page else None
+    return page, next_after_id
+
 
 class RecipeService:
-    """DB-baserad service för recept med ingredienser, steg och taggar."""
+    """DB-baserad service för recept med ingredienser, steg och taggar.
+
+    Hydrerade recept cachas per id i en LRU-cache som invalideras vid varje
+    skrivning. En läsning som laddat en rad före en samtidig skrivning sparas
+    inte (generationen har ändrats). Cachade objekt delas mellan anropare och
+    får inte muteras.
+    """
+
+    def __init__(self, cache_size: int | None = None, cache_ttl: float | None = None) -> None:
+        self._cache: LRUCache[int, Recipe] = LRUCache(
+            settings.recipe_cache_size if cache_size is None else cache_size,
+            settings.recipe_cache_ttl if cache_ttl is None else cache_ttl,
+        )
 
     def list_recipes(self, profile_id: int | None = None, include_archived: bool = False) -> List[Recipe]:
         return recipe_repo.list_recipes(profile_id=profile_id, include_archived=include_archived)
 
+    def recipe_page(
+        self,
+        profile_id: int | None = None,
+        include_archived: bool = False,
+        after_id: int | None = None,
+        limit: int | None = None,
+    ) -> Tuple[List[Recipe], Optional[int]]:
+        """En sida fullständiga recept efter after_id och markören för nästa sida (None = sista)."""
+        size = page_size(limit)
+        rows = recipe_repo.list_recipes(
+            profile_id=profile_id, include_archived=include_archived, after_id=after_id, limit=size + 1
+        )
+        return _split_page(rows, size)
+
+    def summary_page(
+        self,
+        profile_id: int | None = None,
+        include_archived: bool = False,
+        after_id: int | None = None,
+        limit: int | None = None,
+        with_tags: bool = True,
+    ) -> Tuple[List[RecipeSummary], Optional[int]]:
+        """Som recipe_page men med RecipeSummary, för listvyer."""
+        size = page_size(limit)
+        rows = recipe_repo.list_recipe_summaries(
+            profile_id=profile_id, include_archived=include_archived, after_id=after_id, limit=size + 1, with_tags=with_tags
+        )
+        return _split_page(rows, size)
+
+    def list_summaries(
+        self, profile_id: int | None = None, include_archived: bool = False, with_tags: bool = False
+    ) -> List[RecipeSummary]:
+        """Alla recept som RecipeSummary, för väljare; utan taggar räcker en fråga mot recipes."""
+        return recipe_repo.list_recipe_summaries(
+            profile_id=profile_id, include_archived=include_archived, with_tags=with_tags
+        )
+
     def get_recipe(self, recipe_id: int, include_archived: bool = True) -> Optional[Recipe]:
-        return recipe_repo.get_recipe(recipe_id, include_archived=include_archived)
+        recipe = self._cache.get(recipe_id)
+        if recipe is None:
+            generation = self._cache.generation(recipe_id)
+            recipe = recipe_repo.get_recipe(recipe_id)
+            if recipe is None:
+                return None
+            self._cache.put(recipe_id, recipe, generation)
+        if not include_archived and recipe.archived:
+            return None
+        return recipe
+
+    def get_recipes(self, recipe_ids: List[int], include_archived: bool = True) -> List[Recipe]:
+        """Hämta flera recept; cachemissar laddas i en gemensam batch."""
+        found: Dict[int, Recipe] = {}
+        missing: List[int] = []
+        for rid in dict.fromkeys(rid for rid in recipe_ids if rid):
+            cached = self._cache.get(rid)
+            if cached is None:
+                missing.append(rid)
+            else:
+                found[rid] = cached
+        generations = {rid: self._cache.generation(rid) for rid in missing}
+        for recipe in recipe_repo.get_recipes(missing):
+            self._cache.put(recipe.id, recipe, generations[recipe.id])
+            found[recipe.id] = recipe
+        return [
+            found[rid]
+            for rid in recipe_ids
+            if rid in found and (include_archived or not found[rid].archived)
+        ]
 
     def search_recipes(self, query: str, profile_id: int | None = None, include_archived: bool = False) -> List[Recipe]:
         return recipe_repo.search_recipes(query, profile_id=profile_id, include_archived=include_archived)
 
+    def search_summaries(
+        self,
+        query: str,
+        profile_id: int | None = None,
+        include_archived: bool = False,
+        limit: int | None = None,
+        with_tags: bool = True,
+    ) -> List[RecipeSummary]:
+        """De limit bäst rankade träffarna som RecipeSummary."""
+        return recipe_repo.search_recipe_summaries(
+            query, profile_id=profile_id, include_archived=include_archived, limit=page_size(limit), with_tags=with_tags
+        )
+
     def add_recipe(
         self,
         title: str,
@@ -29,8 +141,9 @@ class RecipeService:
         servings: int | None = None,
         image_url: str | None = None,
         archived: bool | None = False,
+        image_variants: List[ImageVariant] | None = None,
     ) -> Recipe:
-        return recipe_repo.add_recipe(
+        recipe = recipe_repo.add_recipe(
             title=title,
             description=description,
             ingredients=ingredients,
@@ -40,7 +153,16 @@ class RecipeService:
             servings=servings,
             image_url=image_url,
             archived=archived or False,
+            image_variants=image_variants,
         )
+        self._cache.invalidate([recipe.id])
+        data_versions.bump("recipes")
+        return recipe
+
+    def add_recipes_bulk(self, recipes: List[Recipe]) -> List[int]:
+        ids = recipe_repo.add_recipes_bulk(recipes)
+        data_versions.bump("recipes")
+        return ids
 
     def update_recipe(
         self,
@@ -54,8 +176,10 @@ class RecipeService:
         servings: int | None = None,
         image_url: str | None = None,
         archived: bool | None = None,
+        image_variants: List[ImageVariant] | None = None,
     ) -> Optional[Recipe]:
-        return recipe_repo.update_recipe(
+        self._cache.invalidate([recipe_id])
+        recipe = recipe_repo.update_recipe(
             recipe_id,
             title=title,
             description=description,
@@ -65,9 +189,26 @@ class RecipeService:
             servings=servings,
             image_url=image_url,
             archived=archived,
+            image_variants=image_variants,
         )
+        self._cache.invalidate([recipe_id])
+        data_versions.bump("recipes")
+        return recipe
+
+    def delete_recipe(self, recipe_id: int) -> None:
+        recipe_repo.delete_recipe(recipe_id)
+        self._cache.invalidate([recipe_id])
+        # Menyrader försvinner via ON DELETE CASCADE
+        data_versions.bump("recipes", "menu")
+
+    def rebuild_search_index(self) -> int:
+        return recipe_repo.rebuild_search_index()
+
+    def cache_stats(self) -> Dict[str, float | int]:
+        return self._cache.stats()
 
 
 recipe_service = RecipeService()
+async_recipe_service = AsyncService(recipe_service)
 
-__all__ = ["RecipeService", "recipe_service"]
+__all__ = ["RecipeService", "async_recipe_service", "page_size", "recipe_service"]
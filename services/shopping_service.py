@@ -1,10 +1,20 @@
 from __future__ import annotations
 
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 
+from core.data_versions import data_versions
 from core.database import connection_scope
-from models.shopping_list import ShoppingItem, ShoppingList
+from models.shopping_list import ShoppingItem, ShoppingList, item_line
 from models.recipe import Ingredient
+from models.units import format_amount, parse_amount
+from models.weekly_menu import WeeklyMenu
+from services.async_service import AsyncService
+from services.menu_service import menu_delta
+from services.recipe_service import recipe_service
+
+# Kvantiteter under detta räknas som noll (flyttalsavrundning vid delta)
+_EPSILON = 1e-9
+_IN_CHUNK_SIZE = 500
 
 
 class ShoppingService:
@@ -14,142 +24,222 @@ class ShoppingService:
     def get_list(self, profile_id: int = 1) -> ShoppingList:
         with connection_scope() as conn:
             cur = conn.execute(
-                "SELECT name, amount, checked FROM shopping_items WHERE profile_id = ? ORDER BY id",
+                "SELECT id, name, amount, checked FROM shopping_items WHERE profile_id = ? ORDER BY id",
                 (profile_id,),
             )
             items = [
                 ShoppingItem(
-                    ingredient=Ingredient(name=row[0], amount=row[1]),
-                    checked=bool(row[2]),
+                    id=row[0],
+                    ingredient=Ingredient(name=row[1], amount=row[2]),
+                    checked=bool(row[3]),
                 )
                 for row in cur.fetchall()
             ]
         return ShoppingList(profile_id=profile_id, items=items)
 
     def add_item(self, name: str, amount: str | None = None, profile_id: int = 1) -> ShoppingList:
+        """Lägg till en rad för hand; finns nyckeln redan läggs mängden på den raden."""
+        key, display_name, unit, raw_amount, quantity = item_line(name, amount)
         with connection_scope() as conn:
-            conn.execute(
-                "INSERT INTO shopping_items (profile_id, name, amount, checked) VALUES (?, ?, ?, 0)",
-                (profile_id, name, amount),
-            )
+            row = conn.execute(
+                "SELECT id, quantity FROM shopping_items WHERE profile_id = ? AND item_key = ?", (profile_id, key)
+            ).fetchone()
+            if row:
+                total = (row[1] or 0.0) + quantity
+                conn.execute(
+                    "UPDATE shopping_items SET quantity = ?, amount = ? WHERE id = ?",
+                    (total, self._display(unit, raw_amount, total), row[0]),
+                )
+            else:
+                conn.execute(
+                    "INSERT INTO shopping_items (profile_id, name, amount, checked, item_key, quantity, unit) VALUES (?, ?, ?, 0, ?, ?, ?)",
+                    (profile_id, display_name, self._display(unit, raw_amount, quantity), key, quantity, unit),
+                )
             conn.commit()
+            data_versions.bump(f"shopping:{profile_id}")
         return self.get_list(profile_id)
 
-    def toggle_item(self, index: int, profile_id: int = 1) -> ShoppingList:
-        items = self.get_list(profile_id).items
-        if 0 <= index < len(items):
-            target = items[index]
-            checked = 0 if target.checked else 1
-            with connection_scope() as conn:
-                conn.execute(
-                    "UPDATE shopping_items SET checked = ? WHERE profile_id = ? AND name = ? AND amount = ?",
-                    (checked, profile_id, target.ingredient.name, target.ingredient.amount),
+    def toggle_item(self, item_id: int, profile_id: int = 1) -> Optional[bool]:
+        """Växla bocken på en rad med en enda UPDATE. Returnerar nytt läge, None om raden saknas."""
+        with connection_scope() as conn:
+            row = conn.execute(
+                "UPDATE shopping_items SET checked = 1 - COALESCE(checked, 0) WHERE id = ? AND profile_id = ? RETURNING checked",
+                (item_id, profile_id),
+            ).fetchone()
+            conn.commit()
+            data_versions.bump(f"shopping:{profile_id}")
+        return bool(row[0]) if row else None
+
+    def set_checked(self, item_ids: List[int], checked: bool, profile_id: int = 1) -> int:
+        """Bocka av/på många rader i en transaktion. Returnerar antal uppdaterade rader."""
+        ids = list(dict.fromkeys(item_ids))
+        updated = 0
+        with connection_scope() as conn:
+            for start in range(0, len(ids), _IN_CHUNK_SIZE):
+                chunk = ids[start : start + _IN_CHUNK_SIZE]
+                placeholders = ",".join("?" * len(chunk))
+                cur = conn.execute(
+                    f"UPDATE shopping_items SET checked = ? WHERE profile_id = ? AND id IN ({placeholders})",
+                    (1 if checked else 0, profile_id, *chunk),
                 )
-                conn.commit()
-        return self.get_list(profile_id)
+                updated += cur.rowcount
+            conn.commit()
+            data_versions.bump(f"shopping:{profile_id}")
+        return updated
 
     def _parse_amount(self, amount: str | None):
-        """Returnera (value, unit) där value är float och unit är lower-case, annars None."""
-        if not amount:
-            return None
-        amount = amount.strip()
-        match = None
-        import re
-
-        match = re.match(r"^([0-9]+(?:[.,][0-9]+)?)\s*(.*)$", amount)
-        if not match:
-            return None
-        value_raw, unit = match.groups()
-        try:
-            value = float(value_raw.replace(",", "."))
-        except ValueError:
-            return None
-        return value, unit.strip().lower()
+        """Returnera (value, base_unit) i basenhet (ml, g, st), annars None."""
+        return parse_amount(amount)
 
     def set_from_recipes(self, recipes: list, profile_id: int = 1) -> ShoppingList:
-        """Bygg inköpslista från recept och summera lika ingredienser/enheter.
+        """Bygg om inköpslistan från recept och summera lika ingredienser/enheter.
 
-        Volym/skedmått → ml, vikt → gram, styck → st. Okända enheter sparas som egna rader.
+        Volym/skedmått → ml, vikt → gram, styck → st. Okända enheter blir egna rader.
+        Avbockade rader som finns kvar efter ombyggnaden behåller sin bock.
         """
-        volume_map = {
-            "ml": 1,
-            "cl": 10,
-            "dl": 100,
-            "l": 1000,
-            "msk": 15,
-            "tsk": 5,
-            "krm": 1,
-        }
-        weight_map = {
-            "g": 1,
-            "kg": 1000,
-        }
-        count_units = {"st": 1}
-
-        aggregated: Dict[tuple[str, str], float] = {}
-        loose: list[Ingredient] = []
-
-        def add_item(name: str, unit_key: str, value: float):
-            key = (name.strip().lower(), unit_key)
-            aggregated[key] = aggregated.get(key, 0) + value
-
+        items: Dict[str, list] = {}
+        # (nyckel, recept) → [kvantitet, förekomster i menyn]
+        contributions: Dict[tuple[str, int], list] = {}
         for recipe in recipes:
-            for ing in getattr(recipe, "ingredients", []):
-                parsed = self._parse_amount(ing.amount)
-                name_key = ing.name.strip().lower()
-                if not parsed:
-                    loose.append(Ingredient(name=ing.name, amount=ing.amount))
-                    continue
-                value, unit = parsed
-
-                if unit in volume_map:
-                    base_value = value * volume_map[unit]
-                    add_item(name_key, "ml", base_value)
-                elif unit in weight_map:
-                    base_value = value * weight_map[unit]
-                    add_item(name_key, "g", base_value)
-                elif unit in count_units or unit == "":
-                    add_item(name_key, unit or "st", value)
-                else:
-                    # okänd enhet, lägg som egen rad
-                    loose.append(Ingredient(name=ing.name, amount=ing.amount))
-
-        items: list[ShoppingItem] = []
-        for (name_key, unit_key), value in aggregated.items():
-            # välj presentabel enhet
-            display_value = value
-            display_unit = unit_key
-            if unit_key == "ml" and value >= 100:
-                display_value = value / 100
-                display_unit = "dl"
-            if unit_key == "g" and value >= 1000:
-                display_value = value / 1000
-                display_unit = "kg"
-
-            formatted = (
-                f"{int(display_value)}"
-                if abs(display_value - int(display_value)) < 1e-6
-                else f"{display_value:.1f}".replace(".", ",")
-            )
-            amount_str = f"{formatted} {display_unit}".strip()
-            items.append(ShoppingItem(ingredient=Ingredient(name=name_key, amount=amount_str)))
-
-        # Append non-parsable entries
-        for ing in loose:
-            items.append(ShoppingItem(ingredient=Ingredient(name=ing.name, amount=ing.amount)))
+            for key, (name, unit, raw_amount, quantity) in self._recipe_lines(recipe).items():
+                item = items.setdefault(key, [name, unit, raw_amount, 0.0])
+                item[3] += quantity
+                contribution = contributions.setdefault((key, recipe.id), [0.0, 0])
+                contribution[0] += quantity
+                contribution[1] += 1
 
         with connection_scope() as conn:
+            checked_keys = [
+                row[0]
+                for row in conn.execute(
+                    "SELECT item_key FROM shopping_items WHERE profile_id = ? AND checked = 1 AND item_key IS NOT NULL",
+                    (profile_id,),
+                )
+            ]
             conn.execute("DELETE FROM shopping_items WHERE profile_id = ?", (profile_id,))
+            item_ids: Dict[str, int] = {}
+            for key, (name, unit, raw_amount, quantity) in items.items():
+                cur = conn.execute(
+                    "INSERT INTO shopping_items (profile_id, name, amount, checked, item_key, quantity, unit) VALUES (?, ?, ?, 0, ?, ?, ?)",
+                    (profile_id, name, self._display(unit, raw_amount, quantity), key, quantity, unit),
+                )
+                item_ids[key] = cur.lastrowid
             conn.executemany(
-                "INSERT INTO shopping_items (profile_id, name, amount, checked) VALUES (?, ?, ?, ?)",
-                [(profile_id, item.ingredient.name, item.ingredient.amount, 0) for item in items],
+                "INSERT INTO shopping_contributions (item_id, recipe_id, quantity, occurrences) VALUES (?, ?, ?, ?)",
+                [
+                    (item_ids[key], recipe_id, quantity, occurrences)
+                    for (key, recipe_id), (quantity, occurrences) in contributions.items()
+                ],
+            )
+            conn.executemany(
+                "UPDATE shopping_items SET checked = 1 WHERE profile_id = ? AND item_key = ?",
+                [(profile_id, key) for key in checked_keys],
             )
             conn.commit()
+            data_versions.bump(f"shopping:{profile_id}")
 
         return self.get_list(profile_id)
 
+    def apply_menu_change(self, added: list | None = None, removed: list | None = None, profile_id: int = 1) -> None:
+        """Uppdatera listan med deltat från menyrader som lagts till/tagits bort.
+
+        Bara raderna som berörs av de ändrade recepten skrivs, så kostnaden är
+        O(ingredienser i ändrade recept) och övriga rader behåller sin bock.
+        """
+        with connection_scope() as conn:
+            for recipe in removed or []:
+                self._remove_contribution(conn, profile_id, recipe)
+            for recipe in added or []:
+                self._add_contribution(conn, profile_id, recipe)
+            conn.commit()
+            data_versions.bump(f"shopping:{profile_id}")
+
+    def apply_menu_replacement(self, before: WeeklyMenu, after: WeeklyMenu, profile_id: int = 1) -> None:
+        """För över skillnaden mellan två versioner av en veckomeny till listan (se menu_delta)."""
+        removed_ids, added_ids = menu_delta(before, after)
+        if not removed_ids and not added_ids:
+            return
+        self.apply_menu_change(
+            added=recipe_service.get_recipes(added_ids),
+            removed=recipe_service.get_recipes(removed_ids),
+            profile_id=profile_id,
+        )
+
+    # helpers
+    def _recipe_lines(self, recipe) -> Dict[str, Tuple[str, Optional[str], Optional[str], float]]:
+        """Summera ett recepts ingredienser per radnyckel (se item_line) → (namn, basenhet, råmängd, kvantitet)."""
+        lines: Dict[str, Tuple[str, Optional[str], Optional[str], float]] = {}
+        for ing in getattr(recipe, "ingredients", []):
+            key, name, unit, raw_amount, value = item_line(ing.name, ing.amount)
+            previous = lines.get(key)
+            lines[key] = (name, unit, raw_amount, (previous[3] if previous else 0.0) + value)
+        return lines
+
+    def _display(self, unit: str | None, raw_amount: str | None, quantity: float) -> str | None:
+        return format_amount(quantity, unit) if unit else raw_amount
+
+    def _add_contribution(self, conn, profile_id: int, recipe) -> None:
+        for key, (name, unit, raw_amount, quantity) in self._recipe_lines(recipe).items():
+            row = conn.execute(
+                "SELECT id, quantity FROM shopping_items WHERE profile_id = ? AND item_key = ?",
+                (profile_id, key),
+            ).fetchone()
+            if row:
+                item_id = row[0]
+                total = (row[1] or 0.0) + quantity
+                conn.execute(
+                    "UPDATE shopping_items SET quantity = ?, amount = ? WHERE id = ?",
+                    (total, self._display(unit, raw_amount, total), item_id),
+                )
+            else:
+                cur = conn.execute(
+                    "INSERT INTO shopping_items (profile_id, name, amount, checked, item_key, quantity, unit) VALUES (?, ?, ?, 0, ?, ?, ?)",
+                    (profile_id, name, self._display(unit, raw_amount, quantity), key, quantity, unit),
+                )
+                item_id = cur.lastrowid
+            conn.execute(
+                "INSERT INTO shopping_contributions (item_id, recipe_id, quantity, occurrences) VALUES (?, ?, ?, 1) "
+                "ON CONFLICT(item_id, recipe_id) DO UPDATE SET quantity = quantity + excluded.quantity, occurrences = occurrences + 1",
+                (item_id, recipe.id, quantity),
+            )
+
+    def _remove_contribution(self, conn, profile_id: int, recipe) -> None:
+        """Dra av en förekomsts andel av receptets sparade bidrag.
+
+        Bidragen läses ur shopping_contributions, inte ur receptets nuvarande
+        ingredienser, så ett recept som ändrats sedan det lades i menyn tar
+        ändå bort exakt det det lade till.
+        """
+        rows = conn.execute(
+            "SELECT i.id, i.quantity, i.unit, i.amount, c.quantity, c.occurrences FROM shopping_contributions c "
+            "JOIN shopping_items i ON i.id = c.item_id WHERE c.recipe_id = ? AND i.profile_id = ?",
+            (recipe.id, profile_id),
+        ).fetchall()
+        for item_id, total, unit, amount, contributed, occurrences in rows:
+            occurrences = max(occurrences or 1, 1)
+            removed = contributed / occurrences
+            if occurrences == 1 or contributed - removed <= _EPSILON:
+                conn.execute(
+                    "DELETE FROM shopping_contributions WHERE item_id = ? AND recipe_id = ?",
+                    (item_id, recipe.id),
+                )
+            else:
+                conn.execute(
+                    "UPDATE shopping_contributions SET quantity = ?, occurrences = ? WHERE item_id = ? AND recipe_id = ?",
+                    (contributed - removed, occurrences - 1, item_id, recipe.id),
+                )
+            remaining = (total or 0.0) - removed
+            if remaining <= _EPSILON:
+                conn.execute("DELETE FROM shopping_items WHERE id = ?", (item_id,))
+            else:
+                conn.execute(
+                    "UPDATE shopping_items SET quantity = ?, amount = ? WHERE id = ?",
+                    (remaining, self._display(unit, amount, remaining), item_id),
+                )
+
 
 # Delad instans
 shopping_service = ShoppingService()
+async_shopping_service = AsyncService(shopping_service)
 
-__all__ = ["ShoppingService", "shopping_service"]
+__all__ = ["ShoppingService", "shopping_service", "async_shopping_service"]
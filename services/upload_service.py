@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Optional
+
+from fastapi import UploadFile
+
+from core.config import settings
+
+_CHUNK_SIZE = 64 * 1024
+
+
+class UploadRejected(ValueError):
+    """Uppladdningen avvisades; status_code används som HTTP-status."""
+
+    def __init__(self, message: str, status_code: int = 400) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+
+@dataclass(frozen=True)
+class StoredUpload:
+    path: Path
+    url: str
+    sha256: str
+    size: int
+    content_type: str
+    created: bool  # False om exakt samma innehåll redan fanns lagrat
+
+
+def sniff_image_type(head: bytes) -> Optional[tuple[str, str]]:
+    """Känn igen bildformat på de första byten; returnerar (content_type, filändelse)."""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg", ".jpg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png", ".png"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif", ".gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp", ".webp"
+    if head[4:8] == b"ftyp":
+        brand = head[8:12]
+        if brand in (b"avif", b"avis"):
+            return "image/avif", ".avif"
+        if brand in (b"heic", b"heix", b"mif1", b"msf1"):
+            return "image/heic", ".heic"
+    return None
+
+
+class UploadService:
+    """Lagrar uppladdade bilder innehållsadresserat under data/images.
+
+    Filen strömmas till disk i bitar med ett storlekstak och hashas under
+    tiden; namnet är innehållets sha256, så samma bild lagras bara en gång.
+    Formatet avgörs av filens första byte, inte av filnamnet.
+    """
+
+    def __init__(self, max_bytes: int | None = None) -> None:
+        self._max_bytes = settings.upload_max_bytes if max_bytes is None else max_bytes
+
+    async def save_image(self, upload: UploadFile, subdir: str = "") -> StoredUpload:
+        if upload.size is not None and upload.size > self._max_bytes:
+            raise UploadRejected(self._too_large_message(), status_code=413)
+        # Läsning och skrivning är blockerande filoperationer; håll dem borta från event-loopen
+        return await asyncio.to_thread(self._store, upload.file, subdir)
+
+    def _store(self, source: BinaryIO, subdir: str) -> StoredUpload:
+        head = source.read(_CHUNK_SIZE)
+        detected = sniff_image_type(head)
+        if detected is None:
+            raise UploadRejected("Filen är ingen bild som stöds (JPEG, PNG, GIF, WebP, AVIF, HEIC)", status_code=415)
+        content_type, suffix = detected
+
+        tmp_dir = settings.data_dir / "tmp"
+        tmp_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = tmp_dir / f"{uuid.uuid4().hex}.part"
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with tmp_path.open("wb") as out:
+                chunk = head
+                while chunk:
+                    size += len(chunk)
+                    if size > self._max_bytes:
+                        raise UploadRejected(self._too_large_message(), status_code=413)
+                    digest.update(chunk)
+                    out.write(chunk)
+                    chunk = source.read(_CHUNK_SIZE)
+
+            target_dir = settings.data_dir / "images" / subdir if subdir else settings.data_dir / "images"
+            target_dir.mkdir(parents=True, exist_ok=True)
+            name = f"{digest.hexdigest()}{suffix}"
+            target = target_dir / name
+            created = not target.exists()
+            if created:
+                tmp_path.replace(target)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+        url = f"/uploads/{subdir}/{name}" if subdir else f"/uploads/{name}"
+        return StoredUpload(
+            path=target, url=url, sha256=digest.hexdigest(), size=size, content_type=content_type, created=created
+        )
+
+    def _too_large_message(self) -> str:
+        if self._max_bytes >= 1024 * 1024:
+            return f"Filen är större än {self._max_bytes // (1024 * 1024)} MB"
+        return f"Filen är större än {self._max_bytes // 1024} kB"
+
+
+upload_service = UploadService()
+
+__all__ = ["StoredUpload", "UploadRejected", "UploadService", "sniff_image_type", "upload_service"]
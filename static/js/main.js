@@ -244,6 +244,89 @@
     });
   }
 
+  // Inköpslista: bocka av rader via id, en liten skrivning per tryck
+  const shoppingList = document.querySelector(".shopping-list");
+  if (shoppingList) {
+    const shoppingProfileId = shoppingList.dataset.profileId || "";
+    const markRow = (checkbox) => {
+      const row = checkbox.closest(".shopping-item");
+      if (row) row.classList.toggle("checked", checkbox.checked);
+    };
+
+    shoppingList.querySelectorAll(".shopping-check").forEach((checkbox) => {
+      checkbox.addEventListener("change", () => {
+        markRow(checkbox);
+        const body = new URLSearchParams({ item_id: checkbox.value, profile_id: shoppingProfileId });
+        fetch("/menu/shopping/toggle", { method: "POST", body })
+          .then((res) => (res.ok ? res.json() : Promise.reject(res)))
+          .then((data) => {
+            checkbox.checked = Boolean(data.checked);
+            markRow(checkbox);
+          })
+          .catch(() => {
+            checkbox.checked = !checkbox.checked;
+            markRow(checkbox);
+          });
+      });
+    });
+
+    shoppingList.querySelectorAll(".shopping-bulk").forEach((button) => {
+      button.addEventListener("click", () => {
+        const checked = button.dataset.checked === "1";
+        const boxes = Array.from(shoppingList.querySelectorAll(".shopping-check"));
+        const body = new URLSearchParams({ checked: checked ? "true" : "false", profile_id: shoppingProfileId });
+        boxes.forEach((cb) => body.append("item_ids", cb.value));
+        fetch("/menu/shopping/check", { method: "POST", body })
+          .then((res) => (res.ok ? res.json() : Promise.reject(res)))
+          .then(() => {
+            boxes.forEach((cb) => {
+              cb.checked = checked;
+              markRow(cb);
+            });
+          })
+          .catch(() => {});
+      });
+    });
+  }
+
+  // Bakgrundsjobb: polla status tills jobbet är klart och ladda sedan om sidan
+  const jobCard = document.querySelector(".job-status");
+  if (jobCard) {
+    const jobId = jobCard.dataset.jobId;
+    const finished = ["succeeded", "failed", "cancelled"];
+    const bar = jobCard.querySelector(".job-progress");
+    const state = jobCard.querySelector(".job-state");
+    const message = jobCard.querySelector(".job-message");
+    const cancelButton = jobCard.querySelector(".job-cancel");
+
+    if (cancelButton) {
+      cancelButton.addEventListener("click", () => {
+        cancelButton.disabled = true;
+        fetch(`/admin/jobs/${jobId}/cancel`, { method: "POST" }).catch(() => {});
+      });
+    }
+
+    const poll = () => {
+      fetch(`/admin/jobs/${jobId}`)
+        .then((res) => (res.ok ? res.json() : Promise.reject(res)))
+        .then((job) => {
+          if (bar) bar.value = Math.round(job.progress * 100);
+          if (state) state.textContent = job.status;
+          if (message) message.textContent = job.error || job.message || "";
+          if (finished.includes(job.status)) {
+            window.location.reload();
+          } else {
+            window.setTimeout(poll, 1000);
+          }
+        })
+        .catch(() => window.setTimeout(poll, 3000));
+    };
+
+    if (!finished.includes(jobCard.dataset.jobStatus)) {
+      window.setTimeout(poll, 500);
+    }
+  }
+
   if (recipeSearch && recipeCards.length) {
     recipeSearch.addEventListener("input", (e) => {
       const q = (e.target.value || "").toLowerCase().trim();